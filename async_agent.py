@@ -0,0 +1,152 @@
+import asyncio
+import time
+import traceback
+from deepseek_agent import (
+    ConsolePrinter, StreamAssembler, done_event, message_event, tool_result_event, unpack_message
+)
+from event_sinks import EventBus
+from session_stats import SessionStats, TurnStats, read_usage
+from tool_executor import AsyncToolExecutor
+from tool_schema import get_validators
+
+
+class AsyncDeepSeekAgent:
+    """
+    asyncio version of DeepSeekAgent.
+
+    The loop semantics are the same as DeepSeekAgent.run (reasoning_content passback,
+    tool dispatch, max_turns), but requests go through AsyncOpenAI so that hundreds of
+    sessions can share one event loop and one connection pool instead of one OS thread
+    per in-flight request. Tools may be coroutine functions; plain functions are run in
+    a worker thread. One agent instance can serve many concurrent run() calls.
+    """
+    def __init__(self, api_key, base_url, model_name, extra_body=None, stream=False, tool_executor=None,
+                 compactor=None):
+        """
+        Initialize Async DeepSeek Agent
+
+        :param api_key: API Key
+        :param base_url: Base URL
+        :param model_name: Model Name
+        :param extra_body: Extra parameters passed to the API (e.g., for enabling thinking mode)
+        :param stream: Default for run(): stream reasoning/content/tool-call deltas as they arrive
+        :param tool_executor: AsyncToolExecutor used to run the tool calls of a turn
+        :param compactor: Optional ConversationCompactor applied to `messages` before each request
+        """
+        from openai import AsyncOpenAI
+
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+        self.model_name = model_name
+        self.extra_body = extra_body or {}
+        self.stream = stream
+        self.tool_executor = tool_executor or AsyncToolExecutor()
+        self.compactor = compactor
+
+    async def run(self, messages, tools=None, tool_map=None, max_turns=10, stream=None, sinks=None):
+        """
+        Run the Agent loop
+
+        :param messages: Initial message list
+        :param tools: Tool definitions list (JSON Schema)
+        :param tool_map: Tool function mapping dictionary {name: function or coroutine function}
+        :param max_turns: Maximum number of conversation turns
+        :param stream: Print deltas as they arrive (None = use the value given at init)
+        :param sinks: Event sinks (see event_sinks.py) fed off the event loop
+                      (None = console output only)
+        :return: SessionStats with per-turn usage, cache hits and latency
+        """
+        print(f"[*] Agent started with model: {self.model_name}")
+
+        stats = None
+        # publish() never blocks, so the sinks cannot stall the event loop
+        bus = EventBus([ConsolePrinter()] if sinks is None else sinks)
+        try:
+            async for event in self.run_events(messages, tools, tool_map, max_turns, stream):
+                bus.publish(event)
+                if event["type"] == "done":
+                    stats = event["stats"]
+        finally:
+            await asyncio.to_thread(bus.close)
+        return stats
+
+    async def run_events(self, messages, tools=None, tool_map=None, max_turns=10, stream=None):
+        """
+        Run the Agent loop as an async generator of events.
+
+        Yields the same event dicts as DeepSeekAgent.run_events().
+        """
+        stream = self.stream if stream is None else stream
+        stats = SessionStats(self.model_name)
+        session_started = time.perf_counter()
+        validators = get_validators(tools)
+
+        for i in range(max_turns):
+            turn = i + 1
+            yield {"type": "turn_start", "turn": turn}
+
+            if self.compactor:
+                report = self.compactor.compact(messages)
+                if report["saved"] > 0:
+                    yield dict(report, type="compaction", turn=turn)
+
+            started = time.perf_counter()
+            ttft = None
+            try:
+                if stream:
+                    response = await self.client.chat.completions.create(
+                        model=self.model_name,
+                        messages=messages,
+                        tools=tools,
+                        extra_body=self.extra_body,
+                        stream=True,
+                        stream_options={"include_usage": True}
+                    )
+                    assembler = StreamAssembler(turn, started)
+                    async for chunk in response:
+                        for event in assembler.feed(chunk):
+                            yield event
+                    message, reasoning_content, content, tool_calls = assembler.unpack()
+                    ttft = assembler.ttft
+                    usage = assembler.usage
+                else:
+                    response = await self.client.chat.completions.create(
+                        model=self.model_name,
+                        messages=messages,
+                        tools=tools,
+                        extra_body=self.extra_body
+                    )
+                    message, reasoning_content, content, tool_calls = unpack_message(response.choices[0].message)
+                    usage = response.usage
+            except Exception as e:
+                yield {"type": "error", "turn": turn, "message": f"API Error: {e}", "traceback": traceback.format_exc()}
+                yield done_event(turn, "error", stats, session_started)
+                return
+
+            messages.append(message)
+            msg_event = message_event(turn, message, reasoning_content, content, tool_calls, stream, ttft, started)
+            yield msg_event
+            turn_stats = TurnStats(turn, read_usage(usage), msg_event["latency"], ttft, tool_calls=len(tool_calls))
+            stats.add_turn(turn_stats)
+
+            if not tool_calls:
+                yield dict(turn_stats.to_dict(), type="usage")
+                yield done_event(turn, "completed", stats, session_started)
+                return
+
+            for call_id, func_name, args_str in tool_calls:
+                yield {"type": "tool_call", "turn": turn, "id": call_id, "name": func_name, "arguments": args_str}
+
+            tools_started = time.perf_counter()
+            results = await self.tool_executor.run_calls(tool_calls, tool_map, validators)
+            turn_stats.tool_latency = time.perf_counter() - tools_started
+            turn_stats.invalid_tool_calls = sum(1 for r in results if r is not None and r.get("invalid"))
+            for (call_id, func_name, _), result in zip(tool_calls, results):
+                if result is not None:
+                    messages.append(result["message"])
+                yield tool_result_event(turn, call_id, func_name, result)
+            yield dict(turn_stats.to_dict(), type="usage")
+
+        yield done_event(max_turns, "max_turns", stats, session_started)
+
+    async def close(self):
+        await self.client.close()
@@ -0,0 +1,177 @@
+"""
+Batch runner: run many agent tasks from a JSONL file with a bounded worker pool.
+
+Each input line is one task:
+    {"id": "t1", "prompt": "请计算 (32 + 54) * 12", "demo": "math", "max_turns": 10}
+
+`id` defaults to the line number, `demo` (the tool set) to --demo and `max_turns`
+to --max-turns. One result line per task is appended to the output file as soon as
+the task finishes (final content, turns, tokens, wall time). Tasks already present
+in the output are skipped, so after a crash the same command resumes where it stopped.
+
+Usage:
+    python batch_runner.py tasks.jsonl -o results.jsonl --concurrency 8
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config import API_CONFIG
+from deepseek_agent import DeepSeekAgent
+from tool_executor import ToolExecutor
+
+
+def _math_tools():
+    from demo_math import tools, TOOL_MAP
+    return tools, TOOL_MAP
+
+
+def _adventure_tools():
+    from demo_adventure import GameState, registry
+    # Every task plays its own game
+    return registry.tools, registry.tool_map(GameState())
+
+
+def _web_search_tools():
+    from demo_web_search import tools, TOOL_MAP
+    return tools, TOOL_MAP
+
+
+TOOL_SETS = {
+    "none": lambda: (None, {}),
+    "math": _math_tools,
+    "adventure": _adventure_tools,
+    "web_search": _web_search_tools,
+}
+
+
+def load_tasks(path, default_demo, default_max_turns):
+    tasks = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            task = json.loads(line)
+            tasks.append({
+                "id": str(task.get("id", line_no)),
+                "prompt": task["prompt"],
+                "demo": task.get("demo", default_demo),
+                "max_turns": task.get("max_turns", default_max_turns),
+            })
+    return tasks
+
+
+def load_finished(path, retry_errors=False):
+    """
+    Ids already in the output file. A last line cut off by a crash is removed so
+    that new results start on a clean line.
+    """
+    finished = set()
+    if not os.path.exists(path):
+        return finished
+    with open(path, "rb") as f:
+        data = f.read()
+    complete = data[:data.rfind(b"\n") + 1]
+    if len(complete) != len(data):
+        with open(path, "wb") as f:
+            f.write(complete)
+    for line in complete.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        if retry_errors and result["status"] != "completed":
+            continue
+        finished.add(result["id"])
+    return finished
+
+
+def run_task(agent, task):
+    """Run one task without console output and return its result line"""
+    started = time.perf_counter()
+    result = {"id": task["id"], "demo": task["demo"], "status": None, "content": None}
+    try:
+        tools, tool_map = TOOL_SETS[task["demo"]]()
+        messages = [{"role": "user", "content": task["prompt"]}]
+        for event in agent.run_events(messages, tools, tool_map, max_turns=task["max_turns"]):
+            if event["type"] == "message" and event["content"]:
+                result["content"] = event["content"]
+            elif event["type"] == "error":
+                result["error"] = event["message"]
+            elif event["type"] == "done":
+                stats = event["stats"]
+                result.update(
+                    status=event["reason"],
+                    turns=len(stats.turns),
+                    prompt_tokens=stats.prompt_tokens,
+                    completion_tokens=stats.completion_tokens,
+                    reasoning_tokens=stats.reasoning_tokens,
+                    cache_hit_rate=stats.cache_hit_rate,
+                )
+    except Exception as e:
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+    result["wall_time"] = time.perf_counter() - started
+    return result
+
+
+def run_batch(agent, tasks, output_path, concurrency=4):
+    """
+    Run `tasks` with at most `concurrency` in flight, appending each result to
+    `output_path` as it completes.
+
+    :return: Number of tasks run
+    """
+    done_count = 0
+    pending = set()
+    task_iter = iter(tasks)
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        def fill():
+            # Submit lazily so that a huge task file is never queued all at once
+            for task in task_iter:
+                pending.add(pool.submit(run_task, agent, task))
+                if len(pending) >= concurrency:
+                    return
+
+        fill()
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                pending.discard(future)
+                result = future.result()
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                done_count += 1
+                print(f"[*] [{done_count}/{len(tasks)}] {result['id']}: {result['status']}, "
+                      f"{result.get('turns', 0)} turns, {result['wall_time']:.2f}s")
+            fill()
+    return done_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tasks", help="input JSONL with one task per line")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="output JSONL (appended, used for resume)")
+    parser.add_argument("--concurrency", type=int, default=4, help="tasks running at the same time")
+    parser.add_argument("--demo", choices=sorted(TOOL_SETS), default="math", help="default tool set")
+    parser.add_argument("--max-turns", type=int, default=10, help="default max_turns")
+    parser.add_argument("--retry-errors", action="store_true", help="rerun tasks that did not complete last time")
+    args = parser.parse_args()
+
+    tasks = load_tasks(args.tasks, args.demo, args.max_turns)
+    finished = load_finished(args.output, args.retry_errors)
+    todo = [task for task in tasks if task["id"] not in finished]
+    print(f"[*] {len(tasks)} tasks, {len(tasks) - len(todo)} already done, running {len(todo)} "
+          f"with concurrency {args.concurrency}")
+
+    agent = DeepSeekAgent(**API_CONFIG, tool_executor=ToolExecutor(max_workers=args.concurrency))
+    started = time.perf_counter()
+    count = run_batch(agent, todo, args.output, args.concurrency)
+    elapsed = time.perf_counter() - started
+    if count:
+        print(f"[*] {count} tasks in {elapsed:.2f}s ({count / elapsed:.2f} tasks/s), results in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
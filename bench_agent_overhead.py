@@ -0,0 +1,170 @@
+"""
+Benchmark: per-turn overhead of the agent loop itself, separated from model time,
+for long runs against the local mock server (math scenario, one tool call per turn).
+
+Every turn is split into:
+    model      waiting for the server (time between sending the request and its response;
+               in --stream mode also the time spent receiving chunks)
+    serialize  building the request in the SDK (messages -> JSON), grows with the history
+    parse      reading and parsing the response into SDK objects (non-stream mode)
+    unpack     model_dump() / stream delta assembly into the message appended to `messages`
+    dispatch   ToolExecutor.run_calls (tool lookup, JSON arguments, thread pool, result messages)
+    print      ConsolePrinter rendering of the events (stdout sent to os.devnull)
+    other      the rest of run_events (event dicts, stats, loop glue)
+
+Usage:
+    python bench_agent_overhead.py --turns 10 50 200
+    python bench_agent_overhead.py --turns 200 --stream --latency 0.05 --tokens-per-second 200
+"""
+import argparse
+import contextlib
+import os
+import time
+
+import deepseek_agent
+from deepseek_agent import ConsolePrinter, DeepSeekAgent, StreamAssembler
+from demo_math import tools, TOOL_MAP
+from mock_server import start_subprocess
+
+PHASES = ["model", "serialize", "parse", "unpack", "dispatch", "print", "other"]
+
+
+class TurnTimer:
+    """Collects the phase timings of the current turn through SDK and agent hooks"""
+    def __init__(self):
+        self.turns = []
+        self.current = None
+        self.marks = {}
+
+    def new_turn(self):
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.turns.append(self.current)
+
+    def add(self, phase, seconds):
+        self.current[phase] += seconds
+
+    # HTTP client event hooks: fired when the request is sent and when the response headers arrive
+    def on_request(self, request):
+        self.marks["request"] = time.perf_counter()
+
+    def on_response(self, response):
+        self.marks["response"] = time.perf_counter()
+
+
+def _timed(timer, phase, func):
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timer.add(phase, time.perf_counter() - started)
+    return wrapper
+
+
+def _timed_stream(timer, stream):
+    iterator = iter(stream)
+    while True:
+        started = time.perf_counter()
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            timer.add("model", time.perf_counter() - started)
+            return
+        timer.add("model", time.perf_counter() - started)
+        yield chunk
+
+
+def instrument(agent, timer):
+    """Route the agent's SDK client, unpacking and tool dispatch through the timer"""
+    # The SDK's own HTTP client, so that the hooks see exactly when the request leaves
+    for endpoint in agent.client.endpoints:
+        endpoint.client._client.event_hooks = {"request": [timer.on_request], "response": [timer.on_response]}
+    create = agent.client.chat.completions.create
+
+    def timed_create(**kwargs):
+        started = time.perf_counter()
+        response = create(**kwargs)
+        returned = time.perf_counter()
+        timer.add("serialize", timer.marks["request"] - started)
+        timer.add("model", timer.marks["response"] - timer.marks["request"])
+        timer.add("parse", returned - timer.marks["response"])
+        if kwargs.get("stream"):
+            return _timed_stream(timer, response)
+        return response
+
+    agent.client.chat.completions.create = timed_create
+    agent.tool_executor.run_calls = _timed(timer, "dispatch", agent.tool_executor.run_calls)
+
+    originals = (deepseek_agent.unpack_message, StreamAssembler.feed, StreamAssembler.unpack)
+    deepseek_agent.unpack_message = _timed(timer, "unpack", originals[0])
+    StreamAssembler.feed = _timed(timer, "unpack", originals[1])
+    StreamAssembler.unpack = _timed(timer, "unpack", originals[2])
+
+    def restore():
+        deepseek_agent.unpack_message, StreamAssembler.feed, StreamAssembler.unpack = originals
+    return restore
+
+
+def bench_run(base_url, turns, stream):
+    agent = DeepSeekAgent("sk-mock", base_url, "mock-model", stream=stream)
+    timer = TurnTimer()
+    restore = instrument(agent, timer)
+    printer = _timed(timer, "print", ConsolePrinter())
+    messages = [{"role": "user", "content": "Please compute something step by step."}]
+
+    done = None
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        turn_started = None
+        for event in agent.run_events(messages, tools, TOOL_MAP, max_turns=turns):
+            if event["type"] == "turn_start":
+                if turn_started is not None:
+                    timer.current["wall"] = time.perf_counter() - turn_started
+                turn_started = time.perf_counter()
+                timer.new_turn()
+            printer(event)
+            if event["type"] == "done":
+                done = event
+        timer.current["wall"] = time.perf_counter() - turn_started
+    restore()
+    agent.tool_executor.shutdown()
+
+    for turn in timer.turns:
+        turn["other"] = turn["wall"] - sum(turn[phase] for phase in PHASES if phase != "other")
+    return timer.turns, done
+
+
+def report(turns, timings, done):
+    total = {phase: sum(t[phase] for t in timings) for phase in PHASES}
+    wall = sum(t["wall"] for t in timings)
+    overhead = wall - total["model"]
+    print(f"\n[*] {turns} turns ({len(timings)} run, stop: {done['reason']}), wall {wall:.3f}s, "
+          f"model {total['model']:.3f}s, own overhead {overhead:.3f}s ({overhead / wall:.1%})")
+    print(f"    {'phase':<10}{'total ms':>10}{'ms/turn':>10}{'first':>10}{'last':>10}")
+    for phase in PHASES:
+        print(f"    {phase:<10}{total[phase] * 1000:>10.2f}{total[phase] * 1000 / len(timings):>10.3f}"
+              f"{timings[0][phase] * 1000:>10.3f}{timings[-1][phase] * 1000:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 50, 200], help="run lengths to measure")
+    parser.add_argument("--latency", type=float, default=0.0, help="mock model latency per request (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=None, help="mock decode rate")
+    parser.add_argument("--stream", action="store_true", help="use streaming requests")
+    parser.add_argument("--port", type=int, default=18100, help="first port for the mock server processes")
+    args = parser.parse_args()
+
+    for i, turns in enumerate(args.turns):
+        server_args = ["--latency", args.latency, "--steps", turns - 1]
+        if args.tokens_per_second:
+            server_args += ["--tokens-per-second", args.tokens_per_second]
+        server, base_url = start_subprocess(args.port + i, *server_args)
+        try:
+            timings, done = bench_run(base_url, turns, args.stream)
+        finally:
+            server.terminate()
+        report(turns, timings, done)
+
+
+if __name__ == "__main__":
+    main()
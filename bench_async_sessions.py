@@ -0,0 +1,99 @@
+"""
+Benchmark: concurrent agent sessions per second, sync DeepSeekAgent (one thread per
+session) vs AsyncDeepSeekAgent (one event loop), against the local mock server.
+
+Usage:
+    python bench_async_sessions.py --sessions 400 --concurrency 200 --latency 0.2
+"""
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from async_agent import AsyncDeepSeekAgent
+from deepseek_agent import DeepSeekAgent
+from demo_math import tools, TOOL_MAP
+from mock_server import start_subprocess
+
+
+def _new_messages(i):
+    return [{"role": "user", "content": f"Session {i}: please compute something step by step."}]
+
+
+def _consume(events):
+    done = None
+    for event in events:
+        if event["type"] == "done":
+            done = event
+    return done
+
+
+def bench_sync(config, sessions, concurrency):
+    peak_threads = threading.active_count()
+
+    def one_session(i):
+        nonlocal peak_threads
+        agent = DeepSeekAgent(**config)
+        done = _consume(agent.run_events(_new_messages(i), tools, TOOL_MAP))
+        peak_threads = max(peak_threads, threading.active_count())
+        return done["reason"] == "completed"
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        completed = sum(pool.map(one_session, range(sessions)))
+    elapsed = time.perf_counter() - started
+    return completed, elapsed, peak_threads
+
+
+async def bench_async(config, sessions, concurrency):
+    agent = AsyncDeepSeekAgent(**config)
+    semaphore = asyncio.Semaphore(concurrency)
+    peak_threads = threading.active_count()
+
+    async def one_session(i):
+        nonlocal peak_threads
+        async with semaphore:
+            done = None
+            async for event in agent.run_events(_new_messages(i), tools, TOOL_MAP):
+                if event["type"] == "done":
+                    done = event
+            peak_threads = max(peak_threads, threading.active_count())
+            return done["reason"] == "completed"
+
+    started = time.perf_counter()
+    completed = sum(await asyncio.gather(*(one_session(i) for i in range(sessions))))
+    elapsed = time.perf_counter() - started
+    await agent.close()
+    return completed, elapsed, peak_threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2, help="mock model latency per request (s)")
+    parser.add_argument("--steps", type=int, default=3, help="tool turns per session")
+    parser.add_argument("--stream", action="store_true", help="use streaming requests")
+    parser.add_argument("--port", type=int, default=18000, help="port for the mock server process")
+    args = parser.parse_args()
+
+    server, base_url = start_subprocess(args.port, "--latency", args.latency, "--steps", args.steps)
+    config = {"api_key": "sk-mock", "base_url": base_url, "model_name": "mock-model", "stream": args.stream}
+
+    print(f"[*] {args.sessions} sessions, concurrency {args.concurrency}, "
+          f"{args.steps + 1} model calls/session, {args.latency:.3f}s latency/call")
+
+    completed, elapsed, threads = bench_sync(config, args.sessions, args.concurrency)
+    print(f"sync  DeepSeekAgent      : {completed}/{args.sessions} ok, {elapsed:6.2f}s, "
+          f"{args.sessions / elapsed:7.1f} sessions/s, peak threads {threads}")
+
+    completed, elapsed, threads = asyncio.run(bench_async(config, args.sessions, args.concurrency))
+    print(f"async AsyncDeepSeekAgent : {completed}/{args.sessions} ok, {elapsed:6.2f}s, "
+          f"{args.sessions / elapsed:7.1f} sessions/s, peak threads {threads}")
+
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
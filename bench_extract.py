@@ -0,0 +1,84 @@
+"""
+Benchmark: HTML-to-text extraction backends (html_text.py) on the saved fixture corpus.
+
+Every page of fixtures/html/ (and a generated multi-MB page) is extracted by each
+available backend. The benchmark reports the throughput (MB of HTML per second, median
+of --repeat runs) and the parity with the bs4 reference: "same" when the text is
+identical, otherwise the similarity ratio of the two outputs.
+
+--scale repeats the <body> of the fixture pages to turn them into portal-sized pages.
+
+Usage:
+    python bench_extract.py
+    python bench_extract.py --scale 200 --repeat 3
+"""
+import argparse
+import difflib
+import glob
+import os
+import statistics
+import time
+
+from fixture_server import html_page
+from html_text import BACKENDS, available_backends
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "html")
+BASE_URL = "https://www.ecnu.edu.cn/xxgk/"
+
+
+def scaled(html, scale):
+    """The page with the content of its <body> repeated `scale` times"""
+    start = html.find(">", html.lower().find("<body")) + 1
+    end = html.lower().rfind("</body>")
+    if scale <= 1 or start <= 0 or end < start:
+        return html
+    return html[:start] + html[start:end] * scale + html[end:]
+
+
+def load_corpus(scale, generated_kb):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(CORPUS, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages.append((os.path.basename(path), scaled(f.read(), scale)))
+    if generated_kb:
+        pages.append((f"generated {generated_kb} KB", html_page(generated_kb).decode("utf-8")))
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=100, help="repetitions of each fixture's <body>")
+    parser.add_argument("--generated-kb", type=int, default=2000, help="size of the generated page (0 = none)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per page and backend")
+    args = parser.parse_args()
+
+    backends = available_backends()
+    pages = load_corpus(args.scale, args.generated_kb)
+    print(f"[*] Backends: {', '.join(backends)}; {len(pages)} pages, fixture bodies x{args.scale}")
+    print(f"{'page':<22} {'size':>8} " + " ".join(f"{name:>18}" for name in backends))
+    totals = {name: 0.0 for name in backends}
+    total_mb = 0.0
+    for name, html in pages:
+        mb = len(html.encode("utf-8")) / 1024 / 1024
+        total_mb += mb
+        reference = BACKENDS["bs4"](html, BASE_URL) if "bs4" in backends else None
+        cells = []
+        for backend in backends:
+            times = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                text = BACKENDS[backend](html, BASE_URL)
+                times.append(time.perf_counter() - started)
+            elapsed = statistics.median(times)
+            totals[backend] += elapsed
+            if reference is None or text == reference:
+                parity = "same"
+            else:
+                parity = f"{difflib.SequenceMatcher(None, reference, text).ratio():.1%}"
+            cells.append(f"{mb / elapsed:7.1f} MB/s {parity:>5}")
+        print(f"{name:<22} {mb:6.2f}MB " + " ".join(f"{cell:>18}" for cell in cells))
+    print(f"{'total':<22} {total_mb:6.2f}MB " + " ".join(f"{total_mb / totals[b]:7.1f} MB/s {'':>5}" for b in backends))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: startup time of every entry point, each measured in a fresh interpreter.
+
+For every module the benchmark reports the median over --runs of:
+    process   wall time of `python -c "import <module>"` (interpreter startup included)
+    import    time spent importing the module itself (tool schemas included)
+    loaded    which heavy dependencies the import pulled in; the SDK and the page /
+              document libraries should only be loaded when a client is created or a
+              tool first runs
+
+Usage:
+    python bench_startup.py
+    python bench_startup.py --runs 10 demo_math demo_word_web
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ENTRY_POINTS = ["demo_math", "demo_web_search", "demo_adventure", "demo_word_web",
+                "batch_runner", "checkpoint", "self_consistency"]
+HEAVY = ["openai", "requests", "bs4", "docx", "flask"]
+
+_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+module = __import__(sys.argv[1])
+getattr(module, "tools", None)
+elapsed = time.perf_counter() - started
+print(json.dumps({{"import": elapsed, "loaded": [name for name in {HEAVY!r} if name in sys.modules]}}))
+"""
+
+
+def measure(module, runs):
+    """{"process", "import", "loaded"} medians of `runs` fresh interpreters, or {"error"}"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    process, imports, loaded = [], [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", _PROBE, module], cwd=here, capture_output=True, text=True)
+        process.append(time.perf_counter() - started)
+        if result.returncode != 0:
+            return {"error": (result.stderr.strip().splitlines() or ["failed"])[-1]}
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        imports.append(report["import"])
+        loaded = report["loaded"]
+    return {"process": statistics.median(process), "import": statistics.median(imports), "loaded": loaded}
+
+
+def _timed(command):
+    started = time.perf_counter()
+    subprocess.run(command, capture_output=True)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS, help="modules to import (default: all entry points)")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per module")
+    args = parser.parse_args()
+
+    baseline = statistics.median(_timed([sys.executable, "-c", "pass"]) for _ in range(args.runs))
+    print(f"[*] Interpreter startup alone: {baseline * 1000:.0f} ms (median of {args.runs})")
+    print(f"{'module':<20} {'process':>9} {'import':>9}  loaded")
+    for module in args.modules:
+        result = measure(module, args.runs)
+        if "error" in result:
+            print(f"{module:<20} [!] {result['error']}")
+            continue
+        print(f"{module:<20} {result['process'] * 1000:7.0f}ms {result['import'] * 1000:7.0f}ms  "
+              f"{', '.join(result['loaded']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
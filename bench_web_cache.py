@@ -0,0 +1,92 @@
+"""
+Benchmark: visit_page with and without the on-disk web cache (http_cache.py), against the
+local fixture server.
+
+Each scenario visits the same --pages pages (download + text extraction, as visit_page
+does) as a new session would, i.e. with a fresh PageFetcher on the cache directory:
+
+    no cache              every visit downloads and parses the page
+    cold cache            empty cache: the same work plus storing the pages
+    warm, max-age         pages still fresh (Cache-Control: max-age): no request at all
+    warm, revalidate      pages sent with no-cache: a conditional request answered with 304
+    warm, no validators   no ETag / Last-Modified: the page is downloaded again, but the
+                          identical body keeps its cached text, so it is not parsed again
+    offline               served from the cache only
+
+Usage:
+    python bench_web_cache.py --pages 20 --kb 500
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+from fixture_server import FixtureServer
+from html_text import default_backend, extract_text
+from http_cache import HttpCache
+from web_fetch import PageFetcher
+
+
+def visit(fetcher, url):
+    """visit_page without the truncation: the page text, from the cache when it has it"""
+    page = fetcher.fetch(url)
+    cache = fetcher.cache if page.get("cache_key") else None
+    text = cache.get_text(page["cache_key"], default_backend()) if cache else None
+    if text is None:
+        text = extract_text(page["html"], page["url"])
+        if cache:
+            cache.put_text(page["cache_key"], default_backend(), text)
+    return text
+
+
+def run(server, urls, directory=None, offline=False):
+    cache = HttpCache(directory, offline=offline) if directory else None
+    fetcher = PageFetcher(cache=cache)
+    server.reset_counters()
+    started = time.perf_counter()
+    for url in urls:
+        visit(fetcher, url)
+    elapsed = time.perf_counter() - started
+    fetcher.close()
+    return elapsed, cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20, help="distinct pages visited per scenario")
+    parser.add_argument("--kb", type=int, default=500, help="size of each page")
+    args = parser.parse_args()
+
+    server = FixtureServer()
+    base_url = server.start()
+    directory = tempfile.mkdtemp(prefix="web_cache_")
+    fresh = [f"{base_url}/page/{args.kb}?n={i}&max_age=3600" for i in range(args.pages)]
+    revalidate = [f"{base_url}/page/{args.kb}?n={i}" for i in range(args.pages)]
+    no_validators = [f"{base_url}/page/{args.kb}?n={i}&validators=none" for i in range(args.pages)]
+    # Fill the cache with the no-cache and no-validator pages first
+    run(server, revalidate + no_validators, directory)
+    scenarios = [
+        ("no cache", fresh, None, False),
+        ("cold cache", fresh, directory, False),
+        ("warm, max-age", fresh, directory, False),
+        ("warm, revalidate", revalidate, directory, False),
+        ("warm, no validators", no_validators, directory, False),
+        ("offline", fresh, directory, True),
+    ]
+    print(f"[*] {args.pages} pages of {args.kb} KB per scenario, cache in {directory}")
+    print(f"{'scenario':<22} {'per page':>9} {'requests':>9} {'304':>5} {'sent':>9}  cache")
+    try:
+        for name, urls, cache_dir, offline in scenarios:
+            elapsed, cache = run(server, urls, cache_dir, offline)
+            stats = cache.stats() if cache else {}
+            summary = (f"{stats['hits']} hits, {stats['revalidated']} revalidated, {stats['misses']} misses, "
+                       f"{stats['text_hits']} texts reused") if cache else "-"
+            print(f"{name:<22} {elapsed / len(urls) * 1000:7.1f}ms {server.requests:>9} {server.not_modified:>5} "
+                  f"{server.bytes_sent / 1024 / 1024:7.1f}MB  {summary}")
+    finally:
+        server.stop()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Record / replay of chat-completions calls ("cassettes").
+
+RecordingClient wraps a real OpenAI client and appends every request/response pair
+(including reasoning_content and tool_calls, and every chunk of streamed responses
+with its arrival time) to a JSONL cassette. ReplayClient serves those responses
+back without any network access, with the original latency scaled by a factor
+(0 = instant), so the agent loop, the Word web flow and the demos can be profiled
+and regression-tested offline.
+
+Both expose `client.chat.completions.create(...)` like the OpenAI SDK, so they can
+be dropped in as DeepSeekAgent.client (see DeepSeekAgent's record_path/replay_path).
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict, deque
+
+
+def _to_jsonable(obj):
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump(exclude_none=True)
+    if isinstance(obj, dict):
+        return {k: _to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_to_jsonable(v) for v in obj]
+    return obj
+
+
+def request_key(kwargs):
+    """Stable hash of what the model sees: model, messages and tools"""
+    payload = {
+        "model": kwargs.get("model"),
+        "messages": _to_jsonable(kwargs.get("messages")),
+        "tools": _to_jsonable(kwargs.get("tools")),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class _Namespace:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class _RecordingStream:
+    """
+    Streamed response that records its chunks as they are read. close() closes the
+    SDK stream, so that a stopped run drops the HTTP connection as without recording.
+    """
+    def __init__(self, stream, entry, started, write):
+        self._stream = stream
+        self._entry = entry
+        self._started = started
+        self._write = write
+
+    def __iter__(self):
+        chunks = []
+        for chunk in self._stream:
+            chunks.append({"t": time.perf_counter() - self._started, "chunk": chunk.model_dump(exclude_none=True)})
+            yield chunk
+        self._entry["latency"] = time.perf_counter() - self._started
+        self._entry["chunks"] = chunks
+        self._write(self._entry)
+
+    def close(self):
+        if hasattr(self._stream, "close"):
+            self._stream.close()
+
+
+class _RecordingCompletions:
+    def __init__(self, completions, path):
+        self._completions = completions
+        self._path = path
+        self._lock = threading.Lock()
+
+    def _write(self, entry):
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            with open(self._path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def create(self, **kwargs):
+        started = time.perf_counter()
+        response = self._completions.create(**kwargs)
+        kwargs.pop("control", None)  # ClientPool option, not part of the request
+        entry = {
+            "key": request_key(kwargs),
+            "request": {k: _to_jsonable(v) for k, v in kwargs.items() if k != "stream_options"},
+            "stream": bool(kwargs.get("stream")),
+        }
+
+        if not kwargs.get("stream"):
+            entry["latency"] = time.perf_counter() - started
+            entry["response"] = response.model_dump(exclude_none=True)
+            self._write(entry)
+            return response
+
+        return _RecordingStream(response, entry, started, self._write)
+
+
+class RecordingClient:
+    """Wraps an OpenAI client and appends every chat-completions call to a JSONL cassette"""
+    def __init__(self, client, path):
+        self.client = client
+        self.chat = _Namespace(completions=_RecordingCompletions(client.chat.completions, path))
+
+
+def _chunks_from_response(response):
+    """Synthesize stream chunks from a recorded non-streaming response"""
+    message = response["choices"][0]["message"]
+    base = {"id": response.get("id", "replay"), "object": "chat.completion.chunk",
+            "created": response.get("created", 0), "model": response.get("model", "replay")}
+    chunks = []
+    if message.get("reasoning_content"):
+        chunks.append({"choices": [{"index": 0, "delta": {"role": "assistant", "reasoning_content": message["reasoning_content"]}}]})
+    if message.get("content") is not None:
+        chunks.append({"choices": [{"index": 0, "delta": {"role": "assistant", "content": message["content"]}}]})
+    for index, tool_call in enumerate(message.get("tool_calls") or []):
+        chunks.append({"choices": [{"index": 0, "delta": {"tool_calls": [dict(tool_call, index=index)]}}]})
+    chunks.append({"choices": [{"index": 0, "delta": {}, "finish_reason": response["choices"][0].get("finish_reason", "stop")}]})
+    if response.get("usage"):
+        chunks.append({"choices": [], "usage": response["usage"]})
+    return [dict(base, **chunk) for chunk in chunks]
+
+
+def _response_from_chunks(chunks):
+    """Rebuild a non-streaming response from recorded stream chunks"""
+    from deepseek_agent import StreamAssembler
+    from openai.types.chat import ChatCompletionChunk
+
+    assembler = StreamAssembler(0, time.perf_counter())
+    first = chunks[0] if chunks else {}
+    for chunk in chunks:
+        assembler.feed(ChatCompletionChunk.model_validate(chunk))
+    message = assembler.message()
+    response = {
+        "id": first.get("id", "replay"),
+        "object": "chat.completion",
+        "created": first.get("created", 0),
+        "model": first.get("model", "replay"),
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"}],
+    }
+    if assembler.usage is not None:
+        response["usage"] = assembler.usage.model_dump(exclude_none=True)
+    return response
+
+
+class _ReplayCompletions:
+    def __init__(self, entries, latency_scale, strict):
+        self._by_key = defaultdict(deque)
+        for entry in entries:
+            self._by_key[entry["key"]].append(entry)
+        self._in_order = deque(entries)
+        self._used = set()
+        self._lock = threading.Lock()
+        self.latency_scale = latency_scale
+        self.strict = strict
+
+    def _next_entry(self, kwargs):
+        key = request_key(kwargs)
+        with self._lock:
+            # Prefer an exact match of the conversation; fall back to recording order
+            # (tool results such as get_current_time make later requests differ)
+            queue = self._by_key.get(key)
+            while queue:
+                entry = queue.popleft()
+                if id(entry) not in self._used:
+                    self._used.add(id(entry))
+                    return entry
+            if self.strict:
+                raise LookupError("No recorded response for this request in the cassette")
+            while self._in_order:
+                entry = self._in_order.popleft()
+                if id(entry) not in self._used:
+                    self._used.add(id(entry))
+                    return entry
+        raise LookupError("Cassette exhausted: no more recorded responses")
+
+    def create(self, **kwargs):
+        from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+        entry = self._next_entry(kwargs)
+        started = time.perf_counter()
+
+        if entry["stream"]:
+            chunks = entry["chunks"]
+        else:
+            chunks = [{"t": entry["latency"], "chunk": c} for c in _chunks_from_response(entry["response"])]
+
+        if not kwargs.get("stream"):
+            time.sleep(entry["latency"] * self.latency_scale)
+            response = entry["response"] if not entry["stream"] else _response_from_chunks([c["chunk"] for c in chunks])
+            return ChatCompletion.model_validate(response)
+
+        def replay_stream():
+            for item in chunks:
+                delay = item["t"] * self.latency_scale - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+                yield ChatCompletionChunk.model_validate(item["chunk"])
+
+        return replay_stream()
+
+
+class ReplayClient:
+    """Serves chat-completions responses from a JSONL cassette, without network access"""
+    def __init__(self, path, latency_scale=1.0, strict=False):
+        """
+        :param path: Cassette written by RecordingClient
+        :param latency_scale: Multiplier for the recorded latency (1 = original, 0 = instant)
+        :param strict: Only serve exact request matches instead of falling back to recording order
+        """
+        with open(path, encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        self.chat = _Namespace(completions=_ReplayCompletions(entries, latency_scale, strict))
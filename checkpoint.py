@@ -0,0 +1,237 @@
+"""
+Durable checkpoints of agent runs, so that a long run survives a process restart.
+
+After every turn the agent appends one line to the session's checkpoint log (JSONL,
+fsync'ed): the messages added since the previous checkpoint, the turn index, and a
+snapshot of the tool-side state (e.g. the Word document, the adventure GameState)
+when it changed. Resuming rebuilds `messages` and the tool state from the log and
+continues with the next turn, so completed turns are never sent to the model again.
+
+Tool-side state is any object with snapshot() -> JSON-able value and restore(value).
+For tools that are bound methods (GameState.move, ...) the owning objects are found
+automatically; other state is passed explicitly as {name: object}.
+
+Usage:
+    python checkpoint.py show checkpoints/20250101-120000.jsonl
+    python checkpoint.py resume checkpoints/20250101-120000.jsonl --max-turns 20
+    python checkpoint.py resume checkpoints/word.jsonl --save-doc filled.docx
+    python checkpoint.py resume checkpoints/math.jsonl --prompt "再算一下 2 ** 10"
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+
+
+def _message_to_dict(message):
+    # Assistant messages without reasoning_content are SDK objects
+    if hasattr(message, "model_dump"):
+        return message.model_dump(exclude_none=True)
+    return message
+
+
+def run_file_name(suffix):
+    """Per-run file name: start time, pid and a random part, so that runs starting in the same second never share a file"""
+    return time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}-{uuid.uuid4().hex[:8]}{suffix}"
+
+
+def tool_state(tool_map):
+    """{class name: object} for the objects owning bound-method tools that can be snapshotted"""
+    state = {}
+    for func in (tool_map or {}).values():
+        owner = getattr(func, "__self__", None)
+        if owner is not None and hasattr(owner, "snapshot") and hasattr(owner, "restore"):
+            state[type(owner).__name__] = owner
+    return state
+
+
+class Checkpointer:
+    def __init__(self, path, state=None, meta=None, fsync=True):
+        """
+        Start a new checkpoint log at `path` (use Checkpointer.resume() to continue one).
+
+        :param path: Checkpoint log file (JSONL, appended); with `meta` it is created and must not exist yet
+        :param state: {name: object with snapshot()/restore()} saved with every turn
+        :param meta: Extra information stored in the log header (e.g. tool names)
+        :param fsync: fsync after every checkpoint, so that it survives a power loss
+        """
+        self.path = path
+        self.state = state or {}
+        self.meta = meta or {}
+        self.fsync = fsync
+        self.turn = 0
+        self.messages = None
+        self.finished = None
+        self._saved_count = 0
+        self._last_state = {}
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if meta is not None:
+            # Exclusive create: a new log never appends to another run's records
+            self._append({"meta": meta, "created": time.time()}, mode="x")
+
+    @classmethod
+    def in_directory(cls, directory, tool_map=None, state=None, meta=None):
+        """New log in `directory` named after the current time; the state defaults to tool_state(tool_map)"""
+        path = os.path.join(directory, run_file_name(".jsonl"))
+        meta = dict(meta or {}, tools=sorted(tool_map or {}))
+        return cls(path, tool_state(tool_map) if state is None else state, meta)
+
+    @classmethod
+    def resume(cls, path, state=None, fsync=True, repair=True):
+        """
+        Load the last checkpoint of `path` and restore `state` from it.
+
+        Afterwards `.messages` is the conversation to pass to run(), `.turn` the last
+        completed turn and `.finished` the stop reason if the run had already ended
+        ("completed" / "max_turns"). New checkpoints are appended to the same log.
+
+        :param repair: Drop a last line cut off by a crash from the file, so that new
+                       checkpoints start on a clean line (False only reads the log)
+        """
+        checkpointer = cls(path, state, fsync=fsync)
+        records = checkpointer._read(repair)
+        messages = []
+        snapshots = {}
+        for record in records:
+            if "meta" in record:
+                checkpointer.meta.update(record["meta"])
+                continue
+            messages = messages[:record["messages_from"]] + record["messages"]
+            snapshots.update(record.get("state") or {})
+            checkpointer.turn = record["turn"]
+            checkpointer.finished = record.get("finished")
+        for name, obj in checkpointer.state.items():
+            if name in snapshots:
+                obj.restore(snapshots[name])
+        checkpointer.messages = messages
+        checkpointer._saved_count = len(messages)
+        checkpointer._last_state = {name: json.dumps(value, sort_keys=True) for name, value in snapshots.items()}
+        return checkpointer
+
+    def _read(self, repair=True):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"No checkpoint log at {self.path}")
+        with open(self.path, "rb") as f:
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]
+        if repair and len(complete) != len(data):
+            # Last line cut off by a crash: drop it so that new checkpoints start on a clean line
+            with open(self.path, "wb") as f:
+                f.write(complete)
+        return [json.loads(line) for line in complete.decode("utf-8").splitlines() if line.strip()]
+
+    def _append(self, record, mode="a"):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with open(self.path, mode, encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        return len(line)
+
+    def save(self, turn, messages, finished=None):
+        """
+        Append a checkpoint after `turn`: new messages, changed tool state, stop reason.
+
+        :return: Size of the appended record in bytes
+        """
+        # Compaction edits messages in place but never removes them; start over if the list got shorter
+        start = self._saved_count if self._saved_count <= len(messages) else 0
+        record = {
+            "turn": turn,
+            "ts": time.time(),
+            "messages_from": start,
+            "messages": [_message_to_dict(m) for m in messages[start:]],
+        }
+        changed = {}
+        for name, obj in self.state.items():
+            value = obj.snapshot()
+            encoded = json.dumps(value, sort_keys=True)
+            if self._last_state.get(name) != encoded:
+                changed[name] = value
+                self._last_state[name] = encoded
+        if changed:
+            record["state"] = changed
+        if finished:
+            record["finished"] = finished
+        size = self._append(record)
+        self._saved_count = len(messages)
+        self.turn = turn
+        self.finished = finished
+        return size
+
+
+def _demo_tools(tool_names):
+    """(demo name, tools, tool_map, state) of the demo whose tool names match the checkpoint"""
+    from batch_runner import TOOL_SETS
+
+    for name, factory in TOOL_SETS.items():
+        tools, tool_map = factory()
+        if sorted(tool_map) == tool_names:
+            return name, tools, tool_map, tool_state(tool_map)
+
+    import demo_word_web
+    from word_engine import WordEngine
+    if sorted(demo_word_web.TOOL_MAP) == tool_names:
+        demo_word_web.word_app = WordEngine()
+        return "word", demo_word_web.tools, demo_word_web.TOOL_MAP, {"WordEngine": demo_word_web.word_app}
+    raise SystemExit(f"[!] No demo has the tools of this checkpoint: {tool_names}")
+
+
+def show(path):
+    # Read-only: a torn last line is skipped here, and only removed when the run is resumed
+    checkpointer = Checkpointer.resume(path, repair=False)
+    last = checkpointer.messages[-1] if checkpointer.messages else {}
+    print(f"[*] {path}: turn {checkpointer.turn}, {len(checkpointer.messages)} messages, "
+          f"{os.path.getsize(path) / 1024:.1f} KB, status: {checkpointer.finished or 'in progress'}")
+    print(f"[*] Tools: {', '.join(checkpointer.meta.get('tools', [])) or 'unknown'}")
+    if last.get("content"):
+        preview = last["content"][:200].replace("\n", " ")
+        print(f"[*] Last {last['role']} message: {preview}")
+
+
+def resume(args):
+    from config import API_CONFIG
+    from deepseek_agent import DeepSeekAgent
+
+    meta = Checkpointer.resume(args.path, repair=False).meta
+    demo, tools, tool_map, state = _demo_tools(meta.get("tools", []))
+    checkpointer = Checkpointer.resume(args.path, state)
+    messages = checkpointer.messages
+    if args.prompt:
+        messages.append({"role": "user", "content": args.prompt})
+    elif checkpointer.finished == "completed":
+        print("[*] This run has already completed; pass --prompt to continue the conversation.")
+        return
+    print(f"[*] Resuming {demo} run at turn {checkpointer.turn + 1} with {len(messages)} messages")
+
+    agent = DeepSeekAgent(**API_CONFIG)
+    agent.run(messages, tools, tool_map, max_turns=args.max_turns, stream=args.stream, checkpoint=checkpointer)
+    if args.save_doc and "WordEngine" in state:
+        state["WordEngine"].doc.save(args.save_doc)
+        print(f"[*] Document saved to {args.save_doc}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    show_parser = commands.add_parser("show", help="print where a checkpointed run stands")
+    show_parser.add_argument("path")
+    resume_parser = commands.add_parser("resume", help="continue a run from its last checkpoint")
+    resume_parser.add_argument("path")
+    resume_parser.add_argument("--max-turns", type=int, default=50, help="turn limit of the whole run, resumed turns included")
+    resume_parser.add_argument("--prompt", help="user message to add before continuing")
+    resume_parser.add_argument("--stream", action="store_true", help="use streaming requests")
+    resume_parser.add_argument("--save-doc", help="Word runs: where to save the document afterwards")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        show(args.path)
+    else:
+        resume(args)
+
+
+if __name__ == "__main__":
+    main()
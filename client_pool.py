@@ -0,0 +1,279 @@
+"""
+Process-wide pooled chat-completions client over one or more OpenAI-compatible endpoints.
+
+- One OpenAI client (and HTTP connection pool with keep-alive) per endpoint, shared by
+  every agent in the process via get_client_pool(), so that e.g. each Word web run
+  does not open fresh connections. Endpoints are warmed up in the background.
+- Least-outstanding-requests load balancing across endpoints (vLLM / SGLang replicas).
+- Retry of transient errors (connection errors, timeouts, 408/409/429/5xx) on the next
+  best endpoint, with exponential backoff and full jitter; failing endpoints are put in
+  a short cooldown.
+- With a RunControl (DeepSeekAgent passes its own), retries stop once the run is
+  cancelled or its deadline has passed, and no backoff sleeps past the deadline.
+- Optional hedging: if a request is still pending after the observed p95 latency, a
+  duplicate is sent to another endpoint and the first answer wins.
+
+ClientPool exposes `chat.completions.create(...)` like the OpenAI SDK, so it can be used
+as DeepSeekAgent.client.
+"""
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from types import SimpleNamespace
+
+from run_control import Cancelled
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+def is_retryable(exc):
+    import openai
+
+    if isinstance(exc, openai.APIConnectionError):  # also covers timeouts
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS or exc.status_code >= 500
+    return False
+
+
+def _quantile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Endpoint:
+    def __init__(self, api_key, base_url, timeout=None):
+        # The SDK takes most of the startup time, so it is only imported once a client is needed
+        from openai import OpenAI
+
+        self.base_url = base_url
+        # Retries are done by the pool, across endpoints
+        options = {"timeout": timeout} if timeout is not None else {}
+        self.client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0, **options)
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.latencies = deque(maxlen=200)
+
+    def stats(self):
+        return {
+            "base_url": self.base_url,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "p50": _quantile(self.latencies, 0.5) if self.latencies else None,
+            "p95": _quantile(self.latencies, 0.95) if self.latencies else None,
+        }
+
+
+class _PooledStream:
+    """Streamed response that keeps its endpoint counted as busy until it is consumed or closed"""
+    def __init__(self, pool, endpoint, stream):
+        self._pool = pool
+        self._endpoint = endpoint
+        self._stream = stream
+        self._released = False
+
+    def _release(self):
+        if not self._released:
+            self._released = True
+            self._pool._finish(self._endpoint)
+
+    def __iter__(self):
+        try:
+            yield from self._stream
+        finally:
+            self._release()
+
+    def close(self):
+        self._stream.close()
+        self._release()
+
+
+class ClientPool:
+    def __init__(self, api_key, base_urls, max_retries=3, backoff=0.5, max_backoff=8.0, cooldown=5.0,
+                 hedge=False, hedge_quantile=0.95, hedge_min_samples=20, warmup=True, timeout=None):
+        """
+        :param api_key: API Key (shared by all endpoints)
+        :param base_urls: List of OpenAI-compatible base URLs
+        :param max_retries: Retries of a transient error before giving up
+        :param backoff: Base delay of the exponential backoff (seconds)
+        :param max_backoff: Upper bound of the backoff delay (seconds)
+        :param cooldown: Seconds a failing endpoint is avoided (doubles with consecutive failures)
+        :param hedge: Send a duplicate request when the first one exceeds the hedge_quantile latency
+        :param hedge_quantile: Latency quantile that triggers the hedged request
+        :param hedge_min_samples: Latency samples needed before hedging starts
+        :param warmup: Open a connection to every endpoint in the background right away
+        :param timeout: Request timeout passed to the OpenAI clients (None = SDK default)
+        """
+        if not base_urls:
+            raise ValueError("ClientPool needs at least one base_url")
+        self.endpoints = [Endpoint(api_key, url, timeout) for url in base_urls]
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cooldown = cooldown
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self._lock = threading.Lock()
+        self._latencies = {False: deque(maxlen=500), True: deque(maxlen=500)}  # by stream flag
+        self._hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge") if hedge else None
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        if warmup:
+            threading.Thread(target=self.warmup, daemon=True).start()
+
+    def warmup(self):
+        """Open a keep-alive connection to each endpoint (and note the ones that are down)"""
+        for endpoint in self.endpoints:
+            try:
+                endpoint.client.models.list()
+            except Exception:
+                self._fail(endpoint)
+
+    def _pick(self):
+        now = time.monotonic()
+        with self._lock:
+            healthy = [e for e in self.endpoints if e.cooldown_until <= now]
+            if healthy:
+                endpoint = min(healthy, key=lambda e: (e.outstanding, random.random()))
+            else:
+                endpoint = min(self.endpoints, key=lambda e: e.cooldown_until)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _finish(self, endpoint):
+        with self._lock:
+            endpoint.outstanding -= 1
+
+    def _fail(self, endpoint):
+        with self._lock:
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            endpoint.cooldown_until = time.monotonic() + self.cooldown * 2 ** (endpoint.consecutive_failures - 1)
+
+    def _attempt(self, kwargs):
+        endpoint = self._pick()
+        started = time.perf_counter()
+        try:
+            response = endpoint.client.chat.completions.create(**kwargs)
+        except Exception:
+            self._finish(endpoint)
+            self._fail(endpoint)
+            raise
+        latency = time.perf_counter() - started
+        stream = bool(kwargs.get("stream"))
+        with self._lock:
+            endpoint.consecutive_failures = 0
+            endpoint.latencies.append(latency)
+            self._latencies[stream].append(latency)
+        if stream:
+            return _PooledStream(self, endpoint, response)
+        self._finish(endpoint)
+        return response
+
+    def _create_with_retry(self, kwargs, control=None):
+        for attempt in range(self.max_retries + 1):
+            if control is not None:
+                if control.cancelled:
+                    raise Cancelled(control.reason)
+                remaining = control.remaining()
+                if remaining is not None and not kwargs.get("stream"):
+                    # Each attempt only gets what is left of the deadline
+                    kwargs = dict(kwargs, timeout=remaining)
+            try:
+                return self._attempt(kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                error = e
+            # Exponential backoff with full jitter
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+            if control is not None:
+                remaining = control.remaining()
+                if control.cancelled or (remaining is not None and delay >= remaining):
+                    raise error  # the run is over before a retry could be sent
+                if control.sleep(delay):
+                    raise error
+            else:
+                time.sleep(delay)
+            with self._lock:
+                self.retries += 1
+
+    def hedge_delay(self, stream):
+        """Latency after which a hedged request is sent (None = not enough samples yet)"""
+        samples = self._latencies[bool(stream)]
+        if not self.hedge or len(self.endpoints) < 2 or len(samples) < self.hedge_min_samples:
+            return None
+        return _quantile(samples, self.hedge_quantile)
+
+    def create(self, control=None, **kwargs):
+        """
+        :param control: Optional RunControl; no retry is sent once it is cancelled or past its deadline
+        """
+        delay = self.hedge_delay(kwargs.get("stream"))
+        if delay is None:
+            return self._create_with_retry(kwargs, control)
+
+        primary = self._hedge_pool.submit(self._create_with_retry, kwargs, control)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        with self._lock:
+            self.hedged += 1
+        hedge = self._hedge_pool.submit(self._create_with_retry, kwargs, control)
+        pending = [primary, hedge]
+        error = None
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                for loser in pending:
+                    loser.add_done_callback(_close_result)
+                if future is hedge:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return future.result()
+        raise error
+
+    def stats(self):
+        return {
+            "retries": self.retries,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "endpoints": [e.stats() for e in self.endpoints],
+        }
+
+
+def _close_result(future):
+    # The slower of two hedged requests: release its stream if it has one
+    if future.exception() is None and isinstance(future.result(), _PooledStream):
+        future.result().close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_client_pool(api_key, base_urls, **options):
+    """
+    Process-wide ClientPool for these endpoints and options, created on first use.
+    """
+    key = (api_key, tuple(base_urls), tuple(sorted(options.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ClientPool(api_key, base_urls, **options)
+        return pool
@@ -0,0 +1,36 @@
+"""
+Tools shared by several demos. Each demo registers them in its own ToolRegistry with
+`registry.add(calculate, description=...)`, so it can word the description for its task.
+"""
+from typing import Literal
+
+from tool_executor import tool_options
+
+
+@tool_options(read_only=True, cache_ttl=3600)
+def calculate(num1: float, num2: float, operator: Literal["+", "-", "*", "/"]):
+    """
+    Performs basic arithmetic operations (add, subtract, multiply, divide).
+
+    :param num1: The first number
+    :param num2: The second number
+    :param operator: The operator
+    """
+    try:
+        n1 = float(num1)
+        n2 = float(num2)
+    except ValueError:
+        return "Error: Invalid numbers"
+
+    if operator == '+':
+        return str(n1 + n2)
+    elif operator == '-':
+        return str(n1 - n2)
+    elif operator == '*':
+        return str(n1 * n2)
+    elif operator == '/':
+        if n2 == 0:
+            return "Error: Division by zero"
+        return str(n1 / n2)
+    else:
+        return f"Error: Unsupported operator {operator}"
@@ -0,0 +1,122 @@
+"""
+Token-budget-driven compaction of the agent's `messages` list.
+
+Everything in `messages` is resent on every request, so long runs pay for old
+reasoning and old 50k-char tool results again and again. ConversationCompactor
+shrinks the history in place before each request:
+
+1. reasoning_content is dropped from assistant messages of finished user turns
+   (everything before the last user message). Inside the current tool-calling
+   chain it is kept, because the API requires it to be passed back there.
+2. If the estimate is still above the budget, the oldest tool results (except the
+   most recent ones) are cut down to a short excerpt, oldest first, until the
+   history fits.
+"""
+
+
+def estimate_tokens(text):
+    """
+    Rough token estimate following the DeepSeek rule of thumb:
+    1 English character ~ 0.3 token, 1 Chinese character ~ 0.6 token.
+    """
+    if not text:
+        return 0
+    # CJK characters take 3 bytes in UTF-8, so this counts them without a Python-level loop
+    non_ascii = (len(text.encode("utf-8")) - len(text)) // 2
+    return int((len(text) - non_ascii) * 0.3 + non_ascii * 0.6) + 1
+
+
+def _get(message, key):
+    # Messages are dicts, except assistant messages without reasoning_content,
+    # which are appended as SDK objects
+    if isinstance(message, dict):
+        return message.get(key)
+    return getattr(message, key, None)
+
+
+def message_tokens(message):
+    tokens = 4  # per-message overhead of the chat template
+    tokens += estimate_tokens(_get(message, "content") or "")
+    tokens += estimate_tokens(_get(message, "reasoning_content") or "")
+    for tool_call in _get(message, "tool_calls") or []:
+        function = tool_call["function"] if isinstance(tool_call, dict) else tool_call.function
+        arguments = function["arguments"] if isinstance(function, dict) else function.arguments
+        tokens += estimate_tokens(arguments) + 8
+    return tokens
+
+
+def conversation_tokens(messages):
+    return sum(message_tokens(m) for m in messages)
+
+
+class ConversationCompactor:
+    def __init__(self, token_budget=32000, excerpt_chars=500, keep_recent_tool_results=2):
+        """
+        :param token_budget: Target size of the history (estimated prompt tokens)
+        :param excerpt_chars: Characters kept from the start of a shrunk tool result
+        :param keep_recent_tool_results: Number of latest tool results never shrunk
+        """
+        self.token_budget = token_budget
+        self.excerpt_chars = excerpt_chars
+        self.keep_recent_tool_results = keep_recent_tool_results
+        self.total_saved = 0
+        self.compactions = 0
+
+    def compact(self, messages):
+        """
+        Compact `messages` in place.
+
+        :return: {"before", "after", "saved", "reasoning_dropped", "tool_results_shrunk"}
+                 (token counts are estimates)
+        """
+        before = conversation_tokens(messages)
+        reasoning_dropped = self._drop_finished_reasoning(messages)
+
+        tool_results_shrunk = 0
+        after = conversation_tokens(messages) if reasoning_dropped else before
+        if after > self.token_budget:
+            tool_results_shrunk, after = self._shrink_tool_results(messages, after)
+
+        saved = before - after
+        if saved > 0:
+            self.total_saved += saved
+            self.compactions += 1
+        return {
+            "before": before,
+            "after": after,
+            "saved": saved,
+            "reasoning_dropped": reasoning_dropped,
+            "tool_results_shrunk": tool_results_shrunk,
+        }
+
+    def _drop_finished_reasoning(self, messages):
+        last_user = max((i for i, m in enumerate(messages) if _get(m, "role") == "user"), default=-1)
+        dropped = 0
+        for message in messages[:last_user]:
+            if isinstance(message, dict) and message.get("role") == "assistant" and "reasoning_content" in message:
+                del message["reasoning_content"]
+                dropped += 1
+        return dropped
+
+    def _shrink_tool_results(self, messages, current):
+        tool_indexes = [i for i, m in enumerate(messages) if _get(m, "role") == "tool"]
+        if self.keep_recent_tool_results:
+            tool_indexes = tool_indexes[:-self.keep_recent_tool_results]
+
+        shrunk = 0
+        for i in tool_indexes:
+            if current <= self.token_budget:
+                break
+            message = messages[i]
+            content = message.get("content") or ""
+            if len(content) <= self.excerpt_chars * 2:
+                continue
+            old_tokens = message_tokens(message)
+            omitted = len(content) - self.excerpt_chars
+            message["content"] = (
+                content[:self.excerpt_chars]
+                + f"\n...({omitted} characters omitted to save context; call the tool again if needed)..."
+            )
+            current -= old_tokens - message_tokens(message)
+            shrunk += 1
+        return shrunk, current
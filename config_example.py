@@ -18,3 +18,50 @@ API_CONFIG = {
 #     "model_name": "deepseek-v32",
 #     "extra_body": {"chat_template_kwargs": {"thinking": True}}
 # }
+
+# === Option 3: Several Local Replicas ===
+# Requests are balanced across base_urls (least outstanding requests), transient errors
+# are retried on another replica, and slow requests can be hedged
+# API_CONFIG = {
+#     "api_key": "sk-test",
+#     "base_urls": ["http://replica1/v1", "http://replica2/v1"],
+#     "model_name": "deepseek-v32",
+#     "extra_body": {"chat_template_kwargs": {"thinking": True}},
+#     "client_options": {"max_retries": 3, "hedge": True}
+# }
+
+# === Optional: Record / Replay ===
+# Add these keys to API_CONFIG to record every model call to a JSONL cassette,
+# or to replay a cassette offline (replay_latency_scale: 1 = original latency, 0 = instant)
+#     "record_path": "run.jsonl",
+#     "replay_path": "run.jsonl",
+#     "replay_latency_scale": 1.0,
+
+# === Optional: Deadlines ===
+# Cancel a run when one turn or the whole session takes too long (seconds)
+#     "turn_timeout": 120,
+#     "session_timeout": 600,
+
+# === Optional: Checkpoints ===
+# Save messages and tool state after every turn to a new log in this directory;
+# continue an interrupted run with: python checkpoint.py resume <log>
+#     "checkpoint_dir": "checkpoints",
+
+# === Optional: Loop Guard ===
+# Detect repeated tool calls and turns going back and forth: "nudge" answers repeats from
+# history with a note, "warn" only adds a warning, "stop" ends the run early
+#     "loop_guard": "nudge",
+
+# === Optional: Thinking-Mode Routing ===
+# Run mechanical turns (after read-only tools, or after the listed tools) without thinking
+#     "router": {"fast": {"model_name": "deepseek-chat"}, "fast_after": ["fill_by_label", "fill_cell"]},
+
+# === Optional: Timeline Tracing ===
+# Write a Chrome trace-event file per run (open it in https://ui.perfetto.dev)
+#     "trace_dir": "traces",
+
+# === Optional: Web Page Cache (demo_web_search) ===
+# A top-level setting (not an API_CONFIG key): keep fetched pages and their extracted text on
+# disk across runs, following the sites' Cache-Control / ETag headers; "offline": True serves
+# only from the cache. Inspect or empty it with: python http_cache.py stats|clear .web_cache
+# WEB_CACHE = {"directory": ".web_cache", "max_bytes": 200 * 1024 * 1024, "offline": False}
@@ -1,112 +1,581 @@
-import json
+import os
+import time
 import traceback
-from openai import OpenAI
+from cassette import RecordingClient, ReplayClient
+from checkpoint import Checkpointer, run_file_name
+from client_pool import ClientPool, get_client_pool
+from event_sinks import publish_events
+from loop_guard import LoopGuard
+from run_control import CANCEL_REASONS, Cancelled, RunControl
+from session_stats import SessionStats, TurnStats, read_usage
+from thinking_router import RouteContext, ThinkingRouter
+from tool_executor import SpeculativeRunner, ToolExecutor
+from tool_schema import get_validators
+from tracing import Tracer, recording, trace_events
+
+
+def unpack_message(raw_message):
+    """
+    Turn a non-streaming response message into what gets appended to `messages`.
+
+    Returns (message, reasoning_content, content, tool_calls) where tool_calls is a
+    list of (call_id, func_name, args_str).
+    """
+    message = raw_message
+
+    # Try multiple ways to get reasoning_content to support different SDK versions
+    reasoning_content = getattr(raw_message, 'reasoning_content', None)
+    if reasoning_content:
+        # Key: Pass reasoning_content back to the server
+        # Construct a dictionary containing reasoning_content and add it to messages
+        message = raw_message.model_dump(exclude_none=True)
+        message['reasoning_content'] = reasoning_content
+
+    tool_calls = [
+        (tc.id, tc.function.name, tc.function.arguments)
+        for tc in (raw_message.tool_calls or [])
+    ]
+    return message, reasoning_content, raw_message.content, tool_calls
+
+
+class StreamAssembler:
+    """
+    Rebuilds an assistant message from streamed chunks.
+
+    feed() turns one chunk into delta events; message() returns the assembled message
+    in the same shape as message.model_dump(exclude_none=True) on the non-streaming
+    path, including reasoning_content.
+    """
+    def __init__(self, turn, started):
+        self.turn = turn
+        self.started = started
+        self.ttft = None
+        self.usage = None
+        self.reasoning_parts = []
+        self.content_parts = []
+        self.tool_calls = {}  # index -> {"id", "name", "arguments"}
+
+    def _mark_first_token(self):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.started
+
+    def feed(self, chunk):
+        events = []
+        if getattr(chunk, 'usage', None):
+            # Sent in a final chunk without choices when stream_options.include_usage is set
+            self.usage = chunk.usage
+        if not chunk.choices:
+            return events
+        delta = chunk.choices[0].delta
+        if delta is None:
+            return events
+
+        reasoning_delta = getattr(delta, 'reasoning_content', None)
+        if reasoning_delta:
+            self._mark_first_token()
+            self.reasoning_parts.append(reasoning_delta)
+            events.append({"type": "reasoning_delta", "turn": self.turn, "delta": reasoning_delta})
+
+        if delta.content is not None:
+            self.content_parts.append(delta.content)
+            if delta.content:
+                self._mark_first_token()
+                events.append({"type": "content_delta", "turn": self.turn, "delta": delta.content})
+
+        for tc_delta in delta.tool_calls or []:
+            self._mark_first_token()
+            slot = self.tool_calls.setdefault(tc_delta.index, {"id": None, "name": "", "arguments": ""})
+            args_delta = ""
+            if tc_delta.id:
+                slot["id"] = tc_delta.id
+            if tc_delta.function is not None:
+                args_delta = tc_delta.function.arguments or ""
+                slot["name"] += tc_delta.function.name or ""
+                slot["arguments"] += args_delta
+            events.append({
+                "type": "tool_call_delta",
+                "turn": self.turn,
+                "index": tc_delta.index,
+                "id": slot["id"],
+                "name": slot["name"],
+                "arguments": args_delta,
+            })
+        return events
+
+    def message(self):
+        msg_dict = {"role": "assistant"}
+        if self.content_parts:
+            msg_dict["content"] = "".join(self.content_parts)
+        if self.tool_calls:
+            msg_dict["tool_calls"] = [
+                {
+                    "id": slot["id"],
+                    "function": {"arguments": slot["arguments"], "name": slot["name"]},
+                    "type": "function"
+                }
+                for _, slot in sorted(self.tool_calls.items())
+            ]
+        if self.reasoning_parts:
+            msg_dict["reasoning_content"] = "".join(self.reasoning_parts)
+        return msg_dict
+
+    def unpack(self):
+        """Same return value as unpack_message()"""
+        msg_dict = self.message()
+        tool_calls = [
+            (tc["id"], tc["function"]["name"], tc["function"]["arguments"])
+            for tc in msg_dict.get("tool_calls", [])
+        ]
+        return msg_dict, msg_dict.get("reasoning_content"), msg_dict.get("content"), tool_calls
+
+
+class ConsolePrinter:
+    """Console rendering of run_events() output"""
+    def __init__(self):
+        self._printing = None  # which delta stream is currently being printed
+
+    def __call__(self, event):
+        etype = event["type"]
+
+        if etype == "turn_start":
+            print(f"\n--- Turn {event['turn']} ---")
+            self._printing = None
+
+        elif etype == "reasoning_delta":
+            if self._printing != "reasoning":
+                print("\n[Thinking Process]:")
+                self._printing = "reasoning"
+            print(event["delta"], end="", flush=True)
+
+        elif etype == "content_delta":
+            if self._printing != "content":
+                print("\n[Final Content]:")
+                self._printing = "content"
+            print(event["delta"], end="", flush=True)
+
+        elif etype == "message":
+            if event["streamed"]:
+                if self._printing is not None:
+                    print("\n")
+                if not event["reasoning_content"]:
+                    print("\n[Thinking Process]: None (Not found in response)\n")
+                if event["ttft"] is not None:
+                    print(f"[*] Time to first token: {event['ttft']:.2f}s, total: {event['latency']:.2f}s")
+            else:
+                # 1. Reasoning Content
+                if event["reasoning_content"]:
+                    print(f"\n[Thinking Process]:\n{event['reasoning_content']}\n")
+                else:
+                    print("\n[Thinking Process]: None (Not found in response)\n")
+                # 2. Final Content
+                if event["content"]:
+                    print(f"[Final Content]:\n{event['content']}\n")
+            self._printing = None
+
+        elif etype == "tool_call":
+            print(f"[Tool Call]: {event['name']}({event['arguments']})")
+
+        elif etype == "tool_result":
+            result_str = event["content"]
+            if event["error"]:
+                print(result_str)
+            elif len(result_str) < 1000:
+                print(f"[Tool Result]{' (cached)' if event['cached'] else ''}:\n{result_str}")
+            else:
+                preview = result_str[:200].replace('\n', ' ') + "..."
+                print(f"[Tool Result]{' (cached)' if event['cached'] else ''}: {preview}")
+
+        elif etype == "usage":
+            usage = event["usage"]
+            if usage:
+                print(f"[*] Usage: prompt {usage['prompt_tokens']} "
+                      f"(cache hit {usage['prompt_cache_hit_tokens']}, miss {usage['prompt_cache_miss_tokens']}), "
+                      f"completion {usage['completion_tokens']} (reasoning {usage['reasoning_tokens']}) | "
+                      f"LLM {event['llm_latency']:.2f}s, tools {event['tool_latency']:.2f}s")
+
+        elif etype == "compaction":
+            print(f"[*] Compacted history: ~{event['before']} -> ~{event['after']} tokens "
+                  f"(saved ~{event['saved']}; {event['reasoning_dropped']} reasoning dropped, "
+                  f"{event['tool_results_shrunk']} tool results shrunk)")
+
+        elif etype == "trace":
+            print(f"[*] Trace: {event['path']} ({event['events']} events)")
+
+        elif etype == "route":
+            print(f"[*] Mode: {event['mode']} ({event['model']}, rule: {event['rule'] or 'default'})")
+
+        elif etype == "loop":
+            what = "Repeated calls" if event["kind"] == "repeat" else "Oscillating turns"
+            print(f"[!] {what} detected ({'; '.join(event['calls'])}), policy: {event['action']}")
+
+        elif etype == "checkpoint":
+            print(f"[*] Checkpoint: turn {event['turn']} -> {event['path']} ({event['bytes'] / 1024:.1f} KB)")
+
+        elif etype == "speculation":
+            print(f"[*] Speculative tool calls: {event['used']} used, {event['discarded']} discarded")
+
+        elif etype == "error":
+            print(f"[!] {event['message']}")
+            if event.get("traceback"):
+                print(event["traceback"], end="")
+
+        elif etype == "done":
+            if event["reason"] == "completed":
+                print("\n=== Turn Loop Completed (No more tool calls) ===")
+            elif event["reason"] in CANCEL_REASONS:
+                print(f"\n[!] Run cancelled ({event['reason']})")
+            elif event["reason"] == "loop":
+                print("\n[!] Run stopped early: the model kept repeating the same actions")
+            if event.get("stats"):
+                print(f"[*] Session: {event['stats'].summary()}")
+
+
+def message_event(turn, message, reasoning_content, content, tool_calls, streamed, ttft, started):
+    return {
+        "type": "message",
+        "turn": turn,
+        "message": message,
+        "reasoning_content": reasoning_content,
+        "content": content,
+        "tool_calls": tool_calls,
+        "streamed": streamed,
+        "ttft": ttft,
+        "latency": time.perf_counter() - started,
+    }
+
+
+def done_event(turn, reason, stats, session_started):
+    stats.stop_reason = reason
+    stats.wall_time = time.perf_counter() - session_started
+    return {"type": "done", "turn": turn, "reason": reason, "stats": stats}
+
+
+def tool_result_event(turn, call_id, func_name, result):
+    if result is None:
+        return {"type": "error", "turn": turn, "message": f"Error: Tool {func_name} not found in tool_map"}
+    return {
+        "type": "tool_result",
+        "turn": turn,
+        "id": call_id,
+        "name": func_name,
+        "content": result["message"]["content"],
+        "error": result["error"],
+        "cached": result.get("cached", False),
+        "invalid": result.get("invalid", False),
+    }
+
 
 class DeepSeekAgent:
-    def __init__(self, api_key, base_url, model_name, extra_body=None):
+    def __init__(self, api_key, base_url=None, model_name=None, extra_body=None, stream=False, tool_executor=None,
+                 speculative=False, compactor=None, record_path=None, replay_path=None, replay_latency_scale=1.0,
+                 base_urls=None, client_options=None, turn_timeout=None, session_timeout=None, checkpoint_dir=None,
+                 loop_guard=None, router=None, trace_dir=None):
         """
         Initialize DeepSeek Agent
-        
+
         :param api_key: API Key
         :param base_url: Base URL
         :param model_name: Model Name
         :param extra_body: Extra parameters passed to the API (e.g., for enabling thinking mode)
+        :param stream: Default for run(): stream reasoning/content/tool-call deltas as they arrive
+        :param tool_executor: ToolExecutor used to run the tool calls of a turn (default: 4 threads)
+        :param speculative: In stream mode, start read_only tools as soon as their arguments
+                            are complete, overlapping tool latency with generation
+        :param compactor: Optional ConversationCompactor applied to `messages` before each request
+        :param record_path: Append every model request/response to this JSONL cassette
+        :param replay_path: Serve responses from this cassette instead of calling the API
+        :param replay_latency_scale: Multiplier for the recorded latency in replay mode (0 = instant)
+        :param base_urls: Several OpenAI-compatible endpoints (e.g., vLLM replicas) to balance across,
+                          instead of base_url
+        :param client_options: ClientPool options (max_retries, backoff, hedge, warmup, timeout, ...)
+        :param turn_timeout: Seconds one turn (model request + tools) may take before the run is cancelled
+        :param session_timeout: Seconds a whole run may take before it is cancelled
+        :param checkpoint_dir: Checkpoint every run to a new log in this directory (see checkpoint.py)
+        :param loop_guard: Optional LoopGuard (or just its policy: "nudge", "warn", "stop") that detects
+                           repeated tool calls / oscillating turns and answers them from history,
+                           warns the model, or stops the run
+        :param router: Optional ThinkingRouter (or a dict of its options) choosing thinking or fast mode
+                       for each turn
+        :param trace_dir: Write a Chrome trace-event JSON of every run to this directory (see tracing.py)
         """
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.pool = None
+        if replay_path:
+            self.client = ReplayClient(replay_path, latency_scale=replay_latency_scale)
+        else:
+            # Shared by all agents of the process with the same endpoints
+            self.client = self.pool = get_client_pool(api_key, base_urls or [base_url], **(client_options or {}))
+            if record_path:
+                self.client = RecordingClient(self.client, record_path)
         self.model_name = model_name
         self.extra_body = extra_body or {}
+        self.stream = stream
+        self.tool_executor = tool_executor or ToolExecutor()
+        self.speculative = speculative
+        self.compactor = compactor
+        self.turn_timeout = turn_timeout
+        self.session_timeout = session_timeout
+        self.checkpoint_dir = checkpoint_dir
+        self.loop_guard = LoopGuard(loop_guard) if isinstance(loop_guard, str) else loop_guard
+        self.router = ThinkingRouter(**router) if isinstance(router, dict) else router
+        self.trace_dir = trace_dir
 
-    def run(self, messages, tools=None, tool_map=None, max_turns=10):
+    def run(self, messages, tools=None, tool_map=None, max_turns=10, stream=None, sinks=None, control=None,
+            checkpoint=None):
         """
         Run the Agent loop
-        
+
         :param messages: Initial message list
         :param tools: Tool definitions list (JSON Schema)
         :param tool_map: Tool function mapping dictionary {name: function}
         :param max_turns: Maximum number of conversation turns
+        :param stream: Print deltas as they arrive (None = use the value given at init)
+        :param sinks: Event sinks (see event_sinks.py) fed off the agent thread
+                      (None = console output only)
+        :param control: Optional RunControl, see run_events()
+        :param checkpoint: Optional Checkpointer, see run_events()
+        :return: SessionStats with per-turn usage, cache hits and latency
         """
         print(f"[*] Agent started with model: {self.model_name}")
-        
-        for i in range(max_turns):
-            print(f"\n--- Turn {i+1} ---")
+
+        # Output is rendered on the sinks' own threads, so a slow terminal never stalls the loop.
+        # The sinks are started with the run's tracer current, so that their spans join its trace
+        tracer = self.new_tracer()
+        with recording(tracer):
+            done = publish_events(self.run_events(messages, tools, tool_map, max_turns, stream, control, checkpoint,
+                                                  tracer),
+                                  [ConsolePrinter()] if sinks is None else sinks)
+        stats = done["stats"] if done else None
+        cache = getattr(self.tool_executor, 'cache', None)
+        if cache is not None:
+            print(f"[*] Tool cache: {cache.stats()}")
+        pool_stats = self.client.stats() if isinstance(self.client, ClientPool) else None
+        if pool_stats and (pool_stats["retries"] or pool_stats["hedged"]):
+            print(f"[*] Client pool: {pool_stats['retries']} retries, {pool_stats['hedged']} hedged "
+                  f"({pool_stats['hedge_wins']} won)")
+        return stats
+
+    def new_tracer(self):
+        """Tracer writing a new trace file in trace_dir, or None without a trace_dir"""
+        if not self.trace_dir:
+            return None
+        return Tracer(os.path.join(self.trace_dir, run_file_name(".trace.json")))
+
+    def run_events(self, messages, tools=None, tool_map=None, max_turns=10, stream=None, control=None,
+                   checkpoint=None, tracer=None):
+        """
+        Run the Agent loop as a generator of events.
+
+        Every event is a dict with a "type" key:
+        - turn_start:       {"turn"}
+        - route:            {"turn", "mode", "rule", "model"}        (router only; mode is "thinking" or "fast")
+        - reasoning_delta:  {"turn", "delta"}                      (stream only)
+        - content_delta:    {"turn", "delta"}                      (stream only)
+        - tool_call_delta:  {"turn", "index", "id", "name", "arguments"}  (stream only, arguments is a fragment)
+        - message:          {"turn", "message", "reasoning_content", "content", "tool_calls", "streamed", "ttft", "latency"}
+        - tool_call:        {"turn", "id", "name", "arguments"}
+        - tool_result:      {"turn", "id", "name", "content", "error", "cached", "invalid"}
+        - speculation:      {"turn", "used", "discarded"}            (stream + speculative only)
+        - compaction:       {"turn", "before", "after", "saved", "reasoning_dropped", "tool_results_shrunk"}
+        - usage:            {"turn", "usage", "llm_latency", "ttft", "tool_latency", "tool_calls"}  (end of each turn)
+        - loop:             {"turn", "kind", "calls", "action"}      (loop_guard only; kind is "repeat" or "oscillation")
+        - checkpoint:       {"turn", "path", "bytes"}                (after each turn, with a checkpoint only)
+        - trace:            {"turn", "path", "events"}               (trace_dir only, right before done)
+        - error:            {"turn", "message", "traceback"?}
+        - done:             {"turn", "reason", "stats"}          (stats is a SessionStats)
+
+        "reason" of the done event is "completed", "max_turns", "error", "loop" (stopped by
+        the loop guard), or one of
+        run_control.CANCEL_REASONS when the run was stopped or hit a deadline.
+
+        `messages` is extended in place exactly as in run(). In stream mode the assistant
+        message is rebuilt from the deltas into the same dict shape as the non-streaming
+        path (including reasoning_content), and "ttft" is the time to the first delta.
+
+        To render or record the events without slowing the loop down, pass the generator
+        to event_sinks.publish_events() with the sinks to feed (as run() does).
+
+        :param messages: Initial message list
+        :param tools: Tool definitions list (JSON Schema)
+        :param tool_map: Tool function mapping dictionary {name: function}
+        :param max_turns: Maximum number of conversation turns
+        :param stream: Use a streaming request (None = use the value given at init)
+        :param control: Optional RunControl to stop the run from another thread; created
+                        from turn_timeout / session_timeout when not given
+        :param checkpoint: Optional Checkpointer saving `messages` and the tool state after every
+                           turn; a resumed one continues after its last turn (max_turns counts the
+                           turns of the whole run). Created in checkpoint_dir when not given.
+        :param tracer: Optional tracing.Tracer recording this run (see tracing.py); created by
+                       new_tracer() when not given
+        """
+        stream = self.stream if stream is None else stream
+        if checkpoint is None and self.checkpoint_dir:
+            checkpoint = Checkpointer.in_directory(self.checkpoint_dir, tool_map, meta={"model": self.model_name})
+        if control is None and (self.turn_timeout or self.session_timeout):
+            control = RunControl(self.session_timeout, self.turn_timeout)
+        events = self._run_turns(messages, tools, tool_map, max_turns, stream, control, checkpoint)
+        tracer = tracer or self.new_tracer()
+        if tracer:
+            events = trace_events(events, tracer, self.model_name)
+        if control is None:
+            yield from events
+            return
+        control.start_session()
+        try:
+            yield from events
+        finally:
+            control.finish()
+
+    def _run_turns(self, messages, tools, tool_map, max_turns, stream, control, checkpoint):
+        stats = SessionStats(self.model_name)
+        session_started = time.perf_counter()
+        # Compiled once per tools list; arguments are checked and coerced before a tool runs
+        validators = get_validators(tools)
+        loops = self.loop_guard.session() if self.loop_guard else None
+        last_calls, last_results = [], []  # previous turn, for the router
+
+        # A resumed run continues after its last checkpointed turn
+        for i in range(checkpoint.turn if checkpoint else 0, max_turns):
+            turn = i + 1
+            if control:
+                if control.cancelled:
+                    yield done_event(i, control.reason, stats, session_started)
+                    return
+                control.start_turn()
+            yield {"type": "turn_start", "turn": turn}
+
+            if self.compactor:
+                report = self.compactor.compact(messages)
+                if report["saved"] > 0:
+                    yield dict(report, type="compaction", turn=turn)
+
+            mode = None
+            model_name, extra_body, request_messages = self.model_name, self.extra_body, messages
+            if self.router:
+                mode, rule = self.router.route(RouteContext(turn, messages, tool_map, last_calls, last_results))
+                model_name, extra_body = self.router.request_options(mode, self.model_name, self.extra_body)
+                request_messages = self.router.request_messages(mode, messages)
+                yield {"type": "route", "turn": turn, "mode": mode, "rule": rule, "model": model_name}
+
+            started = time.perf_counter()
+            ttft = None
+            speculation = None
             try:
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=messages,
-                    tools=tools,
-                    extra_body=self.extra_body
-                )
+                if stream:
+                    response = self._create(
+                        control,
+                        model=model_name,
+                        messages=request_messages,
+                        tools=tools,
+                        extra_body=extra_body,
+                        stream=True,
+                        stream_options={"include_usage": True}
+                    )
+                    assembler = StreamAssembler(turn, started)
+                    if self.speculative:
+                        speculation = SpeculativeRunner(self.tool_executor, tool_map, validators)
+                    for chunk in (control.iterate(response) if control else response):
+                        events = assembler.feed(chunk)
+                        yield from events
+                        if speculation and any(e["type"] == "tool_call_delta" for e in events):
+                            speculation.poll(assembler.tool_calls)
+                    message, reasoning_content, content, tool_calls = assembler.unpack()
+                    ttft = assembler.ttft
+                    usage = assembler.usage
+                else:
+                    response = self._create(
+                        control,
+                        model=model_name,
+                        messages=request_messages,
+                        tools=tools,
+                        extra_body=extra_body
+                    )
+                    message, reasoning_content, content, tool_calls = unpack_message(response.choices[0].message)
+                    usage = response.usage
+            except Cancelled as e:
+                # The partial assistant message is dropped, `messages` stays valid
+                yield done_event(turn, e.reason, stats, session_started)
+                return
             except Exception as e:
-                print(f"[!] API Error: {e}")
-                traceback.print_exc()
-                break
-
-            message = response.choices[0].message
-            
-            # 1. Handle Reasoning Content
-            # Try multiple ways to get reasoning_content to support different SDK versions
-            reasoning_content = getattr(message, 'reasoning_content', None)
-            
-            if reasoning_content:
-                print(f"\n[Thinking Process]:\n{reasoning_content}\n")
-                
-                # Key: Pass reasoning_content back to the server
-                # Construct a dictionary containing reasoning_content and add it to messages
-                msg_dict = message.model_dump(exclude_none=True)
-                msg_dict['reasoning_content'] = reasoning_content
-                messages.append(msg_dict)
-            else:
-                print("\n[Thinking Process]: None (Not found in response)\n")
-                messages.append(message)
-
-            # 2. Print Final Content
-            if message.content:
-                print(f"[Final Content]:\n{message.content}\n")
-
-            # 3. Handle Tool Calls
-            if message.tool_calls:
-                for tool_call in message.tool_calls:
-                    func_name = tool_call.function.name
-                    args_str = tool_call.function.arguments
-                    print(f"[Tool Call]: {func_name}({args_str})")
-                    
-                    if tool_map and func_name in tool_map:
-                        try:
-                            args = json.loads(args_str)
-                            result = tool_map[func_name](**args)
-                            
-                            # Print result preview
-                            result_str = str(result)
-                            if len(result_str) < 1000:
-                                print(f"[Tool Result]:\n{result_str}")
-                            else:
-                                preview = result_str[:200].replace('\n', ' ') + "..."
-                                print(f"[Tool Result]: {preview}")
-                            
-                            messages.append({
-                                "role": "tool",
-                                "tool_call_id": tool_call.id,
-                                "content": result_str
-                            })
-                        except json.JSONDecodeError:
-                            error_msg = f"Error: Failed to decode arguments: {args_str}"
-                            print(error_msg)
-                            messages.append({
-                                "role": "tool",
-                                "tool_call_id": tool_call.id,
-                                "content": error_msg
-                            })
-                        except Exception as e:
-                            error_msg = f"Error executing tool {func_name}: {str(e)}"
-                            print(error_msg)
-                            messages.append({
-                                "role": "tool",
-                                "tool_call_id": tool_call.id,
-                                "content": error_msg
-                            })
-                    else:
-                        print(f"[!] Error: Tool {func_name} not found in tool_map")
-            else:
+                yield {"type": "error", "turn": turn, "message": f"API Error: {e}", "traceback": traceback.format_exc()}
+                yield done_event(turn, "error", stats, session_started)
+                return
+
+            if self.router:
+                message = self.router.prepare_message(mode, message)
+            messages.append(message)
+            msg_event = message_event(turn, message, reasoning_content, content, tool_calls, stream, ttft, started)
+            yield msg_event
+            turn_stats = TurnStats(turn, read_usage(usage), msg_event["latency"], ttft, tool_calls=len(tool_calls),
+                                   mode=mode)
+            stats.add_turn(turn_stats)
+
+            if not tool_calls:
                 # No tool calls, usually means task completed or user input needed
-                print("\n=== Turn Loop Completed (No more tool calls) ===")
-                break
+                yield dict(turn_stats.to_dict(), type="usage")
+                if checkpoint:
+                    yield self._checkpoint(checkpoint, turn, messages, "completed")
+                yield done_event(turn, "completed", stats, session_started)
+                return
+
+            for call_id, func_name, args_str in tool_calls:
+                yield {"type": "tool_call", "turn": turn, "id": call_id, "name": func_name, "arguments": args_str}
+
+            # Independent calls run concurrently; tool messages keep the tool_call order
+            precomputed = speculation.take(tool_calls) if speculation else None
+            if speculation and speculation.started:
+                yield {"type": "speculation", "turn": turn, "used": speculation.used, "discarded": speculation.discarded}
+            if loops:
+                # Repeated read_only calls are answered from history instead of being run again ("nudge")
+                precomputed = dict(precomputed or {})
+                answered = loops.before_tools(tool_calls, tool_map)
+                turn_stats.calls_saved = len(answered)
+                precomputed.update(answered)
+            tools_started = time.perf_counter()
+            results = self.tool_executor.run_calls(tool_calls, tool_map, precomputed=precomputed, control=control,
+                                                   validators=validators)
+            turn_stats.tool_latency = time.perf_counter() - tools_started
+            turn_stats.invalid_tool_calls = sum(1 for r in results if r is not None and r.get("invalid"))
+            loop_events = loops.after_tools(turn, tool_calls, results, tool_map) if loops else []
+            for event in loop_events:
+                if event["kind"] == "repeat":
+                    turn_stats.repeated_calls = len(event["calls"])
+                else:
+                    turn_stats.oscillation = True
+            for (call_id, func_name, _), result in zip(tool_calls, results):
+                if result is not None:
+                    messages.append(result["message"])
+                yield tool_result_event(turn, call_id, func_name, result)
+            last_calls, last_results = tool_calls, results
+            yield from loop_events
+            yield dict(turn_stats.to_dict(), type="usage")
+            stop_loop = loops is not None and loops.stopped
+            if checkpoint:
+                finished = "loop" if stop_loop else "max_turns" if turn == max_turns else None
+                yield self._checkpoint(checkpoint, turn, messages, finished)
+
+            if stop_loop:
+                stats.stop_turns_saved = max_turns - turn
+                yield done_event(turn, "loop", stats, session_started)
+                return
+
+            if control and control.cancelled:
+                yield done_event(turn, control.reason, stats, session_started)
+                return
+
+        yield done_event(max_turns, "max_turns", stats, session_started)
+
+    def _checkpoint(self, checkpoint, turn, messages, finished):
+        size = checkpoint.save(turn, messages, finished)
+        return {"type": "checkpoint", "turn": turn, "path": checkpoint.path, "bytes": size}
+
+    def _create(self, control, **kwargs):
+        if control is None:
+            return self.client.chat.completions.create(**kwargs)
+        remaining = control.remaining()
+        if remaining is not None and not kwargs.get("stream"):
+            # A non-streaming request cannot be closed from outside; let it time out at the deadline
+            kwargs["timeout"] = remaining
+        if self.pool is not None:
+            # So that the pool does not retry a request of a run that is already over
+            kwargs["control"] = control
+        return control.call(self.client.chat.completions.create, **kwargs)
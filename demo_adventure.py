@@ -1,7 +1,14 @@
+import json
+from typing import Literal
 from deepseek_agent import DeepSeekAgent
 from config import API_CONFIG
+from tool_registry import ToolRegistry
+
+registry = ToolRegistry()
+Direction = Literal["north", "south", "east", "west"]
 
 # --- Game Engine ---
+# All actions read or change the shared game state, so they never run concurrently
 class GameState:
     def __init__(self):
         self.current_room = "start_room"
@@ -30,6 +37,16 @@ class GameState:
             }
         }
 
+    # Checkpointing (see checkpoint.py): the whole game state as plain JSON
+    def snapshot(self):
+        return {"current_room": self.current_room, "inventory": self.inventory, "rooms": self.rooms}
+
+    def restore(self, state):
+        state = json.loads(json.dumps(state))  # own copy
+        self.current_room = state["current_room"]
+        self.inventory = state["inventory"]
+        self.rooms = state["rooms"]
+
     def get_map(self):
         hallway = self.rooms["hallway"]
         west_door_symbol = "---"
@@ -75,14 +92,22 @@ class GameState:
         
         return f"\nMap:\n{top_line}\n{vertical_line}\n{bottom_line}\n(* indicates your current location, -X- indicates a locked door)\n"
 
+    @registry.tool(concurrent=False, read_only=True)
     def look(self):
+        """Observes the current environment, showing room description, items, and exits."""
         room = self.rooms[self.current_room]
         desc = room["description"]
         items_desc = f" 这里有: {', '.join(room['items'])}." if room["items"] else ""
         exits_desc = f" 出口有: {', '.join(room['exits'].keys())}."
         return f"{desc}{items_desc}{exits_desc} (当前持有物品: {', '.join(self.inventory) if self.inventory else '无'})\n{self.get_map()}"
 
-    def move(self, direction):
+    @registry.tool(concurrent=False)
+    def move(self, direction: Direction):
+        """
+        Moves in a specified direction.
+
+        :param direction: The direction to move
+        """
         room = self.rooms[self.current_room]
         if direction in room["exits"]:
             if "locked_exits" in room and direction in room["locked_exits"]:
@@ -97,7 +122,13 @@ class GameState:
         else:
             return "那个方向没有路。"
 
-    def take(self, item):
+    @registry.tool(concurrent=False)
+    def take(self, item: str):
+        """
+        Picks up an item from the current room.
+
+        :param item: The name of the item to pick up
+        """
         room = self.rooms[self.current_room]
         if item in room["items"]:
             room["items"].remove(item)
@@ -106,7 +137,13 @@ class GameState:
         else:
             return f"这里没有 {item}。"
 
-    def unlock(self, direction):
+    @registry.tool(concurrent=False)
+    def unlock(self, direction: Direction):
+        """
+        Attempts to unlock a door in a specified direction.
+
+        :param direction: The direction of the door to unlock
+        """
         room = self.rooms[self.current_room]
         if "locked_exits" in room and direction in room["locked_exits"]:
             if "key" in self.inventory:
@@ -120,65 +157,8 @@ class GameState:
 # --- Tool Definitions ---
 game = GameState()
 
-tools = [
-    {
-        "type": "function",
-        "function": {
-            "name": "look",
-            "description": "Observes the current environment, showing room description, items, and exits.",
-            "parameters": {"type": "object", "properties": {}, "required": []}
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "move",
-            "description": "Moves in a specified direction.",
-            "parameters": {
-                "type": "object", 
-                "properties": {
-                    "direction": {"type": "string", "enum": ["north", "south", "east", "west"], "description": "The direction to move"}
-                }, 
-                "required": ["direction"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "take",
-            "description": "Picks up an item from the current room.",
-            "parameters": {
-                "type": "object", 
-                "properties": {
-                    "item": {"type": "string", "description": "The name of the item to pick up"}
-                }, 
-                "required": ["item"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "unlock",
-            "description": "Attempts to unlock a door in a specified direction.",
-            "parameters": {
-                "type": "object", 
-                "properties": {
-                    "direction": {"type": "string", "enum": ["north", "south", "east", "west"], "description": "The direction of the door to unlock"}
-                }, 
-                "required": ["direction"]
-            }
-        }
-    }
-]
-
-TOOL_MAP = {
-    "look": game.look,
-    "move": game.move,
-    "take": game.take,
-    "unlock": game.unlock
-}
+tools = registry.tools
+TOOL_MAP = registry.tool_map(game)
 
 # --- Main Program ---
 if __name__ == "__main__":
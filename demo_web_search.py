@@ -1,122 +1,174 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+import datetime
+from typing import Optional
 from deepseek_agent import DeepSeekAgent
 from config import API_CONFIG
-import datetime
+from common_tools import calculate
+from tool_executor import ToolExecutor
+from tool_cache import ToolResultCache
+from tool_registry import ToolRegistry
+from tracing import span
+from page_store import PageStore
+
+try:
+    from config import WEB_CACHE
+except ImportError:
+    WEB_CACHE = None
+
+registry = ToolRegistry()
+
+if WEB_CACHE:
+    # Pages (and their extracted text) are kept on disk across sessions and batch runs
+    from http_cache import HttpCache
+    from web_fetch import configure_fetcher
+    configure_fetcher(cache=HttpCache(**WEB_CACHE))
 
 # --- Tool Implementation ---
+PAGE_CHUNK_CHARS = 4000  # longer pages are returned as an outline + first chunk, see read_page
+VISIT_PAGES_DEADLINE = 20  # seconds for a whole visit_pages batch
+
+pages = PageStore(chunk_chars=PAGE_CHUNK_CHARS)
+
+def page_text(page):
+    """Main text of a fetched page, with links converted to Markdown format [Text](URL)"""
+    from html_text import default_backend, extract_text
+    from web_fetch import get_fetcher
+
+    cache = get_fetcher().cache if page.get("cache_key") else None
+    text = cache.get_text(page["cache_key"], default_backend()) if cache else None
+    if text is None:
+        with span("extract text", "parse", url=page["url"]):
+            text = extract_text(page["html"], page["url"])
+        if cache:
+            cache.put_text(page["cache_key"], default_backend(), text)
+    return text
+
+def _more(handle, end, total):
+    if end >= total:
+        return "--- end of page ---"
+    return (f"--- {total - end} more characters: read_page(handle=\"{handle}\", offset={end}), "
+            f"or read_page(handle=\"{handle}\", section=<number or title from the outline>) ---")
+
+def page_view(url, page, limit=PAGE_CHUNK_CHARS):
+    """The whole text of a short page; for a longer one its handle, outline and first chunk"""
+    text = page_text(page)
+    if len(text) <= limit and not page["truncated"]:
+        return text
+    stored = pages.add(url, text, page["html"])
+    chunk, end = pages.chunk(stored, 0, limit)
+    parts = [f"Page handle: {stored['handle']} ({len(text)} characters"
+             + (", download truncated" if page["truncated"] else "") + ")"]
+    outline = pages.outline(stored)
+    if outline:
+        parts.append("Outline:\n" + outline)
+    parts.append(f"--- characters 0-{end} ---\n{chunk}")
+    parts.append(_more(stored["handle"], end, len(text)))
+    return "\n".join(parts)
+
+@registry.tool(read_only=True, cache_ttl=600)
+def visit_page(url: str):
+    """
+    Visits a specified URL and returns the text content of the web page. Use this to retrieve information from websites. Long pages are returned as a handle, an outline of their sections and the first part of the text; use read_page to read further.
+
+    :param url: The URL of the web page to visit. Must start with http:// or https://
+    """
+    # Imported on the first visit, so that the demo starts without loading them
+    from web_fetch import get_fetcher
+
+    print(f"[*] Visiting: {url}")
+    # A FetchError propagates: the executor marks the call as failed, so it is not cached
+    # and a repeated visit fetches the page again
+    with span("GET", "http", url=url):
+        page = get_fetcher().fetch(url)
+    return page_view(url, page)
+
+# Not cached as a whole: a batch may hold timed-out or failed pages that a repeated call
+# should retry. The pages themselves are reused through the web cache (WEB_CACHE)
+@registry.tool(read_only=True, cache_ttl=0)
+def visit_pages(urls: list[str]):
+    """
+    Visits several URLs at once (fetched in parallel) and returns the text content of each page. Prefer this over several visit_page calls whenever you already know more than one URL to read, e.g. several links found on a page.
+
+    :param urls: The URLs to visit (at most 10). Each must start with http:// or https://
+    """
+    from web_fetch import get_fetcher
+
+    urls = urls[:10]
+    print(f"[*] Visiting {len(urls)} pages: {', '.join(urls)}")
+    with span("GET batch", "http", urls=len(urls)):
+        results = get_fetcher().fetch_many(urls, deadline=VISIT_PAGES_DEADLINE)
+    # The pages share the budget of a single visit_page result
+    limit = max(1000, PAGE_CHUNK_CHARS // max(1, len(urls)))
+    sections = []
+    for index, result in enumerate(results, 1):
+        if "error" in result:
+            body = f"Error visiting page: {result['error']}"
+        else:
+            try:
+                body = page_view(result["url"], result["page"], limit)
+            except Exception as e:
+                body = f"Error visiting page: {str(e)}"
+        sections.append(f"=== [{index}] {result['url']} ===\n{body}")
+    return "\n\n".join(sections)
+
+@registry.tool(read_only=True, cache_ttl=600)
+def read_page(handle: str, offset: int = 0, section: Optional[str] = None):
+    """
+    Reads more of a long page returned by visit_page or visit_pages, from a character offset or from the start of a section of its outline.
+
+    :param handle: The page handle given by visit_page / visit_pages, e.g. "p1a2b3c4d"
+    :param offset: Character offset to read from (e.g. the offset given at the end of the previous part)
+    :param section: A section to read instead of an offset: its number in the outline or (part of) its title
+    """
+    from web_fetch import get_fetcher
+
+    # One lookup: the page is used from this reference even if it is evicted meanwhile.
+    # Failures are raised, so that the executor marks them as errors and they are not cached
+    stored = pages.get(handle)
+    if stored is None:
+        url = pages.url_of(handle)
+        if url is None:
+            raise ValueError(f"unknown page handle {handle}. Visit the page with visit_page first.")
+        # Dropped from the page store: fetch it again (from the web cache when there is one)
+        with span("GET", "http", url=url):
+            page = get_fetcher().fetch(url)
+        stored = pages.add(url, page_text(page), page["html"])
+    if section:
+        start = pages.find_section(stored, section)
+        if start is None:
+            raise ValueError(f"no section {section!r} on page {handle}. Outline:\n{pages.outline(stored)}")
+    else:
+        start = max(0, offset or 0)
+    print(f"[*] Reading {handle} from {start}")
+    chunk, end = pages.chunk(stored, start)
+    total = len(stored["text"])
+    return f"Page {handle} ({stored['url']}), characters {start}-{end} of {total}:\n{chunk}\n{_more(handle, end, total)}"
+
+@registry.tool(read_only=True, cache_ttl=0)
 def get_current_time():
-    """Get the current date and time"""
+    """
+    Gets the current date and time. Use this when the question involves relative time concepts like 'today', 'this year', or 'next year'.
+    """
     return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-def calculate(num1, num2, operator):
-    """Perform basic arithmetic operations"""
-    try:
-        n1 = float(num1)
-        n2 = float(num2)
-    except ValueError:
-        return "Error: Invalid numbers"
-
-    if operator == '+':
-        return str(n1 + n2)
-    elif operator == '-':
-        return str(n1 - n2)
-    elif operator == '*':
-        return str(n1 * n2)
-    elif operator == '/':
-        if n2 == 0:
-            return "Error: Division by zero"
-        return str(n1 / n2)
-    else:
-        return f"Error: Unsupported operator {operator}"
+registry.add(calculate, description="Performs basic arithmetic operations (add, subtract, multiply, divide). "
+                                    "Use this tool for calculations, such as calculating years or age.")
 
-def visit_page(url):
-    """Visit a webpage and extract its main text content"""
-    print(f"[*] Visiting: {url}")
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        response.encoding = response.apparent_encoding
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        for script in soup(["script", "style", "noscript", "iframe", "svg"]):
-            script.extract()
-
-        # Handle links: Convert <a> tags to Markdown format [Text](URL)
-        for a in soup.find_all('a', href=True):
-            text = a.get_text(strip=True)
-            if text:
-                href = a['href']
-                full_url = urljoin(url, href)
-                a.replace_with(f" [{text}]({full_url}) ")
-
-        text = soup.get_text(separator='\n')
-        lines = (line.strip() for line in text.splitlines())
-        text = '\n'.join(line for line in lines if line)
-        
-        return text[:50000] + ("\n...(content truncated)..." if len(text) > 50000 else "")
-        
-    except Exception as e:
-        return f"Error visiting page: {str(e)}"
-
-tools = [
-    {
-        "type": "function",
-        "function": {
-            "name": "visit_page",
-            "description": "Visits a specified URL and returns the text content of the web page. Use this to retrieve information from websites.",
-            "parameters": {
-                "type": "object", 
-                "properties": {
-                    "url": {"type": "string", "description": "The URL of the web page to visit. Must start with http:// or https://"}
-                }, 
-                "required": ["url"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_current_time",
-            "description": "Gets the current date and time. Use this when the question involves relative time concepts like 'today', 'this year', or 'next year'.",
-            "parameters": {"type": "object", "properties": {}, "required": []}
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "calculate",
-            "description": "Performs basic arithmetic operations (add, subtract, multiply, divide). Use this tool for calculations, such as calculating years or age.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "num1": {"type": "number", "description": "The first number"},
-                    "num2": {"type": "number", "description": "The second number"},
-                    "operator": {"type": "string", "enum": ["+", "-", "*", "/"], "description": "The operator"}
-                },
-                "required": ["num1", "num2", "operator"]
-            }
-        }
-    }
-]
-
-TOOL_MAP = {"visit_page": visit_page, "get_current_time": get_current_time, "calculate": calculate}
+tools = registry.tools
+TOOL_MAP = registry.tool_map()
+
+QUESTION = "明年是计算机系成立多少周年？"
+PROMPT = f"请帮我回答这个问题：{QUESTION}。你可以使用 visit_page 工具来访问网页。建议先访问华东师范大学的主页 (https://www.ecnu.edu.cn/) 寻找线索；需要同时查看多个链接时，可以用 visit_pages 一次访问；长页面只返回目录和开头部分，可以用 read_page 按需读取后续内容。"
 
 # --- Main Program ---
 if __name__ == "__main__":
-    agent = DeepSeekAgent(**API_CONFIG)
+    # Repeated visit_page / calculate calls with the same arguments are answered from the cache
+    agent = DeepSeekAgent(**API_CONFIG, tool_executor=ToolExecutor(cache=ToolResultCache()))
     
-    question = "明年是计算机系成立多少周年？"
     print(f"\n{'='*20} Starting Web Research Task {'='*20}")
-    print(f"Task Goal: {question}")
+    print(f"Task Goal: {QUESTION}")
     
     messages = [
-        {"role": "user", "content": f"请帮我回答这个问题：{question}。你可以使用 visit_page 工具来访问网页。建议先访问华东师范大学的主页 (https://www.ecnu.edu.cn/) 寻找线索。"}
+        {"role": "user", "content": PROMPT}
     ]
     
     agent.run(messages, tools, TOOL_MAP, max_turns=15)
@@ -2,7 +2,6 @@
 Demo: Word 文档智能填写系统
 支持上传、预览、AI自动填写、下载的完整流程
 """
-import json
 import os
 import shutil
 import threading
@@ -13,7 +12,13 @@ from flask_socketio import SocketIO, emit
 from werkzeug.utils import secure_filename
 from deepseek_agent import DeepSeekAgent
 from config import API_CONFIG
-from word_engine import WordEngine
+from tool_executor import ToolExecutor
+from tool_registry import ToolRegistry
+from tool_cache import ToolResultCache
+from run_control import CANCEL_REASONS, RunControl
+from event_sinks import publish_events
+from checkpoint import Checkpointer
+from tracing import recording, span
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'deepseek-word-demo'
@@ -29,7 +34,9 @@ word_app = None
 current_doc_path = None  # 当前操作的文档路径
 temp_doc_path = None     # 临时预览文件路径
 agent_running = False
+agent_control = None     # 当前运行的 RunControl，/api/stop 通过它中断运行
 operation_logs = []
+tool_cache = ToolResultCache(default_ttl=None)  # 文档变化时显式失效，无需过期时间
 
 # 允许的文件扩展名
 ALLOWED_EXTENSIONS = {'docx'}
@@ -38,13 +45,20 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def load_document(path):
+    """打开文档（python-docx 在第一次上传文档时才导入，以加快启动）"""
+    from word_engine import WordEngine
+    return WordEngine(path)
+
+
 # ==================== 工具包装函数 ====================
 
 def broadcast_update(action, detail=""):
     """广播文档更新事件到前端"""
     global temp_doc_path
     if word_app and temp_doc_path:
-        word_app.doc.save(temp_doc_path)
+        with span("doc.save", "word"):
+            word_app.doc.save(temp_doc_path)
     
     log_entry = {
         "time": time.strftime("%H:%M:%S"),
@@ -53,19 +67,28 @@ def broadcast_update(action, detail=""):
     }
     operation_logs.append(log_entry)
     
-    socketio.emit('doc_updated', {
-        'action': action,
-        'detail': detail[:200] if detail else "",
-        'timestamp': log_entry["time"]
-    })
+    with span("emit doc_updated", "socket"):
+        socketio.emit('doc_updated', {
+            'action': action,
+            'detail': detail[:200] if detail else "",
+            'timestamp': log_entry["time"]
+        })
     
-    time.sleep(0.3)
+    # 留出时间让前端刷新预览
+    with span("preview delay", "word"):
+        time.sleep(0.3)
 
 
 # ========== 通用表格工具 ==========
+# 所有工具共享同一个 word_app，且每次调用都会保存文档，因此都标记为不可并发执行
+# 读取类工具的结果会被缓存，填写类工具执行后使这些缓存失效
+# 参数在调用前已按 tools 中的 JSON Schema 校验并转换类型（见 tool_schema.py），无需再手动 int()
+TABLE_READ_TOOLS = ["list_tables", "view_table", "analyze_table", "find_empty_row"]
+registry = ToolRegistry()
 
+@registry.tool(concurrent=False, read_only=True)
 def list_tables():
-    """列出文档中所有表格的概要信息"""
+    """List all tables in the document with their basic info (rows, cols, preview). Call this FIRST to see what tables exist."""
     result = word_app.list_all_tables()
     if isinstance(result, str):
         return result
@@ -78,16 +101,26 @@ def list_tables():
     return "\n".join(summary)
 
 
-def view_table(table_index):
-    """查看指定表格的完整内容（文本格式）"""
-    result = word_app.get_table_as_text(int(table_index))
+@registry.tool(concurrent=False, read_only=True)
+def view_table(table_index: int):
+    """
+    View the complete content of a specific table in text format. Useful for understanding the table structure.
+
+    :param table_index: Index of the table (0-based)
+    """
+    result = word_app.get_table_as_text(table_index)
     broadcast_update("👁️ 查看表格", f"表格 {table_index}")
     return result
 
 
-def analyze_table(table_index):
-    """深度分析表格结构，识别可填写的单元格和标签-值对"""
-    result = word_app.analyze_table(int(table_index))
+@registry.tool(concurrent=False, read_only=True)
+def analyze_table(table_index: int):
+    """
+    Deep analyze a table to identify fillable cells and label-value pairs. Returns positions and current values.
+
+    :param table_index: Index of the table (0-based)
+    """
+    result = word_app.analyze_table(table_index)
     if "error" in result:
         return f"分析失败: {result['error']}"
     
@@ -107,184 +140,83 @@ def analyze_table(table_index):
     return "\n".join(summary)
 
 
-def fill_cell(table_index, row, col, value):
-    """填写指定位置的单元格"""
-    result = word_app.fill_cell(int(table_index), int(row), int(col), value)
+@registry.tool(concurrent=False, invalidates=TABLE_READ_TOOLS)
+def fill_cell(table_index: int, row: int, col: int, value: str):
+    """
+    Fill a specific cell by row and column index. Use when you know the exact position.
+
+    :param table_index: Index of the table (0-based)
+    :param row: Row index (0-based)
+    :param col: Column index (0-based)
+    :param value: Value to fill
+    """
+    result = word_app.fill_cell(table_index, row, col, value)
     broadcast_update("✏️ 填写单元格", f"表格{table_index}[{row},{col}] = {value}")
     return result
 
 
-def fill_by_label(table_index, label, value):
-    """根据标签文本查找并填写"""
-    result = word_app.fill_by_label(int(table_index), label, value)
+@registry.tool(concurrent=False, invalidates=TABLE_READ_TOOLS)
+def fill_by_label(table_index: int, label: str, value: str):
+    """
+    Find a cell by its label text and fill the adjacent value cell. Supports partial matching. This is the RECOMMENDED way to fill form fields.
+
+    :param table_index: Index of the table (0-based)
+    :param label: The label text to search for (e.g., '姓名', '电话')
+    :param value: Value to fill
+    """
+    result = word_app.fill_by_label(table_index, label, value)
     broadcast_update("✏️ 按标签填写", f"{label} = {value}")
     return result
 
 
-def fill_multiple_by_labels(table_index, label_value_map):
-    """批量根据标签填写多个值"""
-    result = word_app.fill_multiple_by_labels(int(table_index), label_value_map)
+@registry.tool(concurrent=False, invalidates=TABLE_READ_TOOLS)
+def fill_multiple_by_labels(table_index: int, label_value_map: dict[str, str]):
+    """
+    Fill multiple cells by their labels at once. More efficient for filling many fields.
+
+    :param table_index: Index of the table (0-based)
+    :param label_value_map: A dictionary mapping labels to values, e.g., {'姓名': '张三', '电话': '13800138000'}
+    """
+    result = word_app.fill_multiple_by_labels(table_index, label_value_map)
     broadcast_update("✏️ 批量填写", f"{len(label_value_map)} 个字段")
     return result
 
 
-def fill_row(table_index, row_index, values, start_col=0):
-    """在指定行中从左到右填写空单元格"""
-    result = word_app.find_and_fill_empty_cells_in_row(
-        int(table_index), int(row_index), values, int(start_col)
-    )
+@registry.tool(concurrent=False, invalidates=TABLE_READ_TOOLS)
+def fill_row(table_index: int, row_index: int, values: list[str], start_col: int = 0):
+    """
+    Fill empty cells in a specific row from left to right with provided values. Useful for filling list/table rows.
+
+    :param table_index: Index of the table (0-based)
+    :param row_index: Row index (0-based)
+    :param values: List of values to fill in order
+    :param start_col: Starting column (default 0)
+    """
+    result = word_app.find_and_fill_empty_cells_in_row(table_index, row_index, values, start_col)
     broadcast_update("📝 填写行", f"表格{table_index} 第{row_index}行")
     return result
 
 
-def find_empty_row(table_index, check_col=0, start_row=1):
-    """查找表格中第一个空行"""
-    result = word_app.find_empty_row(int(table_index), int(check_col), int(start_row))
+@registry.tool(concurrent=False, read_only=True)
+def find_empty_row(table_index: int, check_col: int = 0, start_row: int = 1):
+    """
+    Find the first empty row in a table (where specified column is empty). Useful for finding where to add new data.
+
+    :param table_index: Index of the table (0-based)
+    :param check_col: Column to check for emptiness (default 0)
+    :param start_row: Row to start searching from (default 1, skips header)
+    """
+    result = word_app.find_empty_row(table_index, check_col, start_row)
     if result == -1:
         return "未找到空行"
     return f"找到空行: 第 {result} 行"
 
 
 # ==================== 工具定义 ====================
+# JSON Schema 由 tool_registry 根据上面的函数签名与 docstring 生成
 
-tools = [
-    {
-        "type": "function",
-        "function": {
-            "name": "list_tables",
-            "description": "List all tables in the document with their basic info (rows, cols, preview). Call this FIRST to see what tables exist.",
-            "parameters": {"type": "object", "properties": {}}
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "view_table",
-            "description": "View the complete content of a specific table in text format. Useful for understanding the table structure.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "table_index": {"type": "integer", "description": "Index of the table (0-based)"}
-                },
-                "required": ["table_index"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "analyze_table",
-            "description": "Deep analyze a table to identify fillable cells and label-value pairs. Returns positions and current values.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "table_index": {"type": "integer", "description": "Index of the table (0-based)"}
-                },
-                "required": ["table_index"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "fill_cell",
-            "description": "Fill a specific cell by row and column index. Use when you know the exact position.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "table_index": {"type": "integer", "description": "Index of the table (0-based)"},
-                    "row": {"type": "integer", "description": "Row index (0-based)"},
-                    "col": {"type": "integer", "description": "Column index (0-based)"},
-                    "value": {"type": "string", "description": "Value to fill"}
-                },
-                "required": ["table_index", "row", "col", "value"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "fill_by_label",
-            "description": "Find a cell by its label text and fill the adjacent value cell. Supports partial matching. This is the RECOMMENDED way to fill form fields.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "table_index": {"type": "integer", "description": "Index of the table (0-based)"},
-                    "label": {"type": "string", "description": "The label text to search for (e.g., '姓名', '电话')"},
-                    "value": {"type": "string", "description": "Value to fill"}
-                },
-                "required": ["table_index", "label", "value"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "fill_multiple_by_labels",
-            "description": "Fill multiple cells by their labels at once. More efficient for filling many fields.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "table_index": {"type": "integer", "description": "Index of the table (0-based)"},
-                    "label_value_map": {
-                        "type": "object",
-                        "description": "A dictionary mapping labels to values, e.g., {'姓名': '张三', '电话': '13800138000'}",
-                        "additionalProperties": {"type": "string"}
-                    }
-                },
-                "required": ["table_index", "label_value_map"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "fill_row",
-            "description": "Fill empty cells in a specific row from left to right with provided values. Useful for filling list/table rows.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "table_index": {"type": "integer", "description": "Index of the table (0-based)"},
-                    "row_index": {"type": "integer", "description": "Row index (0-based)"},
-                    "values": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "List of values to fill in order"
-                    },
-                    "start_col": {"type": "integer", "description": "Starting column (default 0)", "default": 0}
-                },
-                "required": ["table_index", "row_index", "values"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "find_empty_row",
-            "description": "Find the first empty row in a table (where specified column is empty). Useful for finding where to add new data.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "table_index": {"type": "integer", "description": "Index of the table (0-based)"},
-                    "check_col": {"type": "integer", "description": "Column to check for emptiness (default 0)", "default": 0},
-                    "start_row": {"type": "integer", "description": "Row to start searching from (default 1, skips header)", "default": 1}
-                },
-                "required": ["table_index"]
-            }
-        }
-    },
-]
-
-TOOL_MAP = {
-    "list_tables": list_tables,
-    "view_table": view_table,
-    "analyze_table": analyze_table,
-    "fill_cell": fill_cell,
-    "fill_by_label": fill_by_label,
-    "fill_multiple_by_labels": fill_multiple_by_labels,
-    "fill_row": fill_row,
-    "find_empty_row": find_empty_row
-}
+tools = registry.tools
+TOOL_MAP = registry.tool_map()
 
 
 # ==================== Flask 路由 ====================
@@ -319,7 +251,8 @@ def upload_file():
         temp_doc_path = os.path.join(app.config['UPLOAD_FOLDER'], f"temp_{filename}")
         shutil.copy(filepath, temp_doc_path)
         
-        word_app = WordEngine(temp_doc_path)
+        word_app = load_document(temp_doc_path)
+        tool_cache.clear()
         
         return jsonify({
             "status": "success",
@@ -387,25 +320,30 @@ def start_agent():
     
     if current_doc_path and os.path.exists(current_doc_path):
         shutil.copy(current_doc_path, temp_doc_path)
-        word_app = WordEngine(temp_doc_path)
+        word_app = load_document(temp_doc_path)
+    tool_cache.clear()
     
     def run_agent():
-        global agent_running
+        global agent_running, agent_control
         agent_running = True
         
         try:
             socketio.emit('agent_status', {'status': 'running', 'message': '🚀 Agent 启动中...'})
             
-            agent = DeepSeekAgent(**API_CONFIG)
+            agent = DeepSeekAgent(**API_CONFIG, tool_executor=ToolExecutor(cache=tool_cache))
+            agent_control = RunControl(agent.session_timeout, agent.turn_timeout)
             messages = [
                 {"role": "user", "content": user_request + " (Tips: You can execute multiple tool calls in a single turn to save time. Use fill_by_label for form fields.)"}
             ]
             
-            run_agent_with_broadcast(agent, messages, tools, TOOL_MAP, max_turns=50)
+            # 配置了 checkpoint_dir 时每轮保存对话与文档，进程重启后可用 checkpoint.py resume 继续
+            checkpoint = None
+            if agent.checkpoint_dir:
+                checkpoint = Checkpointer.in_directory(agent.checkpoint_dir, TOOL_MAP, state={"WordEngine": word_app})
             
-            # 只有在未被停止的情况下才发送完成状态
-            if agent_running:
-                socketio.emit('agent_status', {'status': 'completed', 'message': '✅ 任务完成!'})
+            run_agent_with_broadcast(agent, messages, tools, TOOL_MAP, max_turns=50, control=agent_control,
+                                     checkpoint=checkpoint)
+            # 结束状态（完成 / 停止 / 超时 / 出错）由 SocketIOSink 根据 done 事件发送
             
         except Exception as e:
             socketio.emit('agent_status', {'status': 'error', 'message': f'❌ 错误: {str(e)}'})
@@ -418,77 +356,83 @@ def start_agent():
     return jsonify({"status": "started", "message": "Agent 已启动"})
 
 
-def run_agent_with_broadcast(agent, messages, tools, tool_map, max_turns=10):
-    """运行 Agent 并广播状态"""
-    global agent_running
-    for i in range(max_turns):
-        if not agent_running:
-            socketio.emit('agent_status', {'status': 'stopped', 'message': '⏹️ 已停止'})
-            break
-        socketio.emit('agent_thinking', {'turn': i + 1, 'message': f'🤔 第 {i+1} 轮思考中...'})
-        
-        try:
-            response = agent.client.chat.completions.create(
-                model=agent.model_name,
-                messages=messages,
-                tools=tools,
-                extra_body=agent.extra_body
-            )
-        except Exception as e:
-            socketio.emit('agent_error', {'message': f'API 错误: {str(e)}'})
-            break
-
-        message = response.choices[0].message
-        
-        reasoning_content = getattr(message, 'reasoning_content', None)
-        if reasoning_content:
-            socketio.emit('agent_reasoning', {'content': reasoning_content[:500] + '...' if len(reasoning_content) > 500 else reasoning_content})
-            msg_dict = message.model_dump(exclude_none=True)
-            msg_dict['reasoning_content'] = reasoning_content
-            messages.append(msg_dict)
-        else:
-            messages.append(message)
-
-        if message.content:
-            socketio.emit('agent_response', {'content': message.content})
-
-        if message.tool_calls:
-            for tool_call in message.tool_calls:
-                func_name = tool_call.function.name
-                args_str = tool_call.function.arguments
-                
-                socketio.emit('tool_call', {
-                    'name': func_name,
-                    'args': args_str[:200] if len(args_str) > 200 else args_str
-                })
-                
-                if tool_map and func_name in tool_map:
-                    try:
-                        args = json.loads(args_str)
-                        result = tool_map[func_name](**args)
-                        result_str = str(result)
-                        
-                        messages.append({
-                            "role": "tool",
-                            "tool_call_id": tool_call.id,
-                            "content": result_str
-                        })
-                    except Exception as e:
-                        error_msg = f"Error executing tool {func_name}: {str(e)}"
-                        messages.append({
-                            "role": "tool",
-                            "tool_call_id": tool_call.id,
-                            "content": error_msg
-                        })
-        else:
-            break
+class SocketIOSink:
+    """把 Agent 事件转发给前端的事件接收器，由 EventBus 在独立线程中调用，客户端较慢时不会阻塞 Agent"""
+    name = "socketio"
+
+    def __init__(self, socketio):
+        self.socketio = socketio
+
+    def _emit(self, name, data):
+        with span(f"emit {name}", "socket"):
+            self.socketio.emit(name, data)
+
+    def __call__(self, event):
+        etype = event["type"]
+        if etype == "turn_start":
+            self._emit('agent_thinking', {'turn': event['turn'], 'message': f'🤔 第 {event["turn"]} 轮思考中...'})
+
+        elif etype == "message":
+            reasoning_content = event["reasoning_content"]
+            if reasoning_content:
+                self._emit('agent_reasoning', {'content': reasoning_content[:500] + '...' if len(reasoning_content) > 500 else reasoning_content})
+            if event["content"]:
+                self._emit('agent_response', {'content': event["content"]})
+
+        elif etype == "tool_call":
+            args_str = event["arguments"]
+            self._emit('tool_call', {
+                'name': event["name"],
+                'args': args_str[:200] if len(args_str) > 200 else args_str
+            })
+
+        elif etype == "usage":
+            self._emit('agent_usage', {k: v for k, v in event.items() if k != "type"})
+
+        elif etype == "error":
+            self._emit('agent_error', {'message': event["message"]})
+
+        elif etype == "done":
+            stats = event["stats"]
+            reason = event["reason"]
+            # 每种结束原因都要发送终态，前端据此重新启用"开始"按钮
+            if reason in ("completed", "max_turns"):
+                self._emit('agent_status', {'status': 'completed', 'message': '✅ 任务完成!'})
+            elif reason == "loop":
+                # 文档可能已部分填写，仍允许下载
+                self._emit('agent_status', {'status': 'completed', 'message': '🔁 检测到重复操作，已提前结束'})
+            elif reason == "stopped":
+                self._emit('agent_status', {'status': 'idle', 'message': '⏹️ 已停止'})
+            elif reason in CANCEL_REASONS:
+                self._emit('agent_status', {'status': 'error', 'message': '⏱️ 超时，已停止'})
+            elif reason == "error":
+                self._emit('agent_status', {'status': 'error', 'message': '❌ 模型请求出错，已停止'})
+            else:
+                self._emit('agent_status', {'status': 'error', 'message': f'已结束 ({reason})'})
+            self._emit('agent_session', {'summary': stats.summary(), 'stats': stats.to_dict()})
+
+
+def run_agent_with_broadcast(agent, messages, tools, tool_map, max_turns=10, control=None, sinks=None, checkpoint=None):
+    """运行 Agent 并广播状态，返回 SessionStats（每轮 token 用量、缓存命中与耗时）"""
+    # 使用流式请求：停止或超时时可立即断开连接，服务端随之中止生成
+    # 设置了 trace_dir 时，接收器线程在本次运行的 tracer 下启动，Socket.IO 发送也记入同一个 trace 文件
+    tracer = agent.new_tracer()
+    with recording(tracer):
+        events = agent.run_events(messages, tools, tool_map, max_turns, stream=True, control=control,
+                                  checkpoint=checkpoint, tracer=tracer)
+        done = publish_events(events, [SocketIOSink(socketio)] + list(sinks or []))
+    stats = done["stats"]
+    print(f"[*] Session: {stats.summary()}")
+    return stats
 
 
 @app.route('/api/stop', methods=['POST'])
 def stop_agent():
-    """停止 Agent"""
+    """停止 Agent：立即中断正在进行的模型请求与工具调用"""
     global agent_running
     agent_running = False
+    if agent_control is not None:
+        agent_control.cancel("stopped")
     return jsonify({"status": "stopped"})
 
 
@@ -499,8 +443,9 @@ def reset_document():
     
     if current_doc_path and os.path.exists(current_doc_path) and temp_doc_path:
         shutil.copy(current_doc_path, temp_doc_path)
-        word_app = WordEngine(temp_doc_path)
+        word_app = load_document(temp_doc_path)
         operation_logs = []
+        tool_cache.clear()
         return jsonify({"status": "success", "message": "文档已重置"})
     
     return jsonify({"status": "error", "message": "没有可重置的文档"}), 400
@@ -0,0 +1,189 @@
+"""
+Event sinks: consumers of the events of DeepSeekAgent.run_events() that run off the agent thread.
+
+A sink is any callable taking one event dict (ConsolePrinter, JsonlSink, the Socket.IO
+sink of the Word web demo, ...), optionally with a close() method. An EventBus gives
+every sink its own buffer and worker thread, so publishing an event never waits for
+output: a slow terminal or browser client cannot stall the model loop, and one slow
+sink does not hold back the others.
+
+Each buffer holds up to `maxsize` events. When a sink falls that far behind, consecutive
+deltas (reasoning_delta / content_delta / tool_call_delta) are merged into the last
+buffered one instead of being queued one by one, so memory stays bounded and no text is
+lost; all other events are always delivered, in order.
+"""
+import contextvars
+import json
+import sys
+import threading
+import time
+from collections import deque
+
+DELTA_EVENTS = ("reasoning_delta", "content_delta", "tool_call_delta")
+
+
+def _mergeable(tail, event):
+    return (
+        tail["type"] == event["type"]
+        and tail["turn"] == event["turn"]
+        and tail.get("index") == event.get("index")
+    )
+
+
+def _merge(tail, event):
+    if event["type"] == "tool_call_delta":
+        tail["arguments"] += event["arguments"]
+        tail["id"] = event["id"]
+        tail["name"] = event["name"]
+    else:
+        tail["delta"] += event["delta"]
+
+
+class _SinkWorker:
+    """Buffer and thread feeding one sink"""
+    def __init__(self, sink, maxsize):
+        self.sink = sink
+        self.name = getattr(sink, "name", None) or type(sink).__name__
+        self.maxsize = maxsize
+        self.delivered = 0
+        self.merged = 0
+        self.errors = 0
+        self.max_backlog = 0
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        # Runs in the creator's context, so that spans of the sink go to the run's trace (tracing.py)
+        self._thread = threading.Thread(target=contextvars.copy_context().run, args=(self._loop,),
+                                        name=f"sink-{self.name}", daemon=True)
+        self._thread.start()
+
+    def put(self, event):
+        with self._cond:
+            if event["type"] in DELTA_EVENTS:
+                if len(self._buffer) >= self.maxsize and _mergeable(self._buffer[-1], event):
+                    _merge(self._buffer[-1], event)
+                    self.merged += 1
+                    return
+                # Own copy (the event is shared by all sinks), so that later deltas can be merged into it
+                event = dict(event)
+            self._buffer.append(event)
+            self.max_backlog = max(self.max_backlog, len(self._buffer))
+            self._cond.notify()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closed:
+                    self._cond.wait()
+                if not self._buffer:
+                    break
+                event = self._buffer.popleft()
+            try:
+                self.sink(event)
+                self.delivered += 1
+            except Exception as e:
+                self.errors += 1
+                if self.errors == 1:
+                    print(f"[!] Event sink {self.name} failed: {type(e).__name__}: {e}", file=sys.stderr)
+        close = getattr(self.sink, "close", None)
+        if close is not None:
+            try:
+                close()
+            except Exception as e:
+                print(f"[!] Closing event sink {self.name} failed: {e}", file=sys.stderr)
+
+    def close(self, timeout=None):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "sink": self.name,
+            "delivered": self.delivered,
+            "merged_deltas": self.merged,
+            "errors": self.errors,
+            "max_backlog": self.max_backlog,
+        }
+
+
+class EventBus:
+    def __init__(self, sinks, maxsize=1000):
+        """
+        :param sinks: Callables taking one event dict (optionally with a close() method)
+        :param maxsize: Events buffered per sink before consecutive deltas are merged
+        """
+        self._workers = [_SinkWorker(sink, maxsize) for sink in sinks]
+
+    def publish(self, event):
+        """Hand `event` to every sink; never blocks on the sinks"""
+        for worker in self._workers:
+            worker.put(event)
+
+    def close(self, timeout=None):
+        """Deliver the remaining events, close the sinks and stop their threads"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in self._workers:
+            worker.close(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def stats(self):
+        return [worker.stats() for worker in self._workers]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def publish_events(events, sinks, maxsize=1000):
+    """
+    Drive an event generator (e.g. agent.run_events(...)) and publish every event to
+    `sinks`. Returns once the run is over and all sinks have caught up.
+
+    :return: The "done" event (None if the generator ended without one)
+    """
+    done = None
+    with EventBus(sinks, maxsize) as bus:
+        for event in events:
+            bus.publish(event)
+            if event["type"] == "done":
+                done = event
+    return done
+
+
+def event_to_json(event):
+    """JSON-friendly copy of an event"""
+    data = {}
+    for key, value in event.items():
+        if key == "message":
+            # Same data as reasoning_content / content / tool_calls, and may be changed later by compaction
+            continue
+        if key == "stats" and value is not None:
+            value = value.to_dict()
+        data[key] = value
+    return data
+
+
+class JsonlSink:
+    """Appends every event as one JSON line (with a wall-clock "ts"), e.g. for later analysis"""
+    def __init__(self, path, deltas=False):
+        """
+        :param path: Output JSONL file (appended)
+        :param deltas: Also write the streamed reasoning/content/tool-call deltas
+        """
+        self.name = f"jsonl:{path}"
+        self.deltas = deltas
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __call__(self, event):
+        if event["type"] in DELTA_EVENTS and not self.deltas:
+            return
+        data = dict(event_to_json(event), ts=time.time())
+        self._file.write(json.dumps(data, ensure_ascii=False, default=str) + "\n")
+        if event["type"] == "done":
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,206 @@
+"""
+Local HTTP server with generated web pages, for benchmarking the web tools offline.
+
+Paths (all sizes in KB):
+    /page/<kb>       HTML page with Chinese text, headings and links
+                     ?charset=utf-8|gbk      encoding of the body (default utf-8)
+                     ?declare=header|meta|none  where the charset is declared (default header)
+    /binary/<kb>     application/octet-stream
+    /pdf/<kb>        application/pdf
+Any path accepts ?delay=<seconds> before the response is sent.
+
+Pages carry an ETag and a Last-Modified header and answer conditional requests with
+304 Not Modified. They are sent with "Cache-Control: no-cache" (revalidate on every use)
+unless ?max_age=<seconds> is given; ?validators=none leaves out ETag / Last-Modified.
+
+Responses use HTTP/1.1 keep-alive; `connections` counts the TCP connections accepted,
+`requests` the requests, `not_modified` the 304 answers and `bytes_sent` the body bytes
+written, so that connection reuse, early stops and caching can be checked.
+
+Usage:
+    python fixture_server.py --port 8100
+"""
+import argparse
+import email.utils
+import hashlib
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+_PARAGRAPH = ("华东师范大学计算机科学与技术学院的前身是成立于 1979 年的计算机科学系。"
+              "学院设有计算机科学与技术、软件工程等专业，拥有一支高水平的师资队伍。")
+
+
+def html_page(kb, charset="utf-8", declare="header"):
+    """HTML page of about `kb` KB (encoded) with headings, paragraphs, links and scripts"""
+    meta = f'<meta charset="{charset}">' if declare == "meta" else ""
+    head = f"<!DOCTYPE html><html><head>{meta}<title>测试页面 {kb} KB</title>" \
+           f"<style>body {{ font-family: sans-serif; }}</style></head><body>"
+    sections = []
+    size = 0
+    index = 0
+    while size < kb * 1024:
+        section = (
+            f"<h2>第 {index} 节</h2><p>{_PARAGRAPH}</p>"
+            f"<ul><li><a href=\"/page/1?n={index}\">相关链接 {index}</a></li>"
+            f"<li><a href=\"https://example.com/news/{index}\">新闻 {index}</a></li></ul>"
+            f"<script>var counter{index} = {index};</script>"
+        )
+        sections.append(section)
+        size += len(section.encode(charset))
+        index += 1
+    return (head + "".join(sections) + "</body></html>").encode(charset)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # As in mock_server: avoid Nagle + delayed ACK stalls on keep-alive connections
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        with self.server.lock:
+            self.server.requests += 1
+        if "delay" in query:
+            time.sleep(float(query["delay"]))
+        parts = url.path.strip("/").split("/")
+        try:
+            kb = int(parts[1]) if len(parts) > 1 else 1
+        except ValueError:
+            kb = 1
+        kind = parts[0]
+        if kind == "page":
+            charset = query.get("charset", "utf-8")
+            declare = query.get("declare", "header")
+            body = self.server.cached(("page", kb, charset, declare), lambda: html_page(kb, charset, declare))
+            content_type = f"text/html; charset={charset}" if declare == "header" else "text/html"
+        elif kind in ("binary", "pdf"):
+            body = self.server.cached((kind, kb), lambda: bytes(range(256)) * (kb * 4))
+            content_type = "application/pdf" if kind == "pdf" else "application/octet-stream"
+        else:
+            self.send_error(404)
+            return
+        validators = {}
+        if kind == "page" and query.get("validators") != "none":
+            validators = {"ETag": f'"{hashlib.md5(body).hexdigest()}"', "Last-Modified": self.server.last_modified}
+        if validators and (self.headers.get("If-None-Match") == validators["ETag"] or
+                           self.headers.get("If-Modified-Since") == validators["Last-Modified"]):
+            with self.server.lock:
+                self.server.not_modified += 1
+            self.send_response(304)
+            for name, value in validators.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in validators.items():
+            self.send_header(name, value)
+        if kind == "page":
+            self.send_header("Cache-Control", f"max-age={int(query['max_age'])}" if "max_age" in query else "no-cache")
+        self.end_headers()
+        try:
+            for start in range(0, len(body), 64 * 1024):
+                self.wfile.write(body[start:start + 64 * 1024])
+                with self.server.lock:
+                    self.server.bytes_sent += min(64 * 1024, len(body) - start)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address):
+        super().__init__(address, _Handler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self.last_modified = email.utils.formatdate(time.time() - 86400, usegmt=True)
+        self._bodies = {}
+
+    def handle_error(self, request, client_address):
+        pass  # clients closing connections early (size caps, deadlines) are expected
+
+    def cached(self, key, build):
+        with self.lock:
+            if key not in self._bodies:
+                self._bodies[key] = build()
+            return self._bodies[key]
+
+
+class FixtureServer:
+    """In-process fixture server. start() runs it on a daemon thread and returns the base URL."""
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def connections(self):
+        return self._server.connections
+
+    @property
+    def requests(self):
+        return self._server.requests
+
+    @property
+    def not_modified(self):
+        return self._server.not_modified
+
+    @property
+    def bytes_sent(self):
+        return self._server.bytes_sent
+
+    def reset_counters(self):
+        with self._server.lock:
+            self._server.connections = 0
+            self._server.requests = 0
+            self._server.not_modified = 0
+            self._server.bytes_sent = 0
+
+    def start(self):
+        self._server = _Server((self.host, self.port))
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+    server = FixtureServer(args.host, args.port)
+    print(f"[*] Fixture pages at {server.start()}/page/<kb>")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
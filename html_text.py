@@ -0,0 +1,227 @@
+"""
+HTML-to-text extraction for the web tools, with interchangeable backends.
+
+Every backend produces the format visit_page has always returned: the text of the page
+one text node per line (stripped, empty lines dropped), script / style / noscript /
+iframe / svg content removed, and every link with text written as [Text](absolute URL).
+
+Backends:
+    lxml    libxml2 parser, one iterwalk over the tree (used when lxml is installed)
+    stdlib  html.parser.HTMLParser, one streaming pass with a tag stack (no dependencies)
+    bs4     the original BeautifulSoup implementation, kept as the reference for parity
+
+Usage:
+    text = extract_text(html, base_url)                 # best available backend
+    text = extract_text(html, base_url, backend="stdlib")
+"""
+import functools
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+SKIP_TAGS = {"script", "style", "noscript", "iframe", "svg"}
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param",
+              "source", "track", "wbr"}
+
+
+def _join_lines(strings):
+    text = "\n".join(strings)
+    return "\n".join(line for line in (line.strip() for line in text.splitlines()) if line)
+
+
+# Navigation menus repeat the same links on every page of a site
+_resolve = functools.lru_cache(maxsize=4096)(urljoin)
+
+
+def _link(text, base_url, href):
+    return f" [{text}]({_resolve(base_url, href)}) "
+
+
+def extract_bs4(html, base_url):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(list(SKIP_TAGS)):
+        script.extract()
+    for a in soup.find_all('a', href=True):
+        text = a.get_text(strip=True)
+        if text:
+            a.replace_with(_link(text, base_url, a['href']))
+    return _join_lines([soup.get_text(separator='\n')])
+
+
+_LXML_EVENTS = ("start", "end", "comment", "pi")
+
+
+def extract_lxml(html, base_url):
+    from lxml import etree
+
+    # Parsing bytes avoids lxml's refusal of str input with an encoding declaration
+    root = etree.fromstring(html.encode("utf-8"), etree.HTMLParser(encoding="utf-8"))
+    if root is None:
+        return ""
+    strings = []
+    walker = etree.iterwalk(root, events=_LXML_EVENTS)
+    for event, element in walker:
+        tag = element.tag
+        if not isinstance(tag, str):
+            # Comments and processing instructions: only the text after them counts
+            if element.tail:
+                strings.append(element.tail)
+            continue
+        if event == "start":
+            if tag in SKIP_TAGS:
+                walker.skip_subtree()
+                continue
+            if tag == "a" and element.get("href") is not None:
+                text = "".join(s.strip() for s in _lxml_strings(element, etree))
+                if text:
+                    strings.append(_link(text, base_url, element.get("href")))
+                    walker.skip_subtree()
+                    continue
+            if element.text:
+                strings.append(element.text)
+        elif element.tail:
+            strings.append(element.tail)
+    return _join_lines(strings)
+
+
+def _lxml_strings(element, etree):
+    """Text nodes below `element` (its own tail excluded), without the skipped subtrees"""
+    walker = etree.iterwalk(element, events=_LXML_EVENTS)
+    for event, node in walker:
+        if node is element:
+            if event == "start" and node.text:
+                yield node.text
+            continue
+        if not isinstance(node.tag, str):
+            if node.tail:
+                yield node.tail
+            continue
+        if event == "start":
+            if node.tag in SKIP_TAGS:
+                walker.skip_subtree()
+            elif node.text:
+                yield node.text
+        elif node.tail:
+            yield node.tail
+
+
+class _TextParser(HTMLParser):
+    def __init__(self, base_url):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.strings = []
+        self.stack = []  # open tags
+        self.skip_depth = None  # stack depth of the skipped element we are in
+        self.link_depth = None  # stack depth of the <a href> we are in
+        self.link_href = None
+        self.link_strings = []
+        self.buffer = []
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        text = "".join(self.buffer)
+        self.buffer = []
+        if self.skip_depth is not None:
+            return
+        (self.link_strings if self.link_depth is not None else self.strings).append(text)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in _VOID_TAGS:
+            return
+        self.stack.append(tag)
+        if self.skip_depth is None and tag in SKIP_TAGS:
+            self.skip_depth = len(self.stack)
+        elif tag == "a" and self.link_depth is None and self.skip_depth is None:
+            href = dict(attrs).get("href")
+            if href is not None:
+                self.link_depth = len(self.stack)
+                self.link_href = href
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush()
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag not in self.stack:
+            return  # stray end tag
+        while self.stack:
+            depth = len(self.stack)
+            closed = self.stack.pop()
+            if self.skip_depth == depth:
+                self.skip_depth = None
+            if self.link_depth == depth:
+                self._close_link()
+            if closed == tag:
+                break
+
+    def _close_link(self):
+        text = "".join(s.strip() for s in self.link_strings)
+        if text:
+            self.strings.append(_link(text, self.base_url, self.link_href))
+        else:
+            self.strings.extend(self.link_strings)
+        self.link_depth = None
+        self.link_strings = []
+
+    def handle_data(self, data):
+        self.buffer.append(data)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def text(self):
+        self._flush()
+        while self.link_depth is not None and self.stack:
+            self.handle_endtag(self.stack[-1])
+        return _join_lines(self.strings)
+
+
+def extract_stdlib(html, base_url):
+    parser = _TextParser(base_url)
+    parser.feed(html)
+    parser.close()
+    return parser.text()
+
+
+BACKENDS = {"lxml": extract_lxml, "stdlib": extract_stdlib, "bs4": extract_bs4}
+
+
+def available_backends():
+    names = []
+    for name, module in (("lxml", "lxml"), ("stdlib", None), ("bs4", "bs4")):
+        if module is not None:
+            try:
+                __import__(module)
+            except ImportError:
+                continue
+        names.append(name)
+    return names
+
+
+_default = None
+
+
+def default_backend():
+    """Fastest installed backend: lxml, else the pure-python stdlib parser"""
+    global _default
+    if _default is None:
+        _default = "lxml" if "lxml" in available_backends() else "stdlib"
+    return _default
+
+
+def extract_text(html, base_url, backend=None):
+    """
+    :param html: Decoded HTML document
+    :param base_url: URL the links are resolved against
+    :param backend: "lxml", "stdlib" or "bs4" (None = default_backend())
+    """
+    return BACKENDS[backend or default_backend()](html, base_url)
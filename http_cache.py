@@ -0,0 +1,393 @@
+"""
+Persistent on-disk HTTP cache for the web tools (used by PageFetcher, see web_fetch.py).
+
+Layout of the cache directory:
+    objects/ab/abcdef...   content-addressed blobs (sha256): raw response bodies and the
+                           text extracted from them; identical pages share one blob
+    entries/<key>.json     one entry per normalized URL: response metadata, the body blob,
+                           the extracted texts {backend: blob}, freshness and last access
+
+- Freshness follows the response headers: Cache-Control max-age (minus Age), else
+  Expires, else 10% of the time since Last-Modified (at most a day). no-store responses
+  are not cached, no-cache ones are always revalidated.
+- A stale entry is revalidated with If-None-Match / If-Modified-Since; a 304 refreshes
+  it without downloading the body again. When a new body is byte-identical to the cached
+  one its extracted texts are kept, so the page is not parsed again either.
+- The blobs are kept under `max_bytes`, evicting the least recently used entries.
+- In offline mode every cached entry is served regardless of its age and nothing is
+  fetched.
+
+Entries are written atomically, so several processes can share a directory; each
+process accounts the size of what it sees at start-up plus its own writes.
+
+Usage:
+    python http_cache.py stats .web_cache
+    python http_cache.py clear .web_cache
+"""
+import argparse
+import email.utils
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_HEURISTIC_FRACTION = 0.1
+_HEURISTIC_MAX = 24 * 3600
+# Stored with a cached page; the other headers are not needed to rebuild it
+_KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control", "Expires", "Date", "Age")
+
+
+def normalize_url(url):
+    """Lower-case scheme and host, no default port, no fragment, "/" for an empty path, sorted query"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def parse_cache_control(value):
+    """{directive: value or True} of a Cache-Control header"""
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip().strip('"') if arg else True
+    return directives
+
+
+def _http_date(value):
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def freshness_lifetime(headers, now=None):
+    """Seconds a response stays fresh from now (0 = revalidate on every use), or None for no-store"""
+    now = time.time() if now is None else now
+    control = parse_cache_control(headers.get("Cache-Control"))
+    if "no-store" in control:
+        return None
+    if "no-cache" in control:
+        return 0
+    age = _number(headers.get("Age")) or 0
+    if "max-age" in control:
+        return max(0, (_number(control["max-age"]) or 0) - age)
+    date = _http_date(headers.get("Date")) or now
+    expires = _http_date(headers.get("Expires"))
+    if headers.get("Expires") is not None:
+        return max(0, expires - date - age) if expires is not None else 0
+    last_modified = _http_date(headers.get("Last-Modified"))
+    if last_modified is not None and last_modified < date:
+        return min(_HEURISTIC_MAX, (date - last_modified) * _HEURISTIC_FRACTION)
+    return 0
+
+
+def _kept_headers(headers):
+    """The _KEPT_HEADERS of a response, looked up case-insensitively"""
+    lowered = {name.lower(): value for name, value in headers.items()}
+    return {name: lowered[name.lower()] for name in _KEPT_HEADERS if name.lower() in lowered}
+
+
+def _number(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class HttpCache:
+    def __init__(self, directory=".web_cache", max_bytes=200 * 1024 * 1024, offline=False):
+        """
+        :param directory: Cache directory (created if missing)
+        :param max_bytes: Size cap of the stored bodies and texts; least recently used entries are evicted
+        :param offline: Serve only from the cache, whatever the age of the entries, and never fetch
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._objects = os.path.join(directory, "objects")
+        self._entries_dir = os.path.join(directory, "entries")
+        os.makedirs(self._objects, exist_ok=True)
+        os.makedirs(self._entries_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> entry
+        self._refs = {}  # blob -> number of entries using it
+        self._sizes = {}  # blob -> bytes
+        self.size = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.text_hits = 0
+        self.evictions = 0
+        self._load()
+
+    def _load(self):
+        for name in os.listdir(self._entries_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self._entries_dir, name), encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            self._entries[entry["key"]] = entry
+            for blob in _blobs(entry):
+                self._ref(blob)
+
+    # --- blobs ---
+
+    def _blob_path(self, blob):
+        return os.path.join(self._objects, blob[:2], blob)
+
+    def _put_blob(self, data):
+        blob = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(blob)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write_atomic(path, data)
+        return blob
+
+    def _get_blob(self, blob):
+        try:
+            with open(self._blob_path(blob), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _ref(self, blob):
+        if blob not in self._refs:
+            try:
+                self._sizes[blob] = os.path.getsize(self._blob_path(blob))
+            except OSError:
+                self._sizes[blob] = 0
+            self._refs[blob] = 0
+            self.size += self._sizes[blob]
+        self._refs[blob] += 1
+
+    def _unref(self, blob):
+        self._refs[blob] -= 1
+        if self._refs[blob] <= 0:
+            del self._refs[blob]
+            self.size -= self._sizes.pop(blob)
+            try:
+                os.remove(self._blob_path(blob))
+            except OSError:
+                pass
+
+    # --- entries ---
+
+    def _entry_path(self, key):
+        return os.path.join(self._entries_dir, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+    def _save(self, entry):
+        _write_atomic(self._entry_path(entry["key"]), json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+
+    def _replace(self, key, entry):
+        """Install `entry` under `key` (None = remove it), keeping the blob references right"""
+        old = self._entries.pop(key, None)
+        if entry is not None:
+            self._entries[key] = entry
+            for blob in _blobs(entry):
+                self._ref(blob)
+            self._save(entry)
+        elif old is not None:
+            try:
+                os.remove(self._entry_path(key))
+            except OSError:
+                pass
+        if old is not None:
+            for blob in _blobs(old):
+                self._unref(blob)
+
+    def _evict(self, keep):
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            key = min((k for k in self._entries if k != keep), key=lambda k: self._entries[k]["accessed"])
+            self._replace(key, None)
+            self.evictions += 1
+
+    def lookup(self, url):
+        """Cached entry of a URL or None; an entry is a dict, see is_fresh() / validators() / page()"""
+        with self._lock:
+            entry = self._entries.get(normalize_url(url))
+            if entry is not None and self._get_blob(entry["body"]) is None:
+                # Removed by another process sharing the directory
+                self._replace(entry["key"], None)
+                entry = None
+            return entry
+
+    def is_fresh(self, entry):
+        return self.offline or time.time() < entry["expires"]
+
+    def validators(self, entry):
+        """Conditional request headers for revalidating an entry"""
+        headers = {}
+        if entry["headers"].get("ETag"):
+            headers["If-None-Match"] = entry["headers"]["ETag"]
+        if entry["headers"].get("Last-Modified"):
+            headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+        return headers
+
+    def page(self, entry, source):
+        """
+        The page of an entry in the format of PageFetcher.fetch(), or None if its body is gone.
+
+        :param source: Stored in page["cache"]: "hit" or "revalidated"
+        """
+        body = self._get_blob(entry["body"])
+        if body is None:
+            return None
+        with self._lock:
+            if source == "hit":
+                self.hits += 1
+            else:
+                self.revalidated += 1
+            if entry["key"] in self._entries:
+                entry["accessed"] = time.time()
+                self._save(entry)
+        return {
+            "url": entry["final_url"],
+            "status": entry["status"],
+            "content_type": entry["content_type"],
+            "charset": entry["charset"],
+            "charset_source": entry["charset_source"],
+            "html": body.decode(entry["charset"], errors="replace"),
+            "bytes": len(body),
+            "truncated": entry["truncated"],
+            "headers": dict(entry["headers"]),
+            "elapsed": 0.0,
+            "cache": source,
+            "cache_key": entry["key"],
+        }
+
+    def store(self, url, page, body):
+        """
+        Cache a downloaded page (the result of PageFetcher.fetch() and its raw body).
+
+        :return: The cache key, or None when the response must not be stored
+        """
+        self.misses += 1
+        headers = _kept_headers(page["headers"])
+        lifetime = freshness_lifetime(headers)
+        if lifetime is None or len(body) > self.max_bytes:
+            return None
+        key = normalize_url(url)
+        now = time.time()
+        # Under the lock, so that an eviction cannot delete an identical blob in between
+        with self._lock:
+            blob = self._put_blob(body)
+            old = self._entries.get(key)
+            entry = {
+                "key": key,
+                "final_url": page["url"],
+                "status": page["status"],
+                "content_type": page["content_type"],
+                "charset": page["charset"],
+                "charset_source": page["charset_source"],
+                "truncated": page["truncated"],
+                "headers": headers,
+                "body": blob,
+                # Same bytes at the same address: the extracted texts are still valid
+                "texts": dict(old["texts"]) if old and old["body"] == blob and old["final_url"] == page["url"] else {},
+                "stored": now,
+                "expires": now + lifetime,
+                "accessed": now,
+            }
+            self._replace(key, entry)
+            self._evict(keep=key)
+        return key
+
+    def refresh(self, entry, headers):
+        """Apply the headers of a 304 response to an entry: new freshness, updated validators"""
+        with self._lock:
+            merged = dict(entry["headers"])
+            merged.update({name: value for name, value in _kept_headers(headers).items() if name != "Content-Type"})
+            lifetime = freshness_lifetime(merged)
+            entry = dict(entry, headers=merged, expires=time.time() + (lifetime or 0))
+            if entry["key"] in self._entries:
+                self._replace(entry["key"], entry)
+        return entry
+
+    def get_text(self, key, backend):
+        """Text extracted from the page of an entry by `backend`, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            blob = entry and entry["texts"].get(backend)
+        data = self._get_blob(blob) if blob else None
+        if data is None:
+            return None
+        self.text_hits += 1
+        return data.decode("utf-8")
+
+    def put_text(self, key, backend, text):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            blob = self._put_blob(text.encode("utf-8"))
+            entry = dict(entry, texts=dict(entry["texts"], **{backend: blob}))
+            self._replace(key, entry)
+            self._evict(keep=key)
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self._objects, ignore_errors=True)
+            shutil.rmtree(self._entries_dir, ignore_errors=True)
+            os.makedirs(self._objects, exist_ok=True)
+            os.makedirs(self._entries_dir, exist_ok=True)
+            self._entries.clear()
+            self._refs.clear()
+            self._sizes.clear()
+            self.size = 0
+
+    def stats(self):
+        lookups = self.hits + self.revalidated + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.revalidated) / lookups if lookups else None,
+            "text_hits": self.text_hits,
+            "evictions": self.evictions,
+        }
+
+
+def _blobs(entry):
+    return [entry["body"], *entry["texts"].values()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["stats", "clear"])
+    parser.add_argument("directory", nargs="?", default=".web_cache")
+    args = parser.parse_args()
+    cache = HttpCache(args.directory, max_bytes=float("inf"))
+    if args.command == "clear":
+        cache.clear()
+        print(f"[*] Cleared {args.directory}")
+        return
+    now = time.time()
+    fresh = sum(1 for entry in cache._entries.values() if entry["expires"] > now)
+    texts = sum(len(entry["texts"]) for entry in cache._entries.values())
+    print(f"[*] {args.directory}: {len(cache._entries)} pages ({fresh} fresh), {texts} extracted texts, "
+          f"{cache.size / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Detection of repeated actions in the agent loop.
+
+Models sometimes get stuck: `view_table(0)` again and again, or `move east` /
+`move west` back and forth, until max_turns runs out. LoopGuard watches the tool
+calls of a run and recognizes two patterns:
+
+- repeat:      a read_only tool called again with the same arguments while no
+               mutating tool has run since, so the result cannot have changed
+               (not for tools with cache_ttl=0 such as get_current_time, whose result
+               changes by itself, and not after a failure, which may go away on retry);
+- oscillation: the last turns are the same block of 1-3 turns (same calls, same
+               arguments) repeated, e.g. move(east), move(west), move(east), move(west).
+
+What happens then depends on the policy:
+
+- "nudge": repeated calls are not run again; they get the earlier result plus a note
+           saying so. Oscillations get a warning appended to the turn's tool results.
+- "warn":  every call runs normally; repeats and oscillations get a warning appended.
+- "stop":  the run ends after the turn with done reason "loop".
+"""
+import json
+from concurrent.futures import Future
+
+from tool_executor import is_read_only, tool_result
+
+POLICIES = ("nudge", "warn", "stop")
+
+
+def call_key(func_name, args_str):
+    """(name, canonical arguments), so that formatting differences do not hide a repeat"""
+    try:
+        args = json.dumps(json.loads(args_str), sort_keys=True, ensure_ascii=False)
+    except (TypeError, ValueError):
+        args = args_str
+    return func_name, args
+
+
+def _reusable(func):
+    """read_only tools whose result only changes through a mutating call (cache_ttl=0 marks the others)"""
+    return is_read_only(func) and getattr(func, 'tool_cache_ttl', None) != 0
+
+
+def _succeeded(result):
+    """A result that can answer a repeat: not failed, and not an error text returned by the tool"""
+    return result is not None and not result["error"] and not result["message"]["content"].startswith("Error")
+
+
+def _describe(keys):
+    return ", ".join(f"{name}({args if args != '{}' else ''})" for name, args in keys)
+
+
+class LoopGuard:
+    def __init__(self, policy="nudge", cycles=2, max_period=3):
+        """
+        :param policy: "nudge", "warn" or "stop" (see the module docstring)
+        :param cycles: Repetitions of a block of turns that count as an oscillation
+                       (a single-turn block needs one more, as retrying an action once is common)
+        :param max_period: Longest block of turns checked for oscillation
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown loop policy {policy!r}, expected one of {POLICIES}")
+        self.policy = policy
+        self.cycles = cycles
+        self.max_period = max_period
+
+    def session(self):
+        """Tracker for one run"""
+        return LoopTracker(self)
+
+
+def _completed(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class LoopTracker:
+    def __init__(self, guard):
+        self.guard = guard
+        self.history = []  # call keys of each turn
+        self.stopped = False
+        self._results = {}  # call key -> (turn, content, epoch) of read_only calls
+        self._epoch = 0  # incremented by every mutating call
+        self._repeats = {}
+
+    def before_tools(self, calls, tool_map):
+        """
+        Look for repeated calls of this turn before the tools run.
+
+        :return: {index: Future} of the calls answered from history instead of being run
+                 ("nudge" policy), for ToolExecutor.run_calls(precomputed=...)
+        """
+        self._repeats = self.check_calls(calls, tool_map)
+        if self.guard.policy != "nudge":
+            return {}
+        return {
+            index: _completed(tool_result(calls[index][0], content + repeat_note(calls[index][1], earlier_turn)))
+            for index, (earlier_turn, content) in self._repeats.items()
+        }
+
+    def after_tools(self, turn, calls, results, tool_map):
+        """
+        Record the turn, apply the policy to its results and describe what was detected.
+
+        :return: List of "loop" events: {"turn", "kind": "repeat" | "oscillation", "calls", "action"}
+        """
+        block = self.record(turn, calls, results, tool_map)
+        policy = self.guard.policy
+        events = []
+        if self._repeats:
+            if policy == "warn":
+                for index, (earlier_turn, _) in self._repeats.items():
+                    if results[index] is not None:
+                        results[index]["message"]["content"] += repeat_note(calls[index][1], earlier_turn)
+            events.append({
+                "type": "loop", "turn": turn, "kind": "repeat", "action": policy,
+                "calls": [_describe([call_key(*calls[index][1:])]) for index in sorted(self._repeats)],
+            })
+        if block is not None:
+            answered = [result for result in results if result is not None]
+            if policy != "stop" and answered:
+                answered[-1]["message"]["content"] += oscillation_warning(block)
+            events.append({
+                "type": "loop", "turn": turn, "kind": "oscillation", "action": policy,
+                "calls": [_describe(keys) for keys in block],
+            })
+        if events and policy == "stop":
+            self.stopped = True
+        return events
+
+    def check_calls(self, calls, tool_map):
+        """
+        Find repeated calls before the tools run.
+
+        :param calls: List of (call_id, func_name, args_str)
+        :return: {index: (earlier turn, earlier content)} of the calls that repeat a read_only
+                 call whose result cannot have changed
+        """
+        repeats = {}
+        epoch = self._epoch
+        for index, (_, func_name, args_str) in enumerate(calls):
+            func = tool_map.get(func_name) if tool_map else None
+            if func is None:
+                continue
+            if not is_read_only(func):
+                epoch += 1
+                continue
+            if not _reusable(func):
+                continue
+            seen = self._results.get(call_key(func_name, args_str))
+            if seen is not None and seen[2] == epoch:
+                repeats[index] = seen[:2]
+        return repeats
+
+    def record(self, turn, calls, results, tool_map):
+        """
+        Record the calls and results of a turn.
+
+        :return: The repeated block of turns (list of call-key tuples) if the run oscillates, else None
+        """
+        keys = []
+        for (_, func_name, args_str), result in zip(calls, results):
+            key = call_key(func_name, args_str)
+            keys.append(key)
+            func = tool_map.get(func_name) if tool_map else None
+            if func is None:
+                continue
+            if not is_read_only(func):
+                self._epoch += 1
+            elif _reusable(func) and _succeeded(result):
+                seen = self._results.get(key)
+                if seen is None or seen[2] != self._epoch:
+                    self._results[key] = (turn, result["message"]["content"], self._epoch)
+        self.history.append(tuple(keys))
+        return self._oscillation()
+
+    def _oscillation(self):
+        for period in range(1, self.guard.max_period + 1):
+            cycles = self.guard.cycles + (1 if period == 1 else 0)
+            if len(self.history) < period * cycles:
+                continue
+            block = self.history[-period:]
+            if not any(block):
+                continue
+            if all(self.history[-period * (c + 1):len(self.history) - period * c] == block for c in range(cycles)):
+                return block
+        return None
+
+
+def repeat_note(func_name, turn):
+    return (f"\n[Note: {func_name} was already called with these arguments in turn {turn} and nothing has "
+            f"changed since, so this is the same result. Use it instead of calling the tool again.]")
+
+
+def oscillation_warning(block):
+    actions = " -> ".join(_describe(keys) or "(no tools)" for keys in block)
+    return (f"\n[Warning: the last turns keep repeating the same actions ({actions}) without making progress. "
+            f"Change your approach, or give your final answer if the task cannot be completed.]")
@@ -0,0 +1,374 @@
+"""
+Local OpenAI-compatible mock server for offline benchmarks.
+
+Speaks just enough of the chat-completions API (streaming and non-streaming,
+reasoning_content, tool_calls, usage) for DeepSeekAgent / AsyncDeepSeekAgent to run
+against it without network access or a GPU.
+
+Scripted scenarios are available for each demo (math, adventure, web_search, word),
+and the first-token latency and token rates are configurable. Requests with thinking
+disabled (deepseek-chat, or thinking turned off in extra_body) get no reasoning_content.
+
+Usage:
+    python mock_server.py --port 8000 --latency 0.2
+    python mock_server.py --port 8000 --scenario word --tokens-per-second 50
+    # then point API_CONFIG["base_url"] at http://127.0.0.1:8000/v1
+"""
+import argparse
+import json
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _tool_call(name, arguments):
+    return {
+        "id": f"call_{uuid.uuid4().hex[:12]}",
+        "type": "function",
+        "function": {"name": name, "arguments": json.dumps(arguments, ensure_ascii=False)}
+    }
+
+
+def _round(messages):
+    """Number of assistant turns since the last user message"""
+    last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+    return sum(1 for m in messages[last_user + 1:] if m.get("role") == "assistant")
+
+
+def _thinking_disabled(body):
+    """Non-thinking request: deepseek-chat without thinking enabled, or thinking turned off explicitly"""
+    thinking = (body.get("thinking") or {}).get("type")
+    template_thinking = (body.get("chat_template_kwargs") or {}).get("thinking")
+    if thinking == "disabled" or template_thinking is False:
+        return True
+    return body.get("model") == "deepseek-chat" and thinking != "enabled"
+
+
+def calculator_scenario(messages, steps=3):
+    """
+    Default scenario (demo_math): one `calculate` call per turn until `steps` tool
+    results are in the conversation, then a final answer.
+    """
+    tool_results = sum(1 for m in messages if m.get("role") == "tool")
+    if tool_results < steps:
+        return {
+            "role": "assistant",
+            "content": "",
+            "reasoning_content": f"Step {tool_results + 1}: I should use the calculator.",
+            "tool_calls": [_tool_call("calculate", {"num1": tool_results + 1, "num2": 2, "operator": "*"})]
+        }
+    return {
+        "role": "assistant",
+        "content": f"Done after {tool_results} calculations.",
+        "reasoning_content": "All steps are finished, I can answer now."
+    }
+
+
+def scripted_scenario(script, answer):
+    """
+    Build a scenario from a fixed script.
+
+    :param script: List of (reasoning, [(tool name, arguments), ...]), one entry per turn
+    :param answer: Final content once the script is exhausted
+    """
+    def scenario(messages):
+        step = _round(messages)
+        if step < len(script):
+            reasoning, calls = script[step]
+            return {
+                "role": "assistant",
+                "content": "",
+                "reasoning_content": reasoning,
+                "tool_calls": [_tool_call(name, arguments) for name, arguments in calls]
+            }
+        return {"role": "assistant", "content": answer, "reasoning_content": "The task is finished."}
+    return scenario
+
+
+# demo_adventure: the shortest way out of the game
+adventure_scenario = scripted_scenario([
+    ("I should look around first.", [("look", {})]),
+    ("There is an exit to the north.", [("move", {"direction": "north"})]),
+    ("The west door is locked, the key may be in the storage room.", [("move", {"direction": "east"})]),
+    ("There is a key here.", [("take", {"item": "key"})]),
+    ("Back to the hallway.", [("move", {"direction": "west"})]),
+    ("Now I can unlock the west door.", [("unlock", {"direction": "west"})]),
+    ("The door is open.", [("move", {"direction": "west"})]),
+], "我已经成功逃出来了！")
+
+# demo_web_search: parallel calls, then a follow-up calculation
+web_search_scenario = scripted_scenario([
+    ("I need today's date and the university homepage.", [
+        ("get_current_time", {}),
+        ("visit_page", {"url": "https://www.ecnu.edu.cn/"}),
+    ]),
+    ("Now compute the number of years.", [("calculate", {"num1": 2025, "num2": 1951, "operator": "-"})]),
+], "华东师范大学建校已有 74 年。")
+
+# demo_word_web: inspect the form, fill it, check the result
+word_fill_scenario = scripted_scenario([
+    ("First list the tables in the document.", [("list_tables", {})]),
+    ("Analyze the structure of the first table.", [("analyze_table", {"table_index": 0})]),
+    ("Fill the basic information fields.", [("fill_multiple_by_labels", {
+        "table_index": 0,
+        "label_value_map": {"姓名": "张三", "性别": "男", "电话": "13800138000", "邮箱": "zhangsan@example.com"}
+    })]),
+    ("Check the filled table.", [("view_table", {"table_index": 0})]),
+], "表格已填写完成。")
+
+SCENARIOS = {
+    "math": calculator_scenario,
+    "adventure": adventure_scenario,
+    "web_search": web_search_scenario,
+    "word": word_fill_scenario,
+}
+
+
+def _count_tokens(text):
+    # Rough estimate, good enough for usage numbers in benchmarks
+    return max(1, len(text) // 4) if text else 0
+
+
+class _ThreadingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Clients closing keep-alive connections is normal during benchmarks
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body are written separately; without this, Nagle + delayed ACK
+        # add ~40ms to every response
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, obj, status=200):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json({"object": "list", "data": [{"id": "mock-model", "object": "model", "owned_by": "mock"}]})
+        else:
+            self._send_json({"error": {"message": "not found"}}, status=404)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json({"error": {"message": "not found"}}, status=404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server.mock
+
+        message = server.scenario(body.get("messages", []))
+        if _thinking_disabled(body):
+            message = {k: v for k, v in message.items() if k != "reasoning_content"}
+        usage = server.usage_for(body, message)
+        time.sleep(server.prefill_delay(usage))
+
+        if body.get("stream"):
+            self._stream(body, message, usage)
+        else:
+            time.sleep(server.decode_delay(usage["completion_tokens"]))
+            self._send_json({
+                "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock-model"),
+                "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"}],
+                "usage": usage
+            })
+
+    def _stream(self, body, message, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "mock-model"),
+        }
+
+        def send(payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        mock = self.server.mock
+
+        def send_delta(delta, finish_reason=None, text=""):
+            if text:
+                time.sleep(mock.decode_delay(_count_tokens(text)))
+            chunk = dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": finish_reason}])
+            send(json.dumps(chunk))
+
+        for piece in mock.split(message.get("reasoning_content") or ""):
+            send_delta({"role": "assistant", "reasoning_content": piece}, text=piece)
+        for piece in mock.split(message.get("content") or ""):
+            send_delta({"role": "assistant", "content": piece}, text=piece)
+        for index, tool_call in enumerate(message.get("tool_calls") or []):
+            send_delta({"tool_calls": [{
+                "index": index,
+                "id": tool_call["id"],
+                "type": "function",
+                "function": {"name": tool_call["function"]["name"], "arguments": ""}
+            }]})
+            for piece in mock.split(tool_call["function"]["arguments"]):
+                send_delta({"tool_calls": [{"index": index, "function": {"arguments": piece}}]}, text=piece)
+        send_delta({}, finish_reason="tool_calls" if message.get("tool_calls") else "stop")
+
+        if (body.get("stream_options") or {}).get("include_usage"):
+            send(json.dumps(dict(base, choices=[], usage=usage)))
+        send("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class MockChatServer:
+    """
+    In-process mock server. start() runs it on a daemon thread and returns the base_url.
+    """
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, scenario=None, chunk_chars=8,
+                 tokens_per_second=None, prompt_tokens_per_second=None):
+        """
+        :param host: Bind address
+        :param port: Bind port (0 = pick a free port)
+        :param latency: Seconds to wait before answering each request
+        :param scenario: callable(messages) -> assistant message dict, or a SCENARIOS name
+                         (default: calculator_scenario)
+        :param chunk_chars: Characters per streamed delta
+        :param tokens_per_second: Decode rate of completion tokens (None = instant)
+        :param prompt_tokens_per_second: Prefill rate added to the first-token latency (None = instant)
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.scenario = SCENARIOS[scenario] if isinstance(scenario, str) else scenario or calculator_scenario
+        self.chunk_chars = chunk_chars
+        self.tokens_per_second = tokens_per_second
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    def split(self, text):
+        return [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+
+    def prefill_delay(self, usage):
+        """Seconds before the first token: fixed latency plus prompt processing"""
+        delay = self.latency
+        if self.prompt_tokens_per_second:
+            delay += usage["prompt_tokens"] / self.prompt_tokens_per_second
+        return delay
+
+    def decode_delay(self, tokens):
+        return tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def usage_for(self, body, message):
+        prompt_tokens = sum(
+            _count_tokens(m.get("content") or "") + _count_tokens(m.get("reasoning_content") or "")
+            for m in body.get("messages", [])
+        )
+        reasoning_tokens = _count_tokens(message.get("reasoning_content") or "")
+        completion_tokens = reasoning_tokens + _count_tokens(message.get("content") or "") + sum(
+            _count_tokens(tc["function"]["arguments"]) for tc in message.get("tool_calls") or []
+        )
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "completion_tokens_details": {"reasoning_tokens": reasoning_tokens},
+            "prompt_cache_hit_tokens": 0,
+            "prompt_cache_miss_tokens": prompt_tokens,
+        }
+
+    def start(self):
+        self._server = _ThreadingServer((self.host, self.port), _Handler)
+        self._server.mock = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def start_subprocess(port, *args):
+    """
+    Run the mock server in a separate process (so that its threads and GIL do not
+    distort client-side measurements). Returns (Popen, base_url) once it accepts requests.
+    """
+    import urllib.request
+
+    process = subprocess.Popen(
+        [sys.executable, __file__, "--port", str(port), *map(str, args)],
+        stdout=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}/v1"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"{base_url}/models", timeout=1).close()
+            return process, base_url
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("mock server did not start")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock chat-completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--steps", type=int, default=3, help="tool calls before the final answer (math scenario)")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="math", help="scripted demo conversation")
+    parser.add_argument("--tokens-per-second", type=float, default=None, help="decode rate (default: instant)")
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=None, help="prefill rate (default: instant)")
+    args = parser.parse_args()
+
+    scenario = SCENARIOS[args.scenario]
+    if args.scenario == "math":
+        scenario = lambda messages: calculator_scenario(messages, args.steps)
+    server = MockChatServer(args.host, args.port, latency=args.latency, scenario=scenario,
+                            tokens_per_second=args.tokens_per_second,
+                            prompt_tokens_per_second=args.prompt_tokens_per_second)
+    print(f"[*] Mock server listening on {server.start()}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,132 @@
+"""
+In-memory store of visited pages, so that the web tools can return a page in chunks.
+
+visit_page used to put up to 50,000 characters of a page into one tool message, which
+then stayed in `messages` for every later turn. With the store, a long page is returned
+as an outline (its h1-h4 headings with their character offsets) and its first chunk,
+under a handle; read_page(handle, offset / section) serves the following chunks. The
+model pulls only the parts it needs.
+
+Handles are derived from the URL, so visiting a page again (or a visit_page result
+answered from the tool cache) gives the same handle. The store keeps the text of the
+`max_pages` most recently used pages (LRU); the URL of an evicted page is remembered,
+so that read_page can fetch it again (from the web cache when there is one).
+"""
+import hashlib
+import html as html_lib
+import re
+import threading
+from collections import OrderedDict
+
+_HEADING = re.compile(r"<h([1-4])\b[^>]*>(.*?)</h\1\s*>", re.I | re.S)
+_TAG = re.compile(r"<[^>]+>")
+_OUTLINE_MAX = 40
+
+
+def page_headings(html):
+    """[(level, title, first text fragment)] of the h1-h4 headings of a page, in document order"""
+    headings = []
+    for match in _HEADING.finditer(html):
+        fragments = [html_lib.unescape(s).strip() for s in _TAG.split(match.group(2))]
+        fragments = [s for s in fragments if s]
+        if fragments:
+            title = " ".join(" ".join(fragments).split())
+            headings.append((int(match.group(1)), title[:80], fragments[0]))
+    return headings
+
+
+def _line_start(text, index):
+    return text.rfind("\n", 0, index) + 1
+
+
+class PageStore:
+    def __init__(self, max_pages=32, chunk_chars=4000):
+        """
+        :param max_pages: Pages whose text is kept; least recently used ones are dropped first
+        :param chunk_chars: Size of the chunks served by chunk() (cut at a line break when possible)
+        """
+        self.max_pages = max_pages
+        self.chunk_chars = chunk_chars
+        self._pages = OrderedDict()  # handle -> {"handle", "url", "text", "sections"}
+        self._urls = {}  # handle -> url, also for evicted pages
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    @staticmethod
+    def handle_for(url):
+        return "p" + hashlib.sha1(url.encode("utf-8")).hexdigest()[:8]
+
+    def add(self, url, text, html=""):
+        """
+        Store the text of a page; its sections come from the headings of `html`.
+
+        :return: The stored page {"handle", "url", "text", "sections"}
+        """
+        sections = []
+        position = 0
+        for level, title, fragment in page_headings(html):
+            index = text.find(fragment, position)
+            if index >= 0:
+                offset = _line_start(text, index)
+                sections.append({"level": level, "title": title, "offset": offset})
+                position = index + len(fragment)
+        handle = self.handle_for(url)
+        page = {"handle": handle, "url": url, "text": text, "sections": sections}
+        with self._lock:
+            self._pages[handle] = page
+            self._pages.move_to_end(handle)
+            self._urls[handle] = url
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+                self.evictions += 1
+        return page
+
+    def get(self, handle):
+        """
+        The stored page {"handle", "url", "text", "sections"}, or None if it is unknown or
+        was evicted. Work from the returned page: it stays valid after an eviction.
+        """
+        with self._lock:
+            page = self._pages.get(handle)
+            if page is not None:
+                self._pages.move_to_end(handle)
+            return page
+
+    def url_of(self, handle):
+        return self._urls.get(handle)
+
+    def chunk(self, page, offset=0, limit=None):
+        """(text, end offset) of the chunk of `page` starting at `offset`, ended at a line break when possible"""
+        text = page["text"]
+        limit = limit or self.chunk_chars
+        offset = max(0, min(offset, len(text)))
+        end = min(len(text), offset + limit)
+        if end < len(text):
+            cut = text.rfind("\n", offset, end)
+            if cut > offset + limit // 2:
+                end = cut + 1
+        return text[offset:end], end
+
+    def find_section(self, page, section):
+        """Offset of a section given by its number in the outline (1-based) or part of its title, or None"""
+        sections = page["sections"]
+        section = str(section).strip()
+        if section.isdigit():
+            index = int(section) - 1
+            return sections[index]["offset"] if 0 <= index < len(sections) else None
+        for candidate in sections:
+            if candidate["title"] == section:
+                return candidate["offset"]
+        for candidate in sections:
+            if section.lower() in candidate["title"].lower():
+                return candidate["offset"]
+        return None
+
+    def outline(self, page):
+        """The numbered section list of a page, as shown to the model"""
+        sections = page["sections"]
+        lines = [f"{'  ' * (s['level'] - 1)}[{i}] {s['title']} (offset {s['offset']})"
+                 for i, s in enumerate(sections[:_OUTLINE_MAX], 1)]
+        if len(sections) > _OUTLINE_MAX:
+            lines.append(f"... {len(sections) - _OUTLINE_MAX} more sections")
+        return "\n".join(lines)
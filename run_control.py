@@ -0,0 +1,181 @@
+"""
+Cancellation and deadlines for an agent run.
+
+A RunControl is passed to DeepSeekAgent.run_events(). It can be cancelled from any
+thread (e.g. the /api/stop handler of the Word web demo), and it cancels itself when
+the per-turn or per-session deadline passes. On cancellation:
+
+- a streamed model response is closed right away, which drops the HTTP connection so
+  that the server stops generating, and the agent stops waiting for the next chunk;
+- a non-streaming request is abandoned (its timeout is the remaining deadline);
+- tool calls that have not started are cancelled, and the agent stops waiting for
+  running ones (Python threads cannot be killed; their results are discarded).
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+CANCEL_REASONS = ("stopped", "turn_timeout", "session_timeout")
+
+_END = object()
+_CANCEL = object()
+
+
+def _close_abandoned(future):
+    if not future.cancelled() and future.exception() is None and hasattr(future.result(), "close"):
+        future.result().close()
+
+
+class Cancelled(Exception):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class RunControl:
+    def __init__(self, session_timeout=None, turn_timeout=None):
+        """
+        :param session_timeout: Seconds the whole run may take (None = no limit)
+        :param turn_timeout: Seconds one turn (model request + tools) may take (None = no limit)
+        """
+        self.session_timeout = session_timeout
+        self.turn_timeout = turn_timeout
+        self.reason = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._timers = {}
+        self._deadlines = {}
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="stopped"):
+        """Cancel the run (idempotent; the first reason wins)"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def add_callback(self, callback):
+        """Call `callback` on cancellation (right away if already cancelled)"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def _start_timer(self, name, seconds):
+        old = self._timers.pop(name, None)
+        if old is not None:
+            old.cancel()
+        if seconds is not None:
+            timer = threading.Timer(seconds, self.cancel, args=(f"{name}_timeout",))
+            timer.daemon = True
+            timer.start()
+            self._timers[name] = timer
+            self._deadlines[name] = time.monotonic() + seconds
+
+    def start_session(self):
+        self._start_timer("session", self.session_timeout)
+
+    def start_turn(self):
+        self._start_timer("turn", self.turn_timeout)
+
+    def finish(self):
+        """Stop the deadline timers once the run is over"""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        self._deadlines.clear()
+
+    def remaining(self):
+        """Seconds until the nearest deadline (None = no deadline)"""
+        if not self._deadlines:
+            return None
+        return max(0.0, min(self._deadlines.values()) - time.monotonic())
+
+    def sleep(self, seconds):
+        """Sleep up to `seconds`; returns True (early) if the run is cancelled meanwhile"""
+        return self._event.wait(seconds)
+
+    def wait_for(self, future):
+        """Result of a Future, or Cancelled as soon as the run is cancelled"""
+        wake = threading.Event()
+        future.add_done_callback(lambda f: wake.set())
+        self.add_callback(wake.set)
+        try:
+            wake.wait()
+        finally:
+            self.remove_callback(wake.set)
+        if future.done():
+            return future.result()
+        future.cancel()
+        raise Cancelled(self.reason)
+
+    def call(self, func, *args, **kwargs):
+        """Run a blocking call on a helper thread and stop waiting for it on cancellation"""
+        future = Future()
+        future.set_running_or_notify_cancel()  # so that wait_for() cannot cancel it
+
+        def target():
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=target, daemon=True).start()
+        try:
+            return self.wait_for(future)
+        except Cancelled:
+            # e.g. a stream whose headers arrive after the stop: close it when it does
+            future.add_done_callback(_close_abandoned)
+            raise
+
+    def iterate(self, stream):
+        """
+        Iterate a streamed response; on cancellation the stream is closed and
+        Cancelled is raised without waiting for the next chunk.
+        """
+        items = queue.Queue()
+
+        def reader():
+            try:
+                for chunk in stream:
+                    items.put(chunk)
+                items.put((_END, None))
+            except Exception as e:
+                items.put((_END, e))
+
+        def on_cancel():
+            items.put(_CANCEL)
+            stream.close()
+
+        threading.Thread(target=reader, daemon=True).start()
+        self.add_callback(on_cancel)
+        try:
+            while True:
+                item = items.get()
+                if item is _CANCEL or self._event.is_set():
+                    raise Cancelled(self.reason)
+                if isinstance(item, tuple) and item and item[0] is _END:
+                    if item[1] is not None:
+                        raise item[1]
+                    return
+                yield item
+        finally:
+            self.remove_callback(on_cancel)
@@ -0,0 +1,188 @@
+"""
+Parallel sampling with self-consistency voting.
+
+For tasks with a checkable answer (demo_math, demo_web_search), k independent agent
+trajectories run at the same time and the final answers are majority-voted. As soon
+as `quorum` trajectories agree, the others are cancelled (their streams closed, their
+tool calls abandoned), so the wall time is that of the quorum-th fastest trajectory
+rather than the slowest one.
+
+Every trajectory gets its own copy of `messages` and its own tool map from
+`tools_factory`, so tool state (e.g. a GameState) is never shared between them.
+Answers are compared through `answer_key`: by default the last number of the final
+content (so "结果是 1027" and "1027.0" agree), otherwise the normalized text.
+
+Usage:
+    python self_consistency.py --demo math -k 5
+    python self_consistency.py --demo web_search -k 3 --quorum 2 --temperature 0.7 --baseline
+"""
+import argparse
+import copy
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from run_control import RunControl
+
+_NUMBER = re.compile(r"-?\d+(?:,\d{3})*(?:\.\d+)?")
+
+
+def answer_key(content):
+    """Last number of the answer (formatting normalized), or its lowercased text without spaces"""
+    if not content:
+        return None
+    numbers = _NUMBER.findall(content)
+    if numbers:
+        value = float(numbers[-1].replace(",", ""))
+        return str(int(value)) if value.is_integer() else f"{value:g}"
+    return "".join(content.lower().split())
+
+
+def run_trajectory(agent, messages, tools, tool_map, max_turns, control=None):
+    """Run one trajectory without console output: {"status", "content", "turns", "wall_time", "stats"}"""
+    started = time.perf_counter()
+    result = {"status": None, "content": None, "turns": 0, "stats": None}
+    for event in agent.run_events(messages, tools, tool_map, max_turns, control=control):
+        if event["type"] == "message" and event["content"]:
+            result["content"] = event["content"]
+        elif event["type"] == "done":
+            result.update(status=event["reason"], turns=len(event["stats"].turns), stats=event["stats"])
+    result["wall_time"] = time.perf_counter() - started
+    return result
+
+
+class SelfConsistency:
+    def __init__(self, agent, k=5, quorum=None, temperature=None, key=answer_key):
+        """
+        :param agent: DeepSeekAgent shared by the trajectories (its client pool and tool executor are thread-safe)
+        :param k: Number of trajectories
+        :param quorum: Agreeing answers that end the vote early (default: a majority of k)
+        :param temperature: Sampling temperature sent with every request (None = server default)
+        :param key: Callable mapping final content to the value that is voted on
+        """
+        self.agent = agent
+        if temperature is not None:
+            self.agent = copy.copy(agent)
+            self.agent.extra_body = dict(agent.extra_body, temperature=temperature)
+        self.k = k
+        self.quorum = quorum or k // 2 + 1
+        self.key = key
+
+    def run(self, messages, tools_factory, max_turns=10, on_result=None):
+        """
+        :param messages: Initial messages (copied for every trajectory)
+        :param tools_factory: Callable returning a fresh (tools, tool_map) for one trajectory
+        :param max_turns: Maximum turns of each trajectory
+        :param on_result: Optional callable(index, trajectory result) called as trajectories finish
+        :return: {"answer", "content", "votes", "quorum_reached", "trajectories", "cancelled", "wall_time"}
+        """
+        started = time.perf_counter()
+        controls = [RunControl(self.agent.session_timeout, self.agent.turn_timeout) for _ in range(self.k)]
+        votes = Counter()
+        contents = {}
+        trajectories = [None] * self.k
+        winner = None
+
+        def trajectory(index):
+            tools, tool_map = tools_factory()
+            return run_trajectory(self.agent, copy.deepcopy(messages), tools, tool_map, max_turns, controls[index])
+
+        pool = ThreadPoolExecutor(max_workers=self.k, thread_name_prefix="trajectory")
+        futures = {pool.submit(trajectory, index): index for index in range(self.k)}
+        pending = set(futures)
+        try:
+            while pending and winner is None:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {"status": "error", "content": None, "turns": 0, "error": f"{type(e).__name__}: {e}"}
+                    result["answer"] = self.key(result["content"]) if result["status"] == "completed" else None
+                    trajectories[index] = result
+                    if on_result:
+                        on_result(index, result)
+                    if result["answer"] is not None:
+                        votes[result["answer"]] += 1
+                        contents.setdefault(result["answer"], result["content"])
+                        if votes[result["answer"]] >= self.quorum and winner is None:
+                            winner = result["answer"]
+        finally:
+            # Early quorum: the remaining trajectories are stopped and not waited for
+            for control in controls:
+                control.cancel("stopped")
+            pool.shutdown(wait=False)
+
+        if winner is None and votes:
+            winner = votes.most_common(1)[0][0]
+        return {
+            "answer": winner,
+            "content": contents.get(winner),
+            "votes": dict(votes),
+            "quorum_reached": bool(votes) and votes[winner] >= self.quorum,
+            "trajectories": trajectories,
+            "cancelled": sum(1 for t in trajectories if t is None),
+            "wall_time": time.perf_counter() - started,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--demo", choices=["math", "web_search"], default="math", help="task and tool set")
+    parser.add_argument("--prompt", help="task prompt (default: the demo's own)")
+    parser.add_argument("-k", type=int, default=5, help="number of trajectories")
+    parser.add_argument("--quorum", type=int, default=None, help="agreeing answers that end the vote (default: majority)")
+    parser.add_argument("--temperature", type=float, default=None, help="sampling temperature")
+    parser.add_argument("--max-turns", type=int, default=15, help="maximum turns of each trajectory")
+    parser.add_argument("--baseline", action="store_true", help="run a single trajectory first and compare wall time")
+    args = parser.parse_args()
+
+    from batch_runner import TOOL_SETS
+    from config import API_CONFIG
+    from deepseek_agent import DeepSeekAgent
+    from tool_executor import ToolExecutor
+    if args.demo == "math":
+        from demo_math import PROMPT
+    else:
+        from demo_web_search import PROMPT
+
+    messages = [{"role": "user", "content": args.prompt or PROMPT}]
+    agent = DeepSeekAgent(**API_CONFIG, tool_executor=ToolExecutor(max_workers=args.k))
+    voter = SelfConsistency(agent, args.k, args.quorum, args.temperature)
+    print(f"[*] {args.demo}: {args.k} trajectories, quorum {voter.quorum}")
+
+    baseline = None
+    if args.baseline:
+        tools, tool_map = TOOL_SETS[args.demo]()
+        baseline = run_trajectory(voter.agent, list(messages), tools, tool_map, args.max_turns)
+        print(f"[*] Single run: {answer_key(baseline['content'])!r} ({baseline['status']}, "
+              f"{baseline['turns']} turns, {baseline['wall_time']:.2f}s)")
+
+    lock = threading.Lock()
+
+    def on_result(index, result):
+        with lock:
+            print(f"[*] Trajectory {index + 1}: {result['answer']!r} ({result['status']}, "
+                  f"{result['turns']} turns, {result['wall_time']:.2f}s)")
+
+    outcome = voter.run(messages, TOOL_SETS[args.demo], args.max_turns, on_result)
+    votes = ", ".join(f"{answer!r}: {count}" for answer, count in sorted(outcome["votes"].items(), key=lambda v: -v[1]))
+    print(f"\n[*] Answer: {outcome['answer']!r} (votes: {votes or 'none'}; "
+          f"{'quorum reached' if outcome['quorum_reached'] else 'no quorum'}, {outcome['cancelled']} cancelled)")
+    if outcome["content"]:
+        print(f"[Final Content]:\n{outcome['content']}")
+    print(f"[*] Wall time: {outcome['wall_time']:.2f}s", end="")
+    if baseline:
+        print(f" vs single run {baseline['wall_time']:.2f}s ({outcome['wall_time'] / baseline['wall_time']:.2f}x)")
+    else:
+        print()
+    finished = [t for t in outcome["trajectories"] if t and t.get("stats")]
+    tokens = sum(t["stats"].prompt_tokens + t["stats"].completion_tokens for t in finished)
+    print(f"[*] Tokens of the finished trajectories: {tokens}")
+
+
+if __name__ == "__main__":
+    main()
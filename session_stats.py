@@ -0,0 +1,213 @@
+"""
+Per-turn usage and latency instrumentation.
+
+Every model request records prompt / completion / reasoning tokens, the DeepSeek
+prompt-cache fields (prompt_cache_hit_tokens / prompt_cache_miss_tokens) and the
+LLM and tool latency of the turn. SessionStats aggregates them for one run() so
+that the prefix-cache hit rate of a message layout can be checked directly.
+"""
+
+
+def _field(obj, name):
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def read_usage(usage):
+    """
+    Normalize a response `usage` object (SDK object or dict) into a flat dict.
+
+    DeepSeek reports prompt_cache_hit_tokens / prompt_cache_miss_tokens; OpenAI-style
+    servers (vLLM, SGLang) report prompt_tokens_details.cached_tokens instead.
+    """
+    if usage is None:
+        return None
+    prompt_tokens = _field(usage, "prompt_tokens") or 0
+    completion_tokens = _field(usage, "completion_tokens") or 0
+    reasoning_tokens = _field(_field(usage, "completion_tokens_details"), "reasoning_tokens") or 0
+
+    cache_hit = _field(usage, "prompt_cache_hit_tokens")
+    cache_miss = _field(usage, "prompt_cache_miss_tokens")
+    if cache_hit is None:
+        cache_hit = _field(_field(usage, "prompt_tokens_details"), "cached_tokens")
+        if cache_hit is not None:
+            cache_miss = prompt_tokens - cache_hit
+
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "reasoning_tokens": reasoning_tokens,
+        "prompt_cache_hit_tokens": cache_hit,
+        "prompt_cache_miss_tokens": cache_miss,
+    }
+
+
+class TurnStats:
+    def __init__(self, turn, usage=None, llm_latency=0.0, ttft=None, tool_latency=0.0, tool_calls=0,
+                 invalid_tool_calls=0, repeated_calls=0, calls_saved=0, oscillation=False, mode=None):
+        self.turn = turn
+        self.usage = usage  # read_usage() dict, or None if the server sent no usage
+        self.llm_latency = llm_latency
+        self.ttft = ttft
+        self.tool_latency = tool_latency
+        self.tool_calls = tool_calls
+        self.invalid_tool_calls = invalid_tool_calls  # rejected for malformed / schema-violating arguments
+        self.repeated_calls = repeated_calls  # read_only calls repeating an unchanged earlier result (loop_guard)
+        self.calls_saved = calls_saved  # repeated calls answered from history, the tool not run (loop_guard "nudge")
+        self.oscillation = oscillation  # this turn completed a repeated block of turns (loop_guard)
+        self.mode = mode  # "thinking" / "fast" when a ThinkingRouter chose it, else None
+
+    def to_dict(self):
+        return {
+            "turn": self.turn,
+            "usage": self.usage,
+            "llm_latency": self.llm_latency,
+            "ttft": self.ttft,
+            "tool_latency": self.tool_latency,
+            "tool_calls": self.tool_calls,
+            "invalid_tool_calls": self.invalid_tool_calls,
+            "repeated_calls": self.repeated_calls,
+            "calls_saved": self.calls_saved,
+            "oscillation": self.oscillation,
+            "mode": self.mode,
+        }
+
+
+class SessionStats:
+    """Summary of one agent run, returned by DeepSeekAgent.run()"""
+    def __init__(self, model_name=None):
+        self.model_name = model_name
+        self.turns = []
+        self.stop_reason = None
+        self.wall_time = 0.0
+        self.stop_turns_saved = 0  # turns left when the loop guard ended the run (loop_guard "stop" only)
+
+    def add_turn(self, turn_stats):
+        self.turns.append(turn_stats)
+
+    def _sum(self, key):
+        return sum((t.usage or {}).get(key) or 0 for t in self.turns)
+
+    @property
+    def prompt_tokens(self):
+        return self._sum("prompt_tokens")
+
+    @property
+    def completion_tokens(self):
+        return self._sum("completion_tokens")
+
+    @property
+    def reasoning_tokens(self):
+        return self._sum("reasoning_tokens")
+
+    @property
+    def cache_hit_tokens(self):
+        return self._sum("prompt_cache_hit_tokens")
+
+    @property
+    def cache_miss_tokens(self):
+        return self._sum("prompt_cache_miss_tokens")
+
+    @property
+    def cache_hit_rate(self):
+        """Share of prompt tokens served from the prefix cache (None if not reported)"""
+        reported = self.cache_hit_tokens + self.cache_miss_tokens
+        return self.cache_hit_tokens / reported if reported else None
+
+    @property
+    def validation_error_turns(self):
+        """Turns with at least one rejected tool call, i.e. round trips spent on fixing arguments"""
+        return sum(1 for t in self.turns if t.invalid_tool_calls)
+
+    @property
+    def repeated_calls(self):
+        return sum(t.repeated_calls for t in self.turns)
+
+    @property
+    def calls_saved(self):
+        return sum(t.calls_saved for t in self.turns)
+
+    @property
+    def oscillations(self):
+        return sum(1 for t in self.turns if t.oscillation)
+
+    @property
+    def fast_turns(self):
+        return sum(1 for t in self.turns if t.mode == "fast")
+
+    def routing_savings(self):
+        """
+        Estimated LLM latency and completion tokens saved by the fast turns: their count times
+        the difference between the average thinking turn and the average fast turn.
+        None without both kinds of turns to compare.
+        """
+        thinking = [t for t in self.turns if t.mode == "thinking"]
+        fast = [t for t in self.turns if t.mode == "fast"]
+        if not thinking or not fast:
+            return None
+
+        def average(turns, value):
+            return sum(value(t) for t in turns) / len(turns)
+
+        def tokens(t):
+            return (t.usage or {}).get("completion_tokens") or 0
+
+        return {
+            "fast_turns": len(fast),
+            "latency": len(fast) * (average(thinking, lambda t: t.llm_latency) - average(fast, lambda t: t.llm_latency)),
+            "completion_tokens": round(len(fast) * (average(thinking, tokens) - average(fast, tokens))),
+        }
+
+    @property
+    def llm_latency(self):
+        return sum(t.llm_latency for t in self.turns)
+
+    @property
+    def tool_latency(self):
+        return sum(t.tool_latency for t in self.turns)
+
+    def to_dict(self):
+        return {
+            "model_name": self.model_name,
+            "turns": len(self.turns),
+            "stop_reason": self.stop_reason,
+            "wall_time": self.wall_time,
+            "llm_latency": self.llm_latency,
+            "tool_latency": self.tool_latency,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "reasoning_tokens": self.reasoning_tokens,
+            "prompt_cache_hit_tokens": self.cache_hit_tokens,
+            "prompt_cache_miss_tokens": self.cache_miss_tokens,
+            "cache_hit_rate": self.cache_hit_rate,
+            "validation_error_turns": self.validation_error_turns,
+            "repeated_calls": self.repeated_calls,
+            "oscillations": self.oscillations,
+            "calls_saved": self.calls_saved,
+            "stop_turns_saved": self.stop_turns_saved,
+            "routing_savings": self.routing_savings(),
+            "per_turn": [t.to_dict() for t in self.turns],
+        }
+
+    def summary(self):
+        hit_rate = self.cache_hit_rate
+        hit_text = f"{hit_rate:.1%}" if hit_rate is not None else "n/a"
+        summary = (
+            f"{len(self.turns)} turns in {self.wall_time:.2f}s "
+            f"(LLM {self.llm_latency:.2f}s, tools {self.tool_latency:.2f}s) | "
+            f"prompt {self.prompt_tokens} (cache hit {hit_text}), "
+            f"completion {self.completion_tokens} (reasoning {self.reasoning_tokens})"
+        )
+        if self.validation_error_turns:
+            summary += f" | {self.validation_error_turns} turns with invalid tool arguments"
+        if self.repeated_calls or self.oscillations:
+            summary += (f" | loops: {self.repeated_calls} repeated calls ({self.calls_saved} not run), "
+                        f"{self.oscillations} oscillating turns, {self.stop_turns_saved} turns saved by stopping")
+        savings = self.routing_savings()
+        if savings:
+            summary += (f" | routing: {savings['fast_turns']} fast turns, ~{savings['latency']:.2f}s and "
+                        f"~{savings['completion_tokens']} completion tokens saved (est.)")
+        return summary
@@ -0,0 +1,126 @@
+"""
+Per-turn thinking-mode routing.
+
+Not every turn needs reasoning: after a successful `fill_by_label`, the next turn is
+often just a confirmation or the next mechanical fill. ThinkingRouter decides before
+each request whether the turn runs in "thinking" mode (the agent's own model_name /
+extra_body) or in "fast" mode (e.g. deepseek-chat, or thinking disabled through
+extra_body), from a list of rules. The first rule that returns a mode wins; turns no
+rule decides use thinking mode.
+
+Built-in rules (by name):
+    first_turn       the first turn of a run thinks (planning)
+    after_errors     a turn after a failed or rejected tool call thinks
+    after_read_only  a turn after only read_only tool calls is fast
+    fast_after       a turn after only tools listed in `fast_after` (all successful) is fast
+
+Custom rules are callables taking a RouteContext and returning "thinking", "fast" or None.
+
+reasoning_content passback stays valid: `messages` is never stripped, so later thinking
+turns still see the reasoning of earlier ones, and assistant messages with tool calls
+from fast turns get an empty reasoning_content, as thinking mode expects on every
+assistant tool-call message of the current exchange.
+"""
+from tool_executor import is_read_only
+
+THINKING = "thinking"
+FAST = "fast"
+
+
+class RouteContext:
+    """What the rules see: the coming turn and the calls / results of the previous one"""
+    def __init__(self, turn, messages, tool_map, calls, results):
+        self.turn = turn
+        self.messages = messages
+        self.tool_map = tool_map or {}
+        self.calls = calls  # [(call_id, func_name, args_str)] of the previous turn
+        self.results = results  # matching ToolExecutor results (None for unknown tools)
+
+
+def first_turn(context):
+    return THINKING if not context.calls else None
+
+
+def after_errors(context):
+    if any(result is None or result["error"] for result in context.results):
+        return THINKING
+    return None
+
+
+def after_read_only(context):
+    funcs = [context.tool_map.get(name) for _, name, _ in context.calls]
+    if funcs and all(func is not None and is_read_only(func) for func in funcs):
+        return FAST
+    return None
+
+
+RULES = {"first_turn": first_turn, "after_errors": after_errors, "after_read_only": after_read_only}
+
+
+class ThinkingRouter:
+    def __init__(self, fast=None, thinking=None, rules=("first_turn", "after_errors", "after_read_only", "fast_after"),
+                 fast_after=None, strip_reasoning=False):
+        """
+        :param fast: {"model_name", "extra_body"} of fast turns; missing keys keep the agent's value
+                     (default: deepseek-chat, i.e. the official API without thinking)
+        :param thinking: Same for thinking turns (default: the agent's model_name / extra_body)
+        :param rules: Rule names (see the module docstring) or callables, checked in order
+        :param fast_after: Tool names whose successful calls make the next turn fast
+                           (e.g. ["fill_by_label", "fill_cell"])
+        :param strip_reasoning: Send fast requests without reasoning_content in the history,
+                                for servers that reject it outside thinking mode (costs prefix-cache hits)
+        """
+        self.modes = {
+            FAST: {"model_name": "deepseek-chat", "extra_body": {}} if fast is None else dict(fast),
+            THINKING: dict(thinking or {}),
+        }
+        self.fast_after = set(fast_after or [])
+        self.strip_reasoning = strip_reasoning
+        self.rules = []
+        for rule in rules:
+            if rule == "fast_after":
+                self.rules.append(("fast_after", self._fast_after))
+            elif isinstance(rule, str):
+                self.rules.append((rule, RULES[rule]))
+            else:
+                self.rules.append((getattr(rule, "__name__", "custom"), rule))
+
+    def _fast_after(self, context):
+        names = [name for _, name, _ in context.calls]
+        if names and self.fast_after.issuperset(names):
+            return FAST
+        return None
+
+    def route(self, context):
+        """
+        :return: (mode, name of the deciding rule or None)
+        """
+        for name, rule in self.rules:
+            mode = rule(context)
+            if mode is not None:
+                return mode, name
+        return THINKING, None
+
+    def request_options(self, mode, model_name, extra_body):
+        """(model_name, extra_body) of a turn in `mode`, starting from the agent's own values"""
+        options = self.modes[mode]
+        return options.get("model_name", model_name), options.get("extra_body", extra_body)
+
+    def request_messages(self, mode, messages):
+        """Messages to send in `mode` (a copy without reasoning_content if strip_reasoning is set)"""
+        if mode != FAST or not self.strip_reasoning:
+            return messages
+        return [
+            {k: v for k, v in m.items() if k != "reasoning_content"} if isinstance(m, dict) else m
+            for m in messages
+        ]
+
+    def prepare_message(self, mode, message):
+        """Assistant message of a fast turn as appended to `messages`"""
+        if mode != FAST:
+            return message
+        if not isinstance(message, dict):
+            message = message.model_dump(exclude_none=True)
+        if message.get("tool_calls") and "reasoning_content" not in message:
+            message["reasoning_content"] = ""
+        return message
@@ -0,0 +1,126 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def cache_key(func_name, args_str):
+    """Tool name + canonical JSON of the arguments (key order and spacing do not matter)"""
+    try:
+        canonical = json.dumps(json.loads(args_str), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    except (TypeError, ValueError):
+        canonical = args_str
+    return f"{func_name}:{canonical}"
+
+
+class ToolResultCache:
+    """
+    Memoizing cache for tool results with per-tool TTL and LRU eviction.
+
+    Only tools marked read_only are cached, and only successful results: a tool reports
+    a failure that may go away on retry (network errors, unknown handles) by raising, so
+    that execute_tool_call() marks the result as an error. Text the tool returns is cached
+    as it is, even if it reads like an error message.
+
+    A tool that is not read_only invalidates the tools listed in its `invalidates` option
+    after it runs (or the whole cache if it declares none), so e.g. fill_by_label drops
+    cached view_table results.
+
+    TTL per tool comes from, in order: the `ttls` mapping, the tool's `cache_ttl`
+    option, then `default_ttl`. A TTL of 0 disables caching for that tool.
+    """
+    def __init__(self, max_entries=256, default_ttl=300, ttls=None):
+        """
+        :param max_entries: Size bound; least recently used entries are evicted first
+        :param default_ttl: Seconds a result stays valid (None = until evicted/invalidated)
+        :param ttls: Optional {tool name: ttl} overrides
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+        self._entries = OrderedDict()  # key -> (func_name, expires_at, content)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def ttl_for(self, func_name, func):
+        if func_name in self.ttls:
+            return self.ttls[func_name]
+        return getattr(func, 'tool_cache_ttl', self.default_ttl)
+
+    def cacheable(self, func_name, func):
+        return getattr(func, 'tool_read_only', False) and self.ttl_for(func_name, func) != 0
+
+    def get(self, func_name, args_str):
+        key = cache_key(func_name, args_str)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                _, expires_at, content = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return content
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, func_name, args_str, content, ttl):
+        key = cache_key(func_name, args_str)
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (func_name, expires_at, content)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, func_names=None):
+        """
+        Drop cached results of the given tools (None = everything).
+        """
+        with self._lock:
+            if func_names is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                names = set(func_names)
+                stale = [key for key, (name, _, _) in self._entries.items() if name in names]
+                for key in stale:
+                    del self._entries[key]
+                removed = len(stale)
+            self.invalidations += removed
+
+    def clear(self):
+        self.invalidate()
+
+    def lookup(self, func_name, args_str, func):
+        """Cached content for a call, or None (also None for tools that are not cacheable)"""
+        if func is None or not self.cacheable(func_name, func):
+            return None
+        return self.get(func_name, args_str)
+
+    def store(self, func_name, args_str, func, result):
+        """
+        Called after a tool ran with its execute_tool_call() result: caches successful
+        read-only results and applies the invalidation rule of mutating tools.
+        """
+        if func is None:
+            return
+        if not getattr(func, 'tool_read_only', False):
+            self.invalidate(getattr(func, 'tool_invalidates', None))
+        elif result is not None and not result["error"] and self.cacheable(func_name, func):
+            self.put(func_name, args_str, result["message"]["content"], self.ttl_for(func_name, func))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,405 @@
+import asyncio
+import contextvars
+import inspect
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from run_control import Cancelled
+from tracing import span
+
+
+def tool_options(concurrent=True, use_process=False, read_only=False, cache_ttl=None, invalidates=None):
+    """
+    Decorator that attaches execution hints to a tool function.
+
+    :param concurrent: False if the tool touches shared state and must never run
+                       alongside another tool call (e.g. WordEngine mutators)
+    :param use_process: Run the tool in the process pool (CPU-bound tools; the
+                        function and its arguments must be picklable)
+    :param read_only: True if the tool has no side effects, so it may be started
+                      speculatively and its result thrown away (and may be cached;
+                      such a tool should raise on failure rather than return an error text)
+    :param cache_ttl: Seconds a cached result of this read_only tool stays valid
+                      (None = the cache default, 0 = never cache)
+    :param invalidates: For mutating tools, names of the read_only tools whose cached
+                        results become stale after it runs (None = all of them)
+    """
+    def decorator(func):
+        func.tool_concurrent = concurrent
+        func.tool_use_process = use_process
+        func.tool_read_only = read_only
+        if cache_ttl is not None:
+            func.tool_cache_ttl = cache_ttl
+        if invalidates is not None:
+            func.tool_invalidates = list(invalidates)
+        return func
+    return decorator
+
+
+def is_concurrent(func):
+    return getattr(func, 'tool_concurrent', True)
+
+
+def is_read_only(func):
+    return getattr(func, 'tool_read_only', False)
+
+
+def _invoke(func, args):
+    # Module level so that it can be pickled for the process pool
+    return func(**args)
+
+
+def format_tool_message(call_id, content):
+    return {
+        "role": "tool",
+        "tool_call_id": call_id,
+        "content": content
+    }
+
+
+def tool_result(call_id, result, cached=False):
+    return {"message": format_tool_message(call_id, str(result)), "error": False, "cached": cached}
+
+
+def tool_error(call_id, func_name, args_str, exc):
+    if isinstance(exc, json.JSONDecodeError):
+        content = (f"Error: Failed to decode arguments of tool {func_name} as JSON "
+                   f"({exc.msg} at position {exc.pos}): {args_str}")
+        return {"message": format_tool_message(call_id, content), "error": True, "invalid": True}
+    content = f"Error executing tool {func_name}: {str(exc)}"
+    return {"message": format_tool_message(call_id, content), "error": True}
+
+
+def tool_cancelled(call_id, func_name):
+    return {"message": format_tool_message(call_id, f"Error: Tool {func_name} was cancelled"), "error": True}
+
+
+def decode_arguments(call_id, func_name, args_str, validator=None):
+    """
+    Parse the JSON arguments of a call and check them against the tool's schema.
+
+    :param validator: Optional tool_schema.ToolValidator (coerces types, fills defaults)
+    :return: (args, None), or (None, error result) for arguments the model has to fix
+    """
+    try:
+        args = json.loads(args_str)
+    except json.JSONDecodeError as e:
+        return None, tool_error(call_id, func_name, args_str, e)
+    if validator is not None:
+        args, error = validator(args)
+        if error:
+            return None, {"message": format_tool_message(call_id, error), "error": True, "invalid": True}
+    return args, None
+
+
+def execute_tool_call(call_id, func_name, args_str, tool_map, invoke=None, validator=None):
+    """
+    Execute one tool call and build its `tool` message.
+
+    Returns {"message": tool message dict, "error": bool}, or None when the tool is
+    not in tool_map (no tool message is produced in that case). Results of calls
+    rejected before running (malformed JSON, schema violations) also carry "invalid": True.
+
+    :param invoke: Optional callable(func, args) used to run the tool (defaults to a direct call)
+    :param validator: Optional tool_schema.ToolValidator applied to the arguments first
+    """
+    if not tool_map or func_name not in tool_map:
+        return None
+
+    args, error = decode_arguments(call_id, func_name, args_str, validator)
+    if error:
+        return error
+    try:
+        func = tool_map[func_name]
+        with span(func_name, "tool", call_id=call_id):
+            result = invoke(func, args) if invoke else func(**args)
+    except Exception as e:
+        return tool_error(call_id, func_name, args_str, e)
+    return tool_result(call_id, result)
+
+
+async def execute_tool_call_async(call_id, func_name, args_str, tool_map, validator=None):
+    """
+    Async counterpart of execute_tool_call(): coroutine tools are awaited on the
+    event loop, plain functions run in a worker thread so they never block it.
+    """
+    if not tool_map or func_name not in tool_map:
+        return None
+
+    func = tool_map[func_name]
+    if not inspect.iscoroutinefunction(func):
+        return await asyncio.to_thread(execute_tool_call, call_id, func_name, args_str, tool_map, None, validator)
+
+    args, error = decode_arguments(call_id, func_name, args_str, validator)
+    if error:
+        return error
+    try:
+        with span(func_name, "tool", call_id=call_id):
+            result = await func(**args)
+    except Exception as e:
+        return tool_error(call_id, func_name, args_str, e)
+    return tool_result(call_id, result)
+
+
+class ToolExecutor:
+    """
+    Runs the tool calls of one assistant message.
+
+    Consecutive concurrent tools are submitted to a thread pool (or the process pool
+    for tools marked with use_process=True) and run together; a tool marked
+    concurrent=False acts as a barrier and runs alone, in its original position.
+    Results are always returned in the original tool_call order.
+    """
+    def __init__(self, max_workers=4, max_process_workers=None, cache=None):
+        """
+        :param max_workers: Thread pool size for I/O-bound tools (1 = run sequentially)
+        :param max_process_workers: Process pool size for tools marked use_process=True
+                                    (None = os.cpu_count())
+        :param cache: Optional ToolResultCache consulted before read_only tools run
+        """
+        self.max_workers = max_workers
+        self.max_process_workers = max_process_workers
+        self.cache = cache
+        self._thread_pool = None
+        self._process_pool = None
+        self._lock = threading.Lock()
+        # Held while a concurrent=False tool runs, so that speculative calls started
+        # in the background never overlap with it
+        self._serial_lock = threading.Lock()
+
+    def _get_thread_pool(self):
+        with self._lock:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tool")
+            return self._thread_pool
+
+    def _get_process_pool(self):
+        with self._lock:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(max_workers=self.max_process_workers)
+            return self._process_pool
+
+    def _process_invoke(self, func, args):
+        return self._get_process_pool().submit(_invoke, func, args).result()
+
+    def _submit(self, call, tool_map, validators):
+        # In the caller's context, so that the tool's spans go to the caller's trace
+        context = contextvars.copy_context()
+        return self._get_thread_pool().submit(context.run, self._run_one, call, tool_map, validators)
+
+    def submit(self, call, tool_map, validators=None):
+        """Start one tool call in the background and return its Future"""
+        return self._submit(call, tool_map, validators)
+
+    def run_calls(self, calls, tool_map, precomputed=None, control=None, validators=None):
+        """
+        Execute tool calls and return their results in order.
+
+        :param calls: List of (call_id, func_name, args_str)
+        :param tool_map: Tool function mapping dictionary {name: function}
+        :param precomputed: Optional {index: Future} of calls that were already started
+                            (e.g. speculatively); their results are used as-is
+        :param control: Optional RunControl; once it is cancelled, calls that have not
+                        finished get a "cancelled" error result instead of being waited for
+        :param validators: Optional {name: ToolValidator} (see tool_schema.get_validators)
+        :return: List of execute_tool_call() results (None for unknown tools)
+        """
+        results = [None] * len(calls)
+        batch = []
+        precomputed = precomputed or {}
+
+        def collect(index, future):
+            if control is None:
+                return future.result()
+            try:
+                return control.wait_for(future)
+            except Cancelled:
+                return tool_cancelled(calls[index][0], calls[index][1])
+
+        def run(indexes):
+            if control is not None and control.cancelled:
+                for index in indexes:
+                    results[index] = tool_cancelled(calls[index][0], calls[index][1])
+            elif control is None and (len(indexes) == 1 or self.max_workers <= 1):
+                for index in indexes:
+                    results[index] = self._run_one(calls[index], tool_map, validators)
+            elif indexes:
+                # With a control every call runs on the pool, so that waiting can be interrupted
+                futures = [(index, self._submit(calls[index], tool_map, validators)) for index in indexes]
+                for index, future in futures:
+                    results[index] = collect(index, future)
+
+        pending = sorted(precomputed)
+
+        def settle(limit):
+            # Calls started earlier (speculatively) finish before any later call runs,
+            # so that a barrier never overtakes a read that comes before it
+            while pending and pending[0] < limit:
+                index = pending.pop(0)
+                results[index] = collect(index, precomputed[index])
+
+        for index, (call_id, func_name, args_str) in enumerate(calls):
+            func = tool_map.get(func_name) if tool_map else None
+            if index in precomputed:
+                continue
+            if func is not None and not is_concurrent(func):
+                if batch:
+                    settle(batch[0])
+                    run(batch)
+                    batch.clear()
+                settle(index)
+                run([index])
+            else:
+                batch.append(index)
+        if batch:
+            settle(batch[0])
+            run(batch)
+        settle(len(calls))
+        return results
+
+    def _run_one(self, call, tool_map, validators=None):
+        call_id, func_name, args_str = call
+        func = tool_map.get(func_name) if tool_map else None
+        if self.cache is not None:
+            content = self.cache.lookup(func_name, args_str, func)
+            if content is not None:
+                return tool_result(call_id, content, cached=True)
+
+        invoke = self._process_invoke if getattr(func, 'tool_use_process', False) else None
+        validator = validators.get(func_name) if validators else None
+        if func is not None and not is_concurrent(func):
+            with self._serial_lock:
+                result = execute_tool_call(call_id, func_name, args_str, tool_map, invoke, validator)
+        else:
+            result = execute_tool_call(call_id, func_name, args_str, tool_map, invoke, validator)
+
+        if self.cache is not None:
+            self.cache.store(func_name, args_str, func, result)
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            if self._thread_pool is not None:
+                self._thread_pool.shutdown(wait=False)
+                self._thread_pool = None
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=False)
+                self._process_pool = None
+
+
+class SpeculativeRunner:
+    """
+    Starts read-only tool calls while the assistant message is still streaming.
+
+    poll() is called with the partially assembled tool calls after every chunk. A
+    call is started as soon as its arguments parse as JSON, provided the tool is
+    read_only and every call before it in the message is read_only too (so running
+    it early cannot observe a state that a preceding mutator would have changed).
+    take() hands back only the futures whose (id, name, arguments) match the final
+    message; anything else is discarded.
+    """
+    def __init__(self, executor, tool_map, validators=None):
+        self.executor = executor
+        self.tool_map = tool_map or {}
+        self.validators = validators
+        self.started = {}  # index -> ((call_id, func_name, args_str), Future)
+        self.used = 0
+        self.discarded = 0
+
+    def poll(self, partial_calls):
+        """
+        :param partial_calls: {index: {"id", "name", "arguments"}} as assembled so far
+        """
+        for index in sorted(partial_calls):
+            slot = partial_calls[index]
+            func = self.tool_map.get(slot["name"])
+            if func is None or not is_read_only(func):
+                # Unknown tool, name still streaming, or a mutator: nothing after it may start early
+                return
+            if index in self.started or not slot["arguments"].rstrip().endswith("}"):
+                continue
+            try:
+                json.loads(slot["arguments"])
+            except json.JSONDecodeError:
+                continue
+            call = (slot["id"], slot["name"], slot["arguments"])
+            self.started[index] = (call, self.executor.submit(call, self.tool_map, self.validators))
+
+    def take(self, calls):
+        """
+        :param calls: Final list of (call_id, func_name, args_str)
+        :return: {index: Future} for the speculative calls that can be reused
+        """
+        matched = {}
+        for index, (call, future) in self.started.items():
+            if index < len(calls) and calls[index] == call:
+                matched[index] = future
+                self.used += 1
+            else:
+                self.discarded += 1
+        return matched
+
+
+class AsyncToolExecutor:
+    """
+    asyncio version of ToolExecutor with the same ordering rules: concurrent tools of
+    one message are gathered, tools marked concurrent=False run alone in place.
+    """
+    def __init__(self, max_concurrency=None, cache=None):
+        """
+        :param max_concurrency: Upper bound on tool calls in flight across all sessions
+                                sharing this executor (None = unbounded)
+        :param cache: Optional ToolResultCache consulted before read_only tools run
+        """
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self._semaphore = None
+
+    async def _run_one(self, call, tool_map, validators=None):
+        call_id, func_name, args_str = call
+        validator = validators.get(func_name) if validators else None
+        func = tool_map.get(func_name) if tool_map else None
+        if self.cache is not None:
+            content = self.cache.lookup(func_name, args_str, func)
+            if content is not None:
+                return tool_result(call_id, content, cached=True)
+
+        if self.max_concurrency is None:
+            result = await execute_tool_call_async(call_id, func_name, args_str, tool_map, validator)
+        else:
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            async with self._semaphore:
+                result = await execute_tool_call_async(call_id, func_name, args_str, tool_map, validator)
+
+        if self.cache is not None:
+            self.cache.store(func_name, args_str, func, result)
+        return result
+
+    async def run_calls(self, calls, tool_map, validators=None):
+        """
+        :param calls: List of (call_id, func_name, args_str)
+        :param tool_map: Tool function mapping dictionary {name: function or coroutine function}
+        :param validators: Optional {name: ToolValidator} (see tool_schema.get_validators)
+        :return: List of results in the original order (None for unknown tools)
+        """
+        results = [None] * len(calls)
+        batch = []
+
+        async def flush():
+            if batch:
+                gathered = await asyncio.gather(*(self._run_one(calls[index], tool_map, validators) for index in batch))
+                for index, result in zip(batch, gathered):
+                    results[index] = result
+                batch.clear()
+
+        for index, (call_id, func_name, args_str) in enumerate(calls):
+            func = tool_map.get(func_name) if tool_map else None
+            if func is not None and not is_concurrent(func):
+                await flush()
+                results[index] = await self._run_one(calls[index], tool_map, validators)
+            else:
+                batch.append(index)
+        await flush()
+
+        return results
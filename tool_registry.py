@@ -0,0 +1,191 @@
+"""
+Decorator-based tool registry: a demo's `tools` schemas and `TOOL_MAP` from its functions.
+
+    registry = ToolRegistry()
+
+    @registry.tool(read_only=True)
+    def view_table(table_index: int):
+        \"""
+        View the complete content of a specific table in text format.
+
+        :param table_index: Index of the table (0-based)
+        \"""
+
+The function schema is generated from the signature:
+
+- the description is the docstring up to its first `:param` line (or `description=`);
+- parameter descriptions come from the `:param name:` lines;
+- JSON types come from the annotations: int, float, str, bool, list[X], dict[str, X],
+  Literal[...] (an enum), Optional[X] (X or null); unannotated parameters accept any type;
+- parameters without a default are required, defaults are part of the schema.
+
+Keyword options of `tool()` / `add()` (read_only, concurrent, cache_ttl, invalidates,
+use_process) are passed on to tool_executor.tool_options. Methods can be registered in
+the class body; `tool_map(instance)` binds them to one instance.
+
+Schemas are generated on the first access to `registry.tools` and cached, so
+tool_schema.get_validators() finds the same definitions and compiles them once.
+Heavy dependencies of a tool belong inside the tool function, so that they are only
+imported when the tool first runs (Python caches the module after that).
+"""
+import functools
+import inspect
+import re
+import types
+import typing
+
+from tool_executor import tool_options
+
+_PARAM = re.compile(r":param\s+(\w+):\s*(.*)")
+
+_JSON_TYPES = {int: "integer", float: "number", str: "string", bool: "boolean", dict: "object", list: "array"}
+
+
+def _parse_docstring(doc):
+    """(description, {param: description}) of a docstring with `:param name:` lines"""
+    description = []
+    params = {}
+    current = None
+    in_fields = False
+    for line in inspect.cleandoc(doc or "").splitlines():
+        line = line.strip()
+        match = _PARAM.match(line)
+        if match:
+            current = match.group(1)
+            params[current] = match.group(2).strip()
+            in_fields = True
+        elif line.startswith(":"):
+            current = None  # :return: and other fields are not part of the schema
+            in_fields = True
+        elif current is not None and line:
+            params[current] += " " + line
+        elif not in_fields and line:
+            description.append(line)
+    return " ".join(description), params
+
+
+def annotation_schema(annotation):
+    """JSON schema of a parameter annotation ({} = any type)"""
+    if annotation is inspect.Parameter.empty:
+        return {}
+    if annotation in _JSON_TYPES:
+        return {"type": _JSON_TYPES[annotation]}
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is typing.Literal:
+        kinds = {_JSON_TYPES.get(type(value)) for value in args}
+        if len(kinds) == 1 and None not in kinds:
+            return {"type": kinds.pop(), "enum": list(args)}
+        return {"enum": list(args)}
+    if origin in (typing.Union, types.UnionType):
+        options = [arg for arg in args if arg is not type(None)]
+        if len(options) == 1:
+            schema = annotation_schema(options[0])
+        else:
+            schemas = [annotation_schema(arg) for arg in options]
+            if not all(list(schema) == ["type"] for schema in schemas):
+                return {}
+            schema = {"type": [schema["type"] for schema in schemas]}
+        if len(options) < len(args):
+            # Optional[X]: an explicit null is accepted as well as leaving the argument out
+            schema = _nullable(schema)
+        return schema
+    if origin is list and args:
+        return {"type": "array", "items": annotation_schema(args[0])}
+    if origin is dict and len(args) == 2:
+        return {"type": "object", "additionalProperties": annotation_schema(args[1])}
+    if origin in _JSON_TYPES:
+        return {"type": _JSON_TYPES[origin]}
+    return {}
+
+
+def _nullable(schema):
+    schema = dict(schema)
+    if "type" in schema:
+        kinds = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+        schema["type"] = kinds + ["null"]
+    if "enum" in schema:
+        schema["enum"] = list(schema["enum"]) + [None]
+    return schema
+
+
+def _is_method(func):
+    return next(iter(inspect.signature(func).parameters), None) == "self"
+
+
+@functools.lru_cache(maxsize=None)
+def function_schema(func, name=None, description=None):
+    """
+    Tool definition ({"type": "function", "function": {...}}) of `func`, generated once per
+    (func, name, description).
+    """
+    doc_description, param_docs = _parse_docstring(func.__doc__)
+    properties = {}
+    required = []
+    for param in inspect.signature(func).parameters.values():
+        if param.name == "self" or param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        schema = annotation_schema(param.annotation)
+        if param.name in param_docs:
+            schema["description"] = param_docs[param.name]
+        if param.default is param.empty:
+            required.append(param.name)
+        elif param.default is not None:
+            schema["default"] = param.default
+        properties[param.name] = schema
+    return {
+        "type": "function",
+        "function": {
+            "name": name or func.__name__,
+            "description": description or doc_description,
+            "parameters": {"type": "object", "properties": properties, "required": required},
+        },
+    }
+
+
+class ToolRegistry:
+    def __init__(self):
+        self._entries = {}  # name -> (function, description override)
+        self._tools = None
+
+    def tool(self, name=None, description=None, **options):
+        """
+        Decorator registering a tool function (or a method, see tool_map()).
+
+        :param name: Tool name (default: the function name)
+        :param description: Tool description (default: taken from the docstring)
+        :param options: Execution hints for tool_executor.tool_options (read_only, concurrent, ...)
+        """
+        def decorator(func):
+            return self.add(func, name, description, **options)
+        return decorator
+
+    def add(self, func, name=None, description=None, **options):
+        """Register an existing function, e.g. a tool shared by several demos with its own description"""
+        if options:
+            tool_options(**options)(func)
+        self._entries[name or func.__name__] = (func, description)
+        self._tools = None
+        return func
+
+    @property
+    def tools(self):
+        """Tool definitions for the chat-completions request (generated on first access)"""
+        if self._tools is None:
+            self._tools = [function_schema(func, name, description) for name, (func, description) in self._entries.items()]
+        return self._tools
+
+    def tool_map(self, owner=None):
+        """
+        {name: function} for run() / run_events().
+
+        :param owner: Instance that methods registered in its class body are bound to
+        """
+        tool_map = {}
+        for name, (func, _) in self._entries.items():
+            if _is_method(func):
+                if owner is None:
+                    raise ValueError(f"Tool {name} is a method: pass the instance to tool_map()")
+                func = func.__get__(owner)
+            tool_map[name] = func
+        return tool_map
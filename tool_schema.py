@@ -0,0 +1,278 @@
+"""
+Tool argument validation and coercion, compiled once from the tools' JSON schemas.
+
+The model sometimes sends "3" for an integer, a JSON string for an object, forgets a
+required argument or invents one. Instead of letting the tool fail with a vague
+Python error (and costing a round trip that often does not fix it), each call is
+checked against the tool's `parameters` schema before it runs:
+
+- safe coercions are applied silently ("3" -> 3, 3.0 -> 3, "true" -> True,
+  '{"a": 1}' -> {"a": 1}, 5 -> "5" for strings), and defaults are filled in;
+- anything else produces one error message listing every problem together with the
+  expected signature, so the model can fix the call in a single turn.
+
+Supported keywords: type (incl. lists of types), enum, properties, required, default,
+additionalProperties, items.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+_TYPE_NAMES = {
+    "integer": "an integer",
+    "number": "a number",
+    "string": "a string",
+    "boolean": "a boolean",
+    "object": "an object",
+    "array": "an array",
+    "null": "null",
+}
+
+
+class _Invalid(Exception):
+    pass
+
+
+def _describe(value):
+    if value is None:
+        kind = "null"
+    elif isinstance(value, bool):
+        kind = "boolean"
+    elif isinstance(value, (int, float)):
+        kind = "number"
+    elif isinstance(value, str):
+        kind = "string"
+    elif isinstance(value, list):
+        kind = "array"
+    elif isinstance(value, dict):
+        kind = "object"
+    else:
+        kind = type(value).__name__
+    text = json.dumps(value, ensure_ascii=False, default=str)
+    if len(text) > 40:
+        text = text[:37] + "..."
+    return f"{kind} {text}"
+
+
+def _to_integer(value):
+    if isinstance(value, bool):
+        raise _Invalid
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            return int(text)
+        except ValueError:
+            number = float(text)  # raises ValueError for non-numbers
+            if number.is_integer():
+                return int(number)
+    raise _Invalid
+
+
+def _to_number(value):
+    if isinstance(value, bool):
+        raise _Invalid
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        return float(value.strip())
+    raise _Invalid
+
+
+def _to_string(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise _Invalid
+
+
+def _to_boolean(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+        return value.strip().lower() == "true"
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    raise _Invalid
+
+
+def _to_json(python_type):
+    def convert(value):
+        if isinstance(value, python_type):
+            return value
+        if isinstance(value, str):
+            parsed = json.loads(value)
+            if isinstance(parsed, python_type):
+                return parsed
+        raise _Invalid
+    return convert
+
+
+def _to_null(value):
+    if value is None:
+        return None
+    raise _Invalid
+
+
+_CONVERTERS = {
+    "integer": _to_integer,
+    "number": _to_number,
+    "string": _to_string,
+    "boolean": _to_boolean,
+    "object": _to_json(dict),
+    "array": _to_json(list),
+    "null": _to_null,
+}
+
+
+def _type_label(schema):
+    kind = schema.get("type")
+    if "enum" in schema:
+        return "|".join(json.dumps(v, ensure_ascii=False) for v in schema["enum"])
+    if isinstance(kind, list):
+        return "|".join(kind)
+    return kind or "any"
+
+
+def _compile(schema, top_level=False):
+    """
+    Compile a schema into check(value, path, errors) -> coerced value. Problems are
+    appended to `errors` instead of raised, so that all of them can be reported at once.
+    """
+    kinds = schema.get("type")
+    if isinstance(kinds, str):
+        kinds = [kinds]
+    converters = [(kind, _CONVERTERS[kind]) for kind in kinds or [] if kind in _CONVERTERS]
+    enum = schema.get("enum")
+    properties = {name: _compile(sub) for name, sub in (schema.get("properties") or {}).items()}
+    required = list(schema.get("required") or [])
+    defaults = {name: sub["default"] for name, sub in (schema.get("properties") or {}).items() if "default" in sub}
+    additional = schema.get("additionalProperties", True)
+    # Top-level arguments become keyword arguments, so unknown names can never work
+    allow_extra = additional is not False and not top_level
+    check_extra = _compile(additional) if isinstance(additional, dict) else None
+    check_item = _compile(schema["items"]) if isinstance(schema.get("items"), dict) else None
+    expected = " or ".join(_TYPE_NAMES.get(kind, kind) for kind, _ in converters)
+
+    def check(value, path, errors):
+        if converters:
+            for kind, convert in converters:
+                try:
+                    value = convert(value)
+                    break
+                except (_Invalid, ValueError, TypeError):
+                    continue
+            else:
+                errors.append(f"{_quote(path)} must be {expected}, got {_describe(value)}")
+                return value
+
+        if enum is not None and value not in enum:
+            options = ", ".join(json.dumps(v, ensure_ascii=False) for v in enum)
+            errors.append(f"{_quote(path)} must be one of {options}, got {_describe(value)}")
+
+        if isinstance(value, dict) and (properties or required or check_extra or not allow_extra):
+            value = dict(value)
+            for name in required:
+                if name not in value and name not in defaults:
+                    errors.append(f"missing required argument {_quote(_join(path, name))}")
+            for name, default in defaults.items():
+                value.setdefault(name, default)
+            for name in list(value):
+                if name in properties:
+                    value[name] = properties[name](value[name], _join(path, name), errors)
+                elif check_extra is not None:
+                    value[name] = check_extra(value[name], _join(path, name), errors)
+                elif not allow_extra:
+                    known = ", ".join(properties) or "none"
+                    errors.append(f"unknown argument {_quote(_join(path, name))} (allowed: {known})")
+
+        elif isinstance(value, list) and check_item is not None:
+            value = [check_item(item, f"{path}[{i}]", errors) for i, item in enumerate(value)]
+        return value
+
+    return check
+
+
+def _join(path, name):
+    return f"{path}.{name}" if path else name
+
+
+def _quote(path):
+    return f"'{path}'" if path else "arguments"
+
+
+class ToolValidator:
+    """Validator/coercer for one tool, built from its function definition"""
+    def __init__(self, name, parameters):
+        self.name = name
+        self._check = _compile(dict(parameters, type="object"), top_level=True)
+        required = set(parameters.get("required") or [])
+        params = [
+            f"{param}{'' if param in required else '?'}: {_type_label(sub)}"
+            for param, sub in (parameters.get("properties") or {}).items()
+        ]
+        self.signature = f"{name}({', '.join(params)})"
+        if any(param.split(":")[0].endswith("?") for param in params):
+            self.signature += " (? = optional)"
+
+    def __call__(self, args):
+        """
+        :param args: Decoded JSON arguments
+        :return: (coerced arguments, None) or (args, error message for the model)
+        """
+        errors = []
+        coerced = self._check(args, "", errors)
+        if not errors:
+            return coerced, None
+        problems = "; ".join(f"{i}) {error}" for i, error in enumerate(errors, 1)) if len(errors) > 1 else errors[0]
+        return args, (
+            f"Error: Invalid arguments for tool {self.name}: {problems}. "
+            f"Expected {self.signature}. Call the tool again with corrected arguments."
+        )
+
+
+def compile_tools(tools):
+    """{tool name: ToolValidator} for a list of tool definitions"""
+    validators = {}
+    for tool in tools or []:
+        function = tool.get("function") or {}
+        if function.get("name") and function.get("parameters"):
+            validators[function["name"]] = ToolValidator(function["name"], function["parameters"])
+    return validators
+
+
+_COMPILED_MAX = 64
+_compiled = OrderedDict()  # schema hash -> validators, least recently used first
+_compiled_lock = threading.Lock()
+
+
+def _schema_key(tools):
+    return hashlib.sha256(json.dumps(tools, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+def get_validators(tools):
+    """
+    compile_tools() with a bounded LRU cache keyed by the content of the tool definitions,
+    so each distinct set of tools is compiled once, and a changed list is never served
+    stale validators.
+    """
+    if not tools:
+        return {}
+    key = _schema_key(tools)
+    with _compiled_lock:
+        validators = _compiled.get(key)
+        if validators is not None:
+            _compiled.move_to_end(key)
+            return validators
+    validators = compile_tools(tools)
+    with _compiled_lock:
+        _compiled[key] = validators
+        _compiled.move_to_end(key)
+        while len(_compiled) > _COMPILED_MAX:
+            _compiled.popitem(last=False)
+    return validators
@@ -0,0 +1,172 @@
+"""
+Chrome trace-event export of agent sessions, for timeline profiling in Perfetto
+(https://ui.perfetto.dev) or chrome://tracing.
+
+With DeepSeekAgent(trace_dir=...) every run writes one `<time>-<pid>-<random>.trace.json` with:
+
+- agent spans: the session, each turn, each model request with its time to first token;
+- a span per tool call (from tool_executor, so every demo is covered), on the thread
+  that ran it;
+- spans from inside the tools and the web demo: WordEngine operations, doc.save,
+  Socket.IO emits, page fetches.
+
+Code adds spans with `with span(name):` or the `@traced()` decorator. Both cost almost
+nothing while no trace is being recorded. The recording tracer is held in a context
+variable, so runs that overlap in one process (batch_runner --concurrency,
+self_consistency) each get their own spans. Threads do not inherit it: code that hands
+work to another thread passes the context along (ToolExecutor, the event sinks).
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar("tracer", default=None)  # tracer receiving the spans of this context
+
+
+class Tracer:
+    def __init__(self, path):
+        """
+        :param path: Output file (Chrome trace-event JSON, written by close())
+        """
+        self.path = path
+        self.started = time.perf_counter()
+        self.events = []
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def _ts(self, t):
+        return round((t - self.started) * 1e6, 1)  # microseconds since the start of the trace
+
+    def _tid(self):
+        thread = threading.current_thread()
+        if thread.ident not in self._threads:
+            self._threads[thread.ident] = thread.name
+        return thread.ident
+
+    def add(self, name, cat, start, end, args=None):
+        """Complete span from `start` to `end` (time.perf_counter() values) on the current thread"""
+        event = {"name": name, "cat": cat, "ph": "X", "ts": self._ts(start), "dur": round((end - start) * 1e6, 1),
+                 "pid": os.getpid(), "tid": self._tid()}
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+
+    def instant(self, name, cat, args=None):
+        event = {"name": name, "cat": cat, "ph": "i", "s": "t", "ts": self._ts(time.perf_counter()),
+                 "pid": os.getpid(), "tid": self._tid()}
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+
+    def close(self):
+        """Write the trace file; returns the number of events"""
+        pid = os.getpid()
+        metadata = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                    for tid, name in self._threads.items()]
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock:
+            events = metadata + self.events
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False, default=str)
+        return len(events)
+
+
+@contextmanager
+def recording(tracer):
+    """Send span() / traced() / instant() of the current context to `tracer` (None = to no tracer)"""
+    token = _current.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def span(name, cat="app", **args):
+    tracer = current()
+    if tracer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        tracer.add(name, cat, started, time.perf_counter(), args)
+
+
+def traced(name=None, cat="app"):
+    """Decorator recording a span for every call of the function"""
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with span(label, cat):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instant(name, cat="app", **args):
+    tracer = current()
+    if tracer is not None:
+        tracer.instant(name, cat, args)
+
+
+def trace_events(events, tracer, model_name=None):
+    """
+    Pass run_events() output through, turning it into agent spans on the way (session,
+    turns, model requests with their time to first token). Closes the tracer at the end
+    and yields a "trace" event {"path", "events"} right before the "done" event.
+
+    `tracer` is made current only while `events` produces the next event, so the
+    consumer's own context, and other runs consumed by the same thread, stay apart.
+    """
+    session_started = time.perf_counter()
+    turn_started = session_started
+    closed = False
+    events = iter(events)
+    try:
+        while True:
+            with recording(tracer):
+                event = next(events, None)
+            if event is None:
+                break
+            etype = event["type"]
+            now = time.perf_counter()
+            if etype == "turn_start":
+                turn_started = now
+            elif etype == "message":
+                started = now - event["latency"]
+                args = {"model": model_name, "streamed": event["streamed"], "tool_calls": len(event["tool_calls"])}
+                if event["ttft"] is not None:
+                    args["ttft_ms"] = round(event["ttft"] * 1000, 1)
+                tracer.add("model request", "model", started, now, args)
+                if event["ttft"] is not None:
+                    tracer.add("time to first token", "model", started, started + event["ttft"])
+            elif etype == "usage":
+                args = dict(event["usage"] or {}, tool_calls=event["tool_calls"])
+                tracer.add(f"turn {event['turn']}", "agent", turn_started, now, args)
+            elif etype in ("compaction", "loop", "route", "checkpoint", "error"):
+                tracer.instant(etype, "agent", {k: v for k, v in event.items() if k not in ("type", "traceback")})
+            elif etype == "done":
+                tracer.add("session", "agent", session_started, now, {"reason": event["reason"], "turns": event["turn"]})
+                closed = True
+                yield {"type": "trace", "turn": event["turn"], "path": tracer.path, "events": tracer.close()}
+            yield event
+    finally:
+        if not closed:
+            tracer.close()
@@ -0,0 +1,305 @@
+"""
+Fetch layer for the web tools: pooled keep-alive connections and streamed, size-capped reads.
+
+- One requests.Session per process (get_fetcher()), with a connection pool per host,
+  so that repeated visits to the same site reuse their TCP / TLS connections.
+- The body is streamed and reading stops at `max_bytes`; a page that is larger is
+  truncated instead of being downloaded completely.
+- Responses whose Content-Type is not HTML / text are rejected from the headers,
+  before any of the body is read.
+- The charset is taken from the Content-Type header, a byte order mark or the
+  <meta> tags at the start of the document; only when none of them names one is it
+  detected (charset_normalizer, over the first 64 KB).
+- fetch_many() fetches a batch of URLs concurrently, politely (a global and a per-host
+  limit on requests in flight, a minimum interval between requests to one host) and
+  within an overall deadline, returning whatever finished in time.
+- With a cache (http_cache.HttpCache), fresh pages are served from disk, stale ones are
+  revalidated with a conditional request, and in offline mode nothing is fetched.
+"""
+import codecs
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+              "Chrome/91.0.4472.124 Safari/537.36")
+HTML_TYPES = ("text/html", "application/xhtml+xml", "text/plain", "text/xml", "application/xml")
+
+_HEADER_CHARSET = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+_META_CHARSET = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I)
+_BOMS = [(codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16")]
+_META_WINDOW = 4096  # the HTML spec has the encoding declared within the first 1024 bytes
+_DETECT_WINDOW = 64 * 1024
+# Declared charsets that pages routinely mean a superset of (as browsers decode them)
+_SUPERSETS = {"gb2312": "gbk", "ascii": "utf-8"}
+
+
+class FetchError(Exception):
+    pass
+
+
+def _codec(name):
+    """Normalized codec name, or None if Python does not know it"""
+    try:
+        name = codecs.lookup(name).name
+    except (LookupError, TypeError):
+        return None
+    return _SUPERSETS.get(name, name)
+
+
+def detect_charset(content_type, body):
+    """
+    :return: (charset, source) with source "header", "bom", "meta", "detected" or "default"
+    """
+    match = _HEADER_CHARSET.search(content_type or "")
+    if match and _codec(match.group(1)):
+        return _codec(match.group(1)), "header"
+    for bom, charset in _BOMS:
+        if body.startswith(bom):
+            return charset, "bom"
+    match = _META_CHARSET.search(body[:_META_WINDOW])
+    if match and _codec(match.group(1).decode("ascii", "ignore")):
+        return _codec(match.group(1).decode("ascii")), "meta"
+    try:
+        from charset_normalizer import from_bytes
+        best = from_bytes(body[:_DETECT_WINDOW]).best()
+        if best is not None and _codec(best.encoding):
+            return _codec(best.encoding), "detected"
+    except ImportError:
+        pass
+    return "utf-8", "default"
+
+
+def _has_more(response):
+    try:
+        return response.raw.read(1) != b""
+    except Exception:
+        return True
+
+
+class PageFetcher:
+    def __init__(self, max_bytes=2 * 1024 * 1024, timeout=10, pool_size=16, user_agent=USER_AGENT,
+                 allowed_types=HTML_TYPES, max_concurrency=8, per_host=2, host_interval=0.25, cache=None):
+        """
+        :param max_bytes: Stop reading a body after this many (decompressed) bytes
+        :param timeout: Connect / read timeout in seconds
+        :param pool_size: Keep-alive connections kept per host
+        :param user_agent: User-Agent header sent with every request
+        :param allowed_types: Accepted Content-Type prefixes (a missing Content-Type is accepted)
+        :param max_concurrency: fetch_many(): requests in flight at once, over all hosts
+        :param per_host: fetch_many(): requests in flight at once to one host
+        :param host_interval: fetch_many(): minimum seconds between the starts of two requests to one host
+        :param cache: Optional http_cache.HttpCache the pages are stored in and served from
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.allowed_types = tuple(allowed_types)
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self.host_interval = host_interval
+        self.cache = cache
+        # Scheduling state of fetch_many(), shared by concurrent batches
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._hosts = {}  # host -> {"active", "next_start"}
+        self._pool = None
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = user_agent
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def fetch(self, url, max_bytes=None, timeout=None):
+        """
+        Download a page, or take it from the cache.
+
+        :return: {"url" (after redirects), "status", "content_type", "charset", "charset_source",
+                  "html", "bytes", "truncated", "headers", "elapsed"}, plus "cache" ("hit",
+                  "revalidated" or "miss") and "cache_key" when the fetcher has a cache
+        :raises FetchError: HTTP error status, rejected content type, network failure, or
+                            a page missing from the cache in offline mode
+        """
+        if self.cache is None:
+            return self._download(url, max_bytes, timeout)[0]
+        entry = self.cache.lookup(url)
+        page = self.cache.page(entry, "hit") if entry and self.cache.is_fresh(entry) else None
+        if page is not None:
+            return page
+        if self.cache.offline:
+            raise FetchError(f"Offline: {url} is not in the web cache")
+        page, body = self._download(url, max_bytes, timeout, self.cache.validators(entry) if entry else None)
+        if page["status"] == 304:
+            cached = self.cache.page(self.cache.refresh(entry, page["headers"]), "revalidated") if entry else None
+            if cached is not None:
+                return cached
+            # The cached body went away meanwhile (evicted, or removed by another process)
+            page, body = self._download(url, max_bytes, timeout)
+            if page["status"] == 304:
+                raise FetchError(f"HTTP 304 Not Modified for {url} without a conditional request")
+        page["cache"] = "miss"
+        page["cache_key"] = self.cache.store(url, page, body)
+        return page
+
+    def _download(self, url, max_bytes=None, timeout=None, headers=None):
+        """The page (see fetch()) and its raw body; a 304 answer to conditional `headers` has no html"""
+        import requests
+
+        max_bytes = max_bytes or self.max_bytes
+        started = time.perf_counter()
+        try:
+            response = self.session.get(url, stream=True, timeout=timeout or self.timeout, headers=headers)
+        except requests.RequestException as e:
+            raise FetchError(f"{type(e).__name__}: {e}") from e
+        with response:
+            if response.status_code == 304:
+                return {"url": response.url, "status": 304, "headers": dict(response.headers),
+                        "elapsed": time.perf_counter() - started}, b""
+            if response.status_code >= 400:
+                raise FetchError(f"HTTP {response.status_code} {response.reason} for {response.url}")
+            content_type = response.headers.get("Content-Type", "")
+            mime = content_type.split(";")[0].strip().lower()
+            if mime and not mime.startswith(self.allowed_types):
+                raise FetchError(f"Unsupported content type {mime} for {response.url} (not a web page)")
+
+            chunks = []
+            size = 0
+            truncated = False
+            try:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= max_bytes:
+                        truncated = size > max_bytes or _has_more(response)
+                        break
+            except requests.RequestException as e:
+                raise FetchError(f"{type(e).__name__} while reading {response.url}: {e}") from e
+            # Leaving a body unread closes the connection instead of returning it to the pool
+            body = b"".join(chunks)[:max_bytes]
+
+        charset, source = detect_charset(content_type, body)
+        return {
+            "url": response.url,
+            "status": response.status_code,
+            "content_type": mime,
+            "charset": charset,
+            "charset_source": source,
+            "html": body.decode(charset, errors="replace"),
+            "bytes": len(body),
+            "truncated": truncated,
+            "headers": dict(response.headers),
+            "elapsed": time.perf_counter() - started,
+        }, body
+
+    def fetch_many(self, urls, deadline=None):
+        """
+        Fetch several pages concurrently within the scheduling limits of this fetcher.
+
+        :param urls: URLs to fetch (duplicates are fetched once)
+        :param deadline: Seconds for the whole batch (None = no limit); pages that are not
+                         done by then are reported as timed out, the others are returned
+        :return: List in the order of `urls` of {"url", "page"} (see fetch()) or {"url", "error"}
+        """
+        end = time.monotonic() + deadline if deadline is not None else None
+        unique = list(dict.fromkeys(urls))
+        results = {}
+        if self.cache is not None:
+            # Fresh cached pages (all cached pages offline) take no request slot
+            for url in unique:
+                entry = self.cache.lookup(url)
+                if entry and self.cache.is_fresh(entry) or self.cache.offline:
+                    try:
+                        results[url] = {"url": url, "page": self.fetch(url)}
+                    except FetchError as e:
+                        results[url] = {"url": url, "error": str(e)}
+        pending = [url for url in unique if url not in results]
+        running = {}
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="fetch")
+        while pending or running:
+            now = time.monotonic()
+            if end is not None and now >= end:
+                break
+            wake = end
+            with self._lock:
+                for url in list(pending):
+                    if self._in_flight >= self.max_concurrency:
+                        break
+                    host = urlsplit(url).netloc.lower()
+                    state = self._hosts.setdefault(host, {"active": 0, "next_start": 0.0})
+                    if state["active"] >= self.per_host:
+                        continue
+                    if state["next_start"] > now:
+                        wake = state["next_start"] if wake is None else min(wake, state["next_start"])
+                        continue
+                    state["active"] += 1
+                    state["next_start"] = now + self.host_interval
+                    self._in_flight += 1
+                    pending.remove(url)
+                    timeout = self.timeout if end is None else max(0.1, min(self.timeout, end - now))
+                    running[self._pool.submit(self._fetch_slot, host, url, timeout)] = url
+            # Wake up when a request finishes, a host slot opens or the deadline passes
+            timeout = None if wake is None else max(0.0, wake - time.monotonic())
+            if running:
+                done, _ = wait(running, timeout=timeout if pending or end is not None else None,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = running.pop(future)
+                    try:
+                        results[url] = {"url": url, "page": future.result()}
+                    except FetchError as e:
+                        results[url] = {"url": url, "error": str(e)}
+                    except Exception as e:
+                        results[url] = {"url": url, "error": f"{type(e).__name__}: {e}"}
+            else:
+                # Only waiting for other batches to free a slot, or for a host interval to pass
+                time.sleep(min(timeout, 0.05) if timeout is not None else 0.05)
+
+        for url in running.values():
+            results[url] = {"url": url, "error": f"Timed out: not finished within the {deadline}s deadline"}
+        for url in pending:
+            results[url] = {"url": url, "error": f"Timed out: not started within the {deadline}s deadline"}
+        return [results[url] for url in urls]
+
+    def _fetch_slot(self, host, url, timeout):
+        try:
+            return self.fetch(url, timeout=timeout)
+        finally:
+            with self._lock:
+                self._hosts[host]["active"] -= 1
+                self._in_flight -= 1
+
+    def close(self):
+        self.session.close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+
+
+_fetcher = None
+_fetcher_options = {}
+_fetcher_lock = threading.Lock()
+
+
+def configure_fetcher(**options):
+    """Set the PageFetcher options of get_fetcher() (replaces a fetcher created before)"""
+    global _fetcher
+    with _fetcher_lock:
+        _fetcher_options.clear()
+        _fetcher_options.update(options)
+        if _fetcher is not None:
+            _fetcher.close()
+            _fetcher = None
+
+
+def get_fetcher():
+    """Process-wide PageFetcher, created on first use"""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = PageFetcher(**_fetcher_options)
+        return _fetcher
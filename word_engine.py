@@ -1,5 +1,8 @@
+import base64
+import io
 import os
 from docx import Document
+from tracing import traced
 
 
 class WordEngine:
@@ -16,6 +19,19 @@ class WordEngine:
             self.doc = Document()
             print("已创建新文档")
 
+    # ==================== 检查点 (checkpoint.py) ====================
+
+    @traced(cat="word")
+    def snapshot(self):
+        """当前文档内容 (docx 字节的 base64)，用于保存检查点"""
+        buffer = io.BytesIO()
+        self.doc.save(buffer)
+        return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+    def restore(self, state):
+        """从 snapshot() 的结果恢复文档"""
+        self.doc = Document(io.BytesIO(base64.b64decode(state)))
+
     # ==================== 通用表格操作工具 ====================
     
     def _get_grid_span(self, cell):
@@ -28,6 +44,7 @@ class WordEngine:
                 return gridSpan.val
         return 1
     
+    @traced(cat="word")
     def analyze_table(self, table_index=0):
         """
         深度分析表格结构，返回完整的表格视图，供AI理解和决策。
@@ -133,6 +150,7 @@ class WordEngine:
         except Exception as e:
             return {"error": str(e)}
     
+    @traced(cat="word")
     def get_table_as_text(self, table_index=0):
         """
         将表格转换为易读的文本格式，便于AI阅读和理解表格内容。
@@ -166,6 +184,7 @@ class WordEngine:
         except Exception as e:
             return f"错误: {str(e)}"
     
+    @traced(cat="word")
     def list_all_tables(self):
         """
         列出文档中所有表格的概要信息。
@@ -199,6 +218,7 @@ class WordEngine:
             })
         return result
     
+    @traced(cat="word")
     def fill_cell(self, table_index, row, col, value):
         """
         填写指定位置的单元格。
@@ -224,6 +244,7 @@ class WordEngine:
         except Exception as e:
             return f"填写失败: {str(e)}"
     
+    @traced(cat="word")
     def fill_by_label(self, table_index, label, value, search_all_cols=True, fill_all=False):
         """
         根据标签文本查找并填写其关联的值单元格。
@@ -310,6 +331,7 @@ class WordEngine:
         except Exception as e:
             return f"填写失败: {str(e)}"
     
+    @traced(cat="word")
     def fill_multiple_by_labels(self, table_index, label_value_map, fill_all=False):
         """
         批量根据标签填写多个值。
@@ -332,6 +354,7 @@ class WordEngine:
             results.append(result)
         return "\n".join(results)
     
+    @traced(cat="word")
     def find_and_fill_empty_cells_in_row(self, table_index, row_index, values, start_col=0):
         """
         在指定行中从左到右依次填写空单元格。
@@ -382,6 +405,7 @@ class WordEngine:
         except Exception as e:
             return f"填写失败: {str(e)}"
     
+    @traced(cat="word")
     def find_empty_row(self, table_index, check_col=0, start_row=1):
         """
         查找表格中第一个空行（指定列为空的行）。